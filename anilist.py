@@ -0,0 +1,79 @@
+"""Búsqueda de metadatos en AniList y generación de details.json (sin GUI)."""
+import json
+import os
+import requests
+
+ANILIST_URL = "https://graphql.anilist.co"
+
+ANILIST_QUERY = """
+query ($search: String, $perPage: Int) {
+  Page(perPage: $perPage) {
+    media(search: $search, type: MANGA) {
+      title { romaji english }
+      description genres status isAdult
+      coverImage { large }
+      staff { edges { node { name { full } } role } }
+    }
+  }
+}
+"""
+
+
+def search_anilist(title, per_page=10, timeout=30):
+    """Busca mangas por título en AniList y devuelve la lista de resultados.
+
+    Lanza ``requests.RequestException`` si falla la conexión y ``ValueError``
+    si la respuesta no tiene el formato esperado.
+    """
+    response = requests.post(
+        ANILIST_URL,
+        json={"query": ANILIST_QUERY, "variables": {"search": title, "perPage": per_page}},
+        timeout=timeout,
+    )
+    response.raise_for_status() # Lanzar excepción para códigos de error HTTP
+    try:
+        return response.json()["data"]["Page"]["media"] or []
+    except (KeyError, TypeError) as e:
+        raise ValueError(f"Respuesta inesperada de AniList: {e}") from e
+
+
+def format_title(media):
+    """Título para mostrar en listas: romaji, inglés entre paréntesis y marca NSFW."""
+    title = media["title"]["romaji"]
+    if media["title"].get("english") and media["title"]["english"] != title:
+        title += f" ({media['title']['english']})"
+    if media.get("isAdult"):
+        title += " [NSFW]"
+    return title
+
+
+def build_details(media):
+    """Convierte un resultado de AniList en el diccionario de details.json."""
+    data = {
+        "title": media["title"]["romaji"],
+        "author": "",
+        "artist": "",
+        "description": (media.get("description") or "").replace("<br>", "\n"),
+        "genre": media.get("genres", []),
+        "status": "1" if media.get("status") == "FINISHED" else "0"
+    }
+
+    # Extraer autor y artista
+    for staff in (media.get("staff") or {}).get("edges", []):
+        role = staff.get("role", "")
+        name = staff.get("node", {}).get("name", {}).get("full", "")
+        if not name:
+            continue
+        if "Story" in role:
+            data["author"] = name
+        if "Art" in role:
+            data["artist"] = name
+    return data
+
+
+def write_details_json(folder_path, data):
+    """Guarda ``data`` como details.json en la carpeta indicada y devuelve la ruta."""
+    file_path = os.path.join(folder_path, "details.json")
+    with open(file_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=4, ensure_ascii=False)
+    return file_path
@@ -0,0 +1,461 @@
+"""Benchmarks reproducibles con capítulos sintéticos.
+
+Genera bibliotecas de prueba deterministas (mismas páginas byte a byte en
+cada ejecución) y mide las entradas del motor:
+
+    compress     zip_folders_worker con y sin superresolución, con cada
+                 política de compresión y distinto número de hilos/procesos
+    superres     aplicar_superresolucion y aplicar_superresolucion_lote
+    rename       autorename_images_in_subfolders con el índice frío y caliente
+    model-load   carga de los pesos desde el almacén de modelos (proyectados
+                 en memoria) frente a torch.load y la construcción normal
+    accel        (aparte, con --accel) cada combinación de aceleraciones de
+                 superres.torch_runner frente a fp32 sin aceleraciones:
+                 velocidad relativa y PSNR respecto a su resultado;
+                 incluye los backends int8, TorchScript y ONNX Runtime
+
+Las páginas imitan un manga (ver synthetic.py), en escala de grises o en
+color, en JPEG, PNG y WebP.
+Funciona sin red y solo con CPU: si los pesos preentrenados no están
+disponibles se usa un MSRN x2 pequeño con pesos aleatorios (fijos), lo que
+mide el pipeline pero no la velocidad real del modelo; el tipo de modelo se
+guarda en los resultados.
+
+Los resultados se guardan en JSON (con el commit y el entorno) y
+``compare`` los contrasta con los de otra ejecución::
+
+    python cli.py benchmark --preset quick --output antes.json
+    python cli.py benchmark --preset quick --output despues.json --compare antes.json
+"""
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import zlib
+import numpy as np
+
+import cbz
+import engine
+import model_store
+import profiling
+import sr_export
+import sr_quant
+import superres
+import synthetic
+
+RESULTS_VERSION = 1
+
+MODEL_AUTO = "auto"
+MODEL_PRETRAINED = "pretrained"
+MODEL_TINY = "tiny"
+MODEL_CHOICES = (MODEL_AUTO, MODEL_PRETRAINED, MODEL_TINY)
+
+# Bibliotecas sintéticas: páginas por capítulo, tamaño, formato y color
+DATASETS = {
+    "gris-jpeg": {"pages": 8, "size": (1000, 1440), "image_format": "JPEG", "color": False},
+    "color-png": {"pages": 6, "size": (1000, 1440), "image_format": "PNG", "color": True},
+    "color-webp": {"pages": 6, "size": (800, 1150), "image_format": "WEBP", "color": True},
+}
+
+# quick: para comprobar un cambio en un par de minutos; full: para comparar máquinas
+PRESETS = {
+    "quick": {"chapters": 2, "page_scale": 0.4, "page_count_scale": 0.5, "repeat": 1, "tile_size": 128},
+    "full": {"chapters": 4, "page_scale": 1.0, "page_count_scale": 1.0, "repeat": 3,
+             "tile_size": superres.DEFAULT_TILE_SIZE},
+}
+
+_EXTENSIONS = {"JPEG": "jpg", "PNG": "png", "WEBP": "webp"}
+
+
+# --- Bibliotecas sintéticas ---
+def generate_library(root, chapters, pages, size, image_format, color, seed=0):
+    """Crea ``chapters`` subcarpetas con ``pages`` páginas cada una. Devuelve los bytes escritos.
+
+    Las páginas se llaman ``p1, p2 ... p10`` (sin ceros a la izquierda) para que
+    el renombrado tenga trabajo.
+    """
+    total = 0
+    for chapter in range(1, chapters + 1):
+        folder = os.path.join(root, f"Capítulo {chapter}")
+        os.makedirs(folder, exist_ok=True)
+        for page in range(1, pages + 1):
+            image = synthetic.synthetic_page(size[0], size[1], color, seed=(seed, chapter, page))
+            path = os.path.join(folder, f"p{page}.{_EXTENSIONS[image_format]}")
+            options = {"quality": 90} if image_format in ("JPEG", "WEBP") else {}
+            image.save(path, format=image_format, **options)
+            total += os.path.getsize(path)
+    return total
+
+
+# --- Modelo ---
+def tiny_model(seed=0):
+    """MSRN x2 de un bloque y 8 canales con pesos aleatorios deterministas."""
+    import torch
+    from super_image import MsrnConfig, MsrnModel
+
+    torch.manual_seed(seed)
+    return MsrnModel(MsrnConfig(scale=superres.MODEL_SCALE, n_blocks=1, n_feats=8)).eval()
+
+
+def load_model(mode=MODEL_AUTO):
+    """Prepara el modelo de superresolución del benchmark. Devuelve "pretrained" o "tiny-random"."""
+    if mode != MODEL_TINY:
+        model, error = superres.get_model() # Sin red: solo el almacén de modelos
+        if model is not None:
+            return "pretrained"
+        if mode == MODEL_PRETRAINED:
+            raise RuntimeError(f"No se pudo cargar el modelo preentrenado: {error}")
+        print("Pesos preentrenados no disponibles: se usa un MSRN pequeño con pesos aleatorios.")
+    superres.set_model(tiny_model())
+    return "tiny-random"
+
+
+# --- Casos ---
+def compress_cases(tile_size):
+    """[(nombre, parámetros de zip_folders_worker)] a medir."""
+    cases = [("compress", {"usar_sr": False, "compression_policy": policy}) for policy in cbz.POLICIES]
+    cases += [("compress", {"usar_sr": False, "chapter_workers": workers}) for workers in (2, 0)]
+    cases += [("compress", {"usar_sr": False, "output_format": "webp", "encode_workers": workers})
+              for workers in (1, 4)]
+    cases += [("compress-sr", {"usar_sr": True, "sr_tile_size": tile_size, "decode_workers": workers,
+                               "encode_workers": workers}) for workers in (1, 4)]
+    cases.append(("compress-sr", {"usar_sr": True, "sr_tile_size": 0}))
+    cases += [("compress-sr", {"usar_sr": True, "sr_tile_size": tile_size, "sr_workers": workers})
+              for workers in (2, 0)]
+    cases.append(("compress-sr", {"usar_sr": True, "sr_upscaler": f"{superres.UPSCALER_LANCZOS}-x{superres.MODEL_SCALE}"}))
+    return cases
+
+
+def _environment():
+    import torch
+
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {"commit": commit, "python": platform.python_version(), "platform": platform.platform(),
+            "machine": platform.machine(), "cpus": os.cpu_count(), "torch": torch.__version__,
+            "torch_threads": torch.get_num_threads()}
+
+
+def _timed(run, repeat, prepare):
+    """Ejecuta ``run(carpeta)`` ``repeat`` veces sobre copias nuevas. Devuelve (segundos, último resultado)."""
+    seconds = []
+    result = None
+    for _ in range(repeat):
+        folder = prepare()
+        try:
+            start = time.perf_counter()
+            result = run(folder)
+            seconds.append(time.perf_counter() - start)
+        finally:
+            shutil.rmtree(folder, ignore_errors=True)
+    return seconds, result
+
+
+def _entry(benchmark, dataset, params, seconds, pages, bytes_in, stages=None):
+    median = statistics.median(seconds)
+    return {"benchmark": benchmark, "dataset": dataset, "params": params, "pages": pages, "bytes_in": bytes_in,
+            "seconds": [round(s, 4) for s in seconds], "median_s": round(median, 4),
+            "pages_per_second": round(pages / median, 2) if median else None, "stages": stages}
+
+
+def run_benchmarks(preset="quick", model=MODEL_AUTO, repeat=None, workdir=None, only=None):
+    """Genera los datos, ejecuta todos los casos y devuelve los resultados (dict listo para JSON).
+
+    ``only`` limita a los benchmarks cuyo nombre contiene ese texto.
+    """
+    settings = PRESETS[preset]
+    repeat = repeat or settings["repeat"]
+    model_kind = load_model(model)
+    if workdir:
+        os.makedirs(workdir, exist_ok=True)
+    base = tempfile.mkdtemp(prefix="manga-bench-", dir=workdir)
+    results = []
+    try:
+        for dataset, spec in DATASETS.items():
+            source = os.path.join(base, "datos", dataset)
+            size = (int(spec["size"][0] * settings["page_scale"]), int(spec["size"][1] * settings["page_scale"]))
+            pages = max(2, int(spec["pages"] * settings["page_count_scale"]))
+            bytes_in = generate_library(source, settings["chapters"], pages, size, spec["image_format"],
+                                        spec["color"], seed=zlib.crc32(dataset.encode()))
+            total_pages = pages * settings["chapters"]
+            print(f"{dataset}: {settings['chapters']} capítulos x {pages} páginas de {size[0]}x{size[1]} "
+                  f"({bytes_in / 1e6:.1f} MB)")
+
+            def prepare():
+                folder = os.path.join(base, "trabajo", dataset)
+                shutil.rmtree(folder, ignore_errors=True)
+                shutil.copytree(source, folder)
+                return folder
+
+            def selected(name):
+                return not only or only in name
+
+            for name, params in compress_cases(settings["tile_size"]):
+                if not selected(name):
+                    continue
+                report_path = os.path.join(base, "informe.json")
+
+                def run(folder, params=params, report_path=report_path):
+                    engine.zip_folders_worker(folder, False, False, False, None, sr_cache_dir=None,
+                                              incremental=False, report_path=report_path, **params)
+
+                seconds, _ = _timed(run, repeat, prepare)
+                with open(report_path, encoding="utf-8") as f:
+                    run_report = json.load(f)
+                if run_report["counts"]["error"]:
+                    raise RuntimeError(f"{name} {params}: el trabajo terminó con errores: {run_report['counts']}")
+                results.append(_entry(name, dataset, params, seconds, total_pages, bytes_in,
+                                      run_report["profile"]["stages"]))
+                print(f"  {name} {params}: {results[-1]['median_s']:.2f} s")
+
+            if selected("superres"):
+                results.extend(_superres_entries(dataset, source, settings, repeat, bytes_in))
+            if selected("rename"):
+                results.extend(_rename_entries(dataset, prepare, repeat, total_pages, bytes_in))
+        if not only or only in "model-load":
+            results.extend(_model_load_entries(base, repeat))
+    finally:
+        shutil.rmtree(base, ignore_errors=True)
+
+    return {"version": RESULTS_VERSION, "created": time.strftime("%Y-%m-%dT%H:%M:%S"), "preset": preset,
+            "repeat": repeat, "model": model_kind, "environment": _environment(), "results": results}
+
+
+def _superres_entries(dataset, source, settings, repeat, bytes_in):
+    """aplicar_superresolucion página a página y por lotes sobre el primer capítulo."""
+    model, _ = superres.get_model()
+    device, _ = superres.select_device(False)
+    chapter = os.path.join(source, sorted(os.listdir(source))[0])
+    paths = [os.path.join(chapter, name) for name in sorted(os.listdir(chapter))]
+    chapter_bytes = sum(os.path.getsize(path) for path in paths)
+    entries = []
+    for name, batch in (("superres", None), ("superres-lote", superres.DEFAULT_BATCH_SIZE)):
+        params = {"tile_size": settings["tile_size"], "batch_size": batch or 1}
+        seconds = []
+        timer = None
+        for _ in range(repeat):
+            timer = profiling.StageTimer()
+            start = time.perf_counter()
+            if batch is None:
+                results = [superres.aplicar_superresolucion(path, model, device, settings["tile_size"], timer=timer)
+                           for path in paths]
+            else:
+                results = superres.aplicar_superresolucion_lote(paths, model, device, settings["tile_size"],
+                                                                batch_size=batch, timer=timer)
+            seconds.append(time.perf_counter() - start)
+            if any(result is None for result in results):
+                raise RuntimeError(f"{name}: alguna página no se pudo ampliar")
+        entries.append(_entry(name, dataset, params, seconds, len(paths), chapter_bytes, timer.as_dict()))
+        print(f"  {name} {params}: {entries[-1]['median_s']:.2f} s")
+    return entries
+
+
+def _rename_entries(dataset, prepare, repeat, pages, bytes_in):
+    """Renombrado con el índice frío (primera vez) y caliente (tras deshacerlo)."""
+    cold = []
+    warm = []
+    for _ in range(repeat):
+        folder = prepare()
+        try:
+            start = time.perf_counter()
+            engine.autorename_images_in_subfolders(folder)
+            cold.append(time.perf_counter() - start)
+            engine.undo_autorename(folder)
+            start = time.perf_counter()
+            engine.autorename_images_in_subfolders(folder)
+            warm.append(time.perf_counter() - start)
+        finally:
+            shutil.rmtree(folder, ignore_errors=True)
+    entries = [_entry("rename", dataset, {"index": "frío"}, cold, pages, bytes_in),
+               _entry("rename", dataset, {"index": "caliente"}, warm, pages, bytes_in)]
+    for entry in entries:
+        print(f"  rename {entry['params']}: {entry['median_s']:.3f} s")
+    return entries
+
+
+def _model_load_entries(base, repeat):
+    """Carga de los pesos del modelo en uso: almacén (primera carga y recargas) frente a torch.load."""
+    import torch
+    from super_image import MsrnConfig, MsrnModel
+
+    model, _ = superres.get_model()
+    path = os.path.join(base, "pesos.pt")
+    torch.save(model.state_dict(), path)
+    directory = os.path.join(base, "almacén")
+    stored = model_store.import_weights(path, superres.MODEL_ARCHITECTURE, superres.MODEL_SCALE,
+                                        model.config.to_dict(), directory=directory)
+
+    def plain():
+        MsrnModel(MsrnConfig(**stored["config"])).load_state_dict(torch.load(path, map_location="cpu"))
+
+    def first_load():
+        model_store._verified.clear() # Como la primera carga de un proceso: calcula la suma
+        model_store.load(stored["architecture"], stored["scale"], directory)
+
+    runs = {"torch.load": plain,
+            "almacén": first_load,
+            "almacén con la suma comprobada": lambda: model_store.load(stored["architecture"], stored["scale"],
+                                                                       directory)}
+    entries = []
+    for method, run in runs.items():
+        seconds = []
+        for _ in range(max(3, repeat)): # Una carga dura milisegundos: al menos tres medidas
+            start = time.perf_counter()
+            run()
+            seconds.append(time.perf_counter() - start)
+        entries.append(_entry("model-load", "pesos", {"method": method}, seconds, 1, stored["bytes"]))
+        print(f"  model-load {method}: {entries[-1]['median_s'] * 1000:.0f} ms")
+    return entries
+
+
+# --- Aceleraciones de la inferencia ---
+# Combinaciones que se comparan con la referencia (fp32 NCHW con no_grad)
+ACCEL_VARIANTS = (
+    (superres.ACCEL_INFERENCE_MODE,),
+    (superres.ACCEL_INFERENCE_MODE, superres.ACCEL_CHANNELS_LAST),
+    (superres.ACCEL_INFERENCE_MODE, superres.ACCEL_BF16),
+    (superres.ACCEL_INFERENCE_MODE, superres.ACCEL_CHANNELS_LAST, superres.ACCEL_BF16),
+    (superres.ACCEL_INFERENCE_MODE, superres.ACCEL_COMPILE),
+    (superres.ACCEL_INFERENCE_MODE, superres.ACCEL_CHANNELS_LAST, superres.ACCEL_COMPILE),
+)
+
+
+def _accel_pages(settings):
+    """Páginas de prueba (arrays para el modelo): dos en grises y dos en color."""
+    width = int(DATASETS["gris-jpeg"]["size"][0] * settings["page_scale"])
+    height = int(DATASETS["gris-jpeg"]["size"][1] * settings["page_scale"])
+    return [superres.imagen_a_array(synthetic.synthetic_page(width, height, color, seed=(index, int(color))))
+            for color in (False, True) for index in range(2)]
+
+
+def run_acceleration_comparison(preset="quick", model=MODEL_AUTO, repeat=None, variants=ACCEL_VARIANTS):
+    """Mide cada combinación de ``variants`` frente a la referencia fp32 y devuelve los resultados.
+
+    Para cada una se guarda el tiempo de preparación (copia, formato de
+    memoria y, con compile, la compilación y el calentamiento), la mediana de
+    ampliar las páginas, la aceleración frente a la referencia y el PSNR
+    medio frente a su resultado (None = idéntico). Al final se miden los otros
+    backends: int8 (cuantizado con calibración sintética), TorchScript y ONNX
+    Runtime (si está instalado); se preparan en una carpeta temporal y la
+    preparación incluye la cuantización o la exportación.
+    """
+    settings = PRESETS[preset]
+    repeat = repeat or settings["repeat"]
+    model_kind = load_model(model)
+    model_sr, _ = superres.get_model()
+    device, _ = superres.select_device(False)
+    model_sr.to(device).eval()
+    arrays = _accel_pages(settings)
+    tile_size = settings["tile_size"]
+    batch_size = superres.DEFAULT_BATCH_SIZE
+    warmup_shape = (batch_size, 3, tile_size, tile_size)
+    pages = len(arrays)
+
+    results = []
+    reference = None
+    runs = [((), superres.BACKEND_FP32)] + [(accelerations, superres.BACKEND_FP32) for accelerations in variants]
+    runs += [((superres.ACCEL_INFERENCE_MODE,), superres.BACKEND_INT8),
+             ((superres.ACCEL_INFERENCE_MODE,), superres.BACKEND_TORCHSCRIPT)]
+    if sr_export.onnx_available():
+        runs.append(((), superres.BACKEND_ONNX))
+    model_dir = tempfile.mkdtemp(prefix="manga-bench-models-")
+    for accelerations, backend in runs:
+        start = time.perf_counter()
+        if backend == superres.BACKEND_ONNX:
+            run, _ = sr_export.onnx_runner(model_sr, model_dir)
+        else:
+            run_model = model_sr
+            if backend == superres.BACKEND_INT8:
+                run_model, _ = sr_quant.load(model_sr, model_dir)
+            elif backend == superres.BACKEND_TORCHSCRIPT:
+                run_model, _ = sr_export.load_torchscript(model_sr, model_dir, device)
+            run = superres.torch_runner(run_model, device, accelerations, warmup_shape)
+        superres.upscale_arrays(run, arrays[:1], tile_size, superres.DEFAULT_TILE_OVERLAP, batch_size) # Calentamiento
+        prepare_s = time.perf_counter() - start
+        seconds = []
+        outputs = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            outputs = superres.upscale_arrays(run, arrays, tile_size, superres.DEFAULT_TILE_OVERLAP, batch_size)
+            seconds.append(time.perf_counter() - start)
+        entry = _entry("accel", "sintético", {"accelerations": list(accelerations), "backend": backend},
+                       seconds, pages, None)
+        entry["applied"] = list(run.accelerations)
+        entry["prepare_s"] = round(prepare_s, 3)
+        if reference is None:
+            reference = entry, outputs
+            entry["speedup"], entry["psnr_db"] = 1.0, None
+        else:
+            entry["speedup"] = round(reference[0]["median_s"] / entry["median_s"], 3)
+            values = [superres.psnr(ref, out) for ref, out in zip(reference[1], outputs)]
+            finite = [value for value in values if value is not None]
+            entry["psnr_db"] = round(float(np.mean(finite)), 2) if finite else None
+        results.append(entry)
+        label = ", ".join(accelerations) or "fp32 (referencia)"
+        if backend != superres.BACKEND_FP32:
+            label = f"{backend}, {label}" if accelerations else backend
+        quality = "idéntico" if entry["psnr_db"] is None else f"PSNR {entry['psnr_db']} dB"
+        print(f"  {label}: {entry['median_s']:.2f} s, x{entry['speedup']:.2f}, {quality}"
+              f" (preparación {entry['prepare_s']:.1f} s)")
+    shutil.rmtree(model_dir, ignore_errors=True)
+
+    return {"version": RESULTS_VERSION, "created": time.strftime("%Y-%m-%dT%H:%M:%S"), "preset": preset,
+            "repeat": repeat, "model": model_kind, "environment": _environment(), "results": results}
+
+
+# --- Resultados ---
+def _key(entry):
+    return entry["benchmark"], entry["dataset"], json.dumps(entry["params"], sort_keys=True)
+
+
+def save_results(results, path):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2, ensure_ascii=False)
+    return path
+
+
+def load_results(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def compare(old, new, threshold=0.05):
+    """Compara dos resultados. Devuelve líneas de texto con el cambio de la mediana de cada caso.
+
+    Los cambios menores que ``threshold`` (fracción) se consideran ruido.
+    """
+    lines = []
+    if old.get("model") != new.get("model") or old.get("preset") != new.get("preset"):
+        lines.append(f"Aviso: se comparan ejecuciones distintas (modelo {old.get('model')} -> {new.get('model')}, "
+                     f"preset {old.get('preset')} -> {new.get('preset')}).")
+    previous = {_key(entry): entry for entry in old["results"]}
+    for entry in new["results"]:
+        before = previous.get(_key(entry))
+        label = f"{entry['benchmark']} {entry['dataset']} {json.dumps(entry['params'], ensure_ascii=False)}"
+        if before is None or not before["median_s"]:
+            lines.append(f"  nuevo      {label}: {entry['median_s']:.3f} s")
+            continue
+        change = entry["median_s"] / before["median_s"] - 1.0
+        verdict = "igual" if abs(change) < threshold else "más lento" if change > 0 else "más rápido"
+        lines.append(f"  {verdict:<10} {label}: {before['median_s']:.3f} s -> {entry['median_s']:.3f} s ({change:+.1%})")
+    return lines
+
+
+def default_output(results):
+    """Nombre por defecto del archivo de resultados: benchmark-<preset>-<commit>.json."""
+    commit = results["environment"]["commit"] or time.strftime("%Y%m%d-%H%M%S")
+    kind = "accel" if results["results"] and results["results"][0]["benchmark"] == "accel" else results["preset"]
+    return f"benchmark-{kind}-{commit}.json"
+
+
+if __name__ == "__main__":
+    import cli
+    sys.exit(cli.main(["benchmark"] + sys.argv[1:]))
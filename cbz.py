@@ -0,0 +1,167 @@
+"""Escritura de archivos .cbz con una política de compresión por entrada.
+
+JPEG, PNG y WebP ya están comprimidos: pasarlos por DEFLATE gasta CPU para
+ganar normalmente menos de un 1 %. Las políticas disponibles son:
+
+    auto     formatos ya comprimidos -> ZIP_STORED; el resto se prueba con una muestra
+    sample   todas las entradas se prueban con una muestra
+    store    todo ZIP_STORED
+    deflate  todo ZIP_DEFLATED (comportamiento anterior)
+
+"Probar con una muestra" significa comprimir los primeros bytes con zlib y
+usar DEFLATE solo si ahorran al menos ``min_saving`` (fracción).
+
+El archivo se escribe como ``<nombre>.part`` y se renombra al cerrarlo: un
+proceso interrumpido nunca deja un .cbz truncado con el nombre final.
+"""
+import os
+import time
+import zipfile
+import zlib
+
+POLICY_AUTO = "auto"
+POLICY_SAMPLE = "sample"
+POLICY_STORE = "store"
+POLICY_DEFLATE = "deflate"
+POLICIES = (POLICY_AUTO, POLICY_SAMPLE, POLICY_STORE, POLICY_DEFLATE)
+
+DEFAULT_POLICY = POLICY_AUTO
+DEFAULT_MIN_SAVING = 0.02 # Comprimir solo si la muestra se reduce al menos un 2 %
+DEFAULT_COMPRESSLEVEL = 6
+SAMPLE_SIZE = 64 * 1024
+PART_SUFFIX = ".part"
+
+# Formatos con codificación entrópica propia: DEFLATE apenas los reduce
+PRECOMPRESSED_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp", ".gif", ".avif", ".jxl")
+
+
+def _sample_saves(sample, min_saving, compresslevel):
+    """Indica si comprimir la muestra ahorra al menos ``min_saving``."""
+    if not sample:
+        return False
+    compressed = zlib.compress(sample, compresslevel)
+    return 1.0 - len(compressed) / len(sample) >= min_saving
+
+
+def choose_compression(arcname, sample, policy=DEFAULT_POLICY, min_saving=DEFAULT_MIN_SAVING,
+                       compresslevel=DEFAULT_COMPRESSLEVEL):
+    """Devuelve ZIP_STORED o ZIP_DEFLATED para una entrada según la política."""
+    if policy == POLICY_STORE:
+        return zipfile.ZIP_STORED
+    if policy == POLICY_DEFLATE:
+        return zipfile.ZIP_DEFLATED
+    if policy == POLICY_AUTO and arcname.lower().endswith(PRECOMPRESSED_EXTENSIONS):
+        return zipfile.ZIP_STORED
+    if policy not in POLICIES:
+        raise ValueError(f"Política de compresión desconocida: {policy}")
+    return zipfile.ZIP_DEFLATED if _sample_saves(sample, min_saving, compresslevel) else zipfile.ZIP_STORED
+
+
+class CompressionStats:
+    """Contadores de un capítulo: entradas guardadas/comprimidas y bytes antes/después."""
+
+    def __init__(self):
+        self.stored = 0
+        self.deflated = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def add(self, info):
+        if info.compress_type == zipfile.ZIP_STORED:
+            self.stored += 1
+        else:
+            self.deflated += 1
+        self.bytes_in += info.file_size
+        self.bytes_out += info.compress_size
+
+    @property
+    def saving(self):
+        """Fracción de bytes ahorrada por la compresión (0 si no hay datos)."""
+        return 1.0 - self.bytes_out / self.bytes_in if self.bytes_in else 0.0
+
+    def as_dict(self):
+        return {"stored": self.stored, "deflated": self.deflated, "bytes_in": self.bytes_in,
+                "bytes_out": self.bytes_out, "saving": round(self.saving, 4)}
+
+    def summary(self):
+        return (f"{self.stored + self.deflated} entradas ({self.deflated} comprimidas, {self.stored} sin comprimir), "
+                f"{self.bytes_in / 1e6:.1f} MB -> {self.bytes_out / 1e6:.1f} MB, ahorro {self.saving:.1%}")
+
+
+class CbzWriter:
+    """ZipFile de escritura que elige la compresión de cada entrada y acumula estadísticas.
+
+    Se usa como ``zipfile.ZipFile``::
+
+        with CbzWriter(ruta, policy="auto") as cbz:
+            cbz.write(ruta_imagen, "01.jpg")
+        print(cbz.stats.summary())
+
+    Si el bloque ``with`` termina con una excepción, el archivo temporal se
+    borra y el .cbz anterior (si existía) queda intacto.
+    """
+
+    def __init__(self, zip_filename, policy=DEFAULT_POLICY, min_saving=DEFAULT_MIN_SAVING,
+                 compresslevel=DEFAULT_COMPRESSLEVEL):
+        if policy not in POLICIES:
+            raise ValueError(f"Política de compresión desconocida: {policy}")
+        self.policy = policy
+        self.min_saving = min_saving
+        self.compresslevel = compresslevel
+        self.stats = CompressionStats()
+        self.zip_filename = zip_filename
+        self._part_filename = zip_filename + PART_SUFFIX
+        self._zipf = zipfile.ZipFile(self._part_filename, "w", compression=zipfile.ZIP_DEFLATED,
+                                     compresslevel=compresslevel)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def close(self):
+        """Cierra el archivo y lo renombra a su nombre final (de forma atómica)."""
+        self._zipf.close()
+        os.replace(self._part_filename, self.zip_filename)
+
+    def abort(self):
+        """Cierra y borra el archivo a medio escribir."""
+        try:
+            self._zipf.close()
+        finally:
+            if os.path.exists(self._part_filename):
+                os.remove(self._part_filename)
+
+    def _needs_sample(self, arcname):
+        return self.policy == POLICY_SAMPLE or (
+            self.policy == POLICY_AUTO and not arcname.lower().endswith(PRECOMPRESSED_EXTENSIONS))
+
+    def write(self, filename, arcname):
+        """Añade un archivo del disco como ``arcname``."""
+        sample = b""
+        if self._needs_sample(arcname):
+            with open(filename, "rb") as f:
+                sample = f.read(SAMPLE_SIZE)
+        compress_type = choose_compression(arcname, sample, self.policy, self.min_saving, self.compresslevel)
+        self._zipf.write(filename, arcname, compress_type=compress_type, compresslevel=self.compresslevel)
+        self.stats.add(self._zipf.infolist()[-1])
+
+    def writestr(self, arcname, data, source_path=None):
+        """Añade ``data`` (bytes en memoria) como ``arcname``.
+
+        Con ``source_path`` la entrada toma la fecha de ese archivo, igual que
+        si se hubiera añadido con ``write``.
+        """
+        compress_type = choose_compression(arcname, data[:SAMPLE_SIZE], self.policy, self.min_saving,
+                                           self.compresslevel)
+        if source_path is not None:
+            zinfo = zipfile.ZipInfo.from_file(source_path, arcname)
+        else:
+            zinfo = zipfile.ZipInfo(arcname, time.localtime()[:6])
+        zinfo.compress_type = compress_type
+        self._zipf.writestr(zinfo, data, compresslevel=self.compresslevel)
+        self.stats.add(self._zipf.infolist()[-1])
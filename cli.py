@@ -0,0 +1,565 @@
+"""Interfaz de línea de comandos de Manga Utilities (sin Tk).
+
+Ejemplos:
+    python cli.py compress /ruta/serie --move-to-done
+    python cli.py compress /ruta/serie --upscaler lanczos-x2
+    python cli.py rename /ruta/serie --dry-run
+    python cli.py scan /ruta/serie
+    python cli.py anilist "Berserk" --select 1 --write /ruta/serie
+    python cli.py cache --prune
+    python cli.py models import pytorch_model_2x.pt --sha256 <suma>
+    python cli.py quantize --calibrate /ruta/serie
+    python cli.py export --format onnx
+    python cli.py daemon --backend int8
+    python cli.py upscale pagina.png /ruta/serie/cap1 --output ampliadas
+    python cli.py benchmark --preset quick --compare benchmark-quick-abc1234.json
+    python cli.py startup-time
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+import cbz
+import encoders
+import engine
+import library_index
+import model_store
+import pipeline
+import renamer
+import report
+import sr_cache
+import sr_daemon
+import sr_export
+import sr_quant
+import superres
+import validation
+
+
+class ConsoleReporter:
+    """Callback de progreso que imprime los mensajes del motor en la consola."""
+
+    def __init__(self, verbose=False):
+        self.verbose = verbose
+        self.log = report.ErrorLog()
+        self.final_message = None
+
+    @property
+    def errors(self):
+        return self.log.total('error')
+
+    def __call__(self, message):
+        msg_type, msg_data = message[0], message[1:]
+        if msg_type == 'progress_folder':
+            current, total, name = msg_data
+            print(f"[{current}/{total}] {name}")
+        elif msg_type == 'progress_file':
+            if self.verbose:
+                current, total = msg_data[:2]
+                print(f"    Archivo {current}/{total}")
+        elif msg_type == 'error':
+            self.log.add('error', msg_data[0], report.message_category(message))
+            print(f"ERROR: {msg_data[0]}", file=sys.stderr)
+        elif msg_type == 'warning':
+            self.log.add('warning', msg_data[0], report.message_category(message))
+            print(f"ADVERTENCIA: {msg_data[0]}", file=sys.stderr)
+        elif msg_type == 'info':
+            print(msg_data[0])
+        elif msg_type == 'upscaled':
+            if self.verbose:
+                print(f"    {msg_data[0]} -> {msg_data[1]}")
+        elif msg_type == 'done':
+            self.final_message = msg_data[0] if msg_data and msg_data[0] else "Proceso finalizado."
+            print(self.final_message)
+
+
+def cmd_compress(args):
+    reporter = ConsoleReporter(verbose=args.verbose)
+    sr_daemon.zip_folders(args.source_folder, args.delete_folders, args.move_to_done, args.gpu,
+                          reporter, use_daemon=not args.local, usar_sr=not args.no_sr, sr_tile_size=args.tile_size,
+                          sr_tile_overlap=args.tile_overlap, sr_batch_size=args.batch_size,
+                          decode_workers=args.decode_workers, encode_workers=args.encode_workers,
+                          chapter_workers=args.chapter_workers, compression_policy=args.compression,
+                          compression_min_saving=args.min_saving, output_format=args.format,
+                          output_quality=args.quality,
+                          sr_cache_dir=None if args.no_cache else args.cache_dir,
+                          sr_cache_max_mb=args.cache_max_mb, incremental=not args.force,
+                          validation_workers=args.validation_workers, deep_validation=args.deep_validate,
+                          report_path=False if args.no_report else args.report,
+                          profile_path=args.profile, trace_path=args.trace,
+                          sr_accelerations=list(args.accel), sr_backend=args.backend,
+                          sr_model_dir=args.model_dir, onnx_threads=args.onnx_threads,
+                          sr_workers=args.sr_workers, sr_threads=args.sr_threads, sr_affinity=args.sr_affinity,
+                          sr_upscaler=args.upscaler)
+    print(reporter.log.summary())
+    return 1 if reporter.errors else 0
+
+
+def cmd_upscale(args):
+    reporter = ConsoleReporter(verbose=args.verbose)
+    sr_daemon.upscale_files(args.paths, args.output, args.gpu, reporter, use_daemon=not args.local,
+                            sr_tile_size=args.tile_size, sr_tile_overlap=args.tile_overlap,
+                            sr_batch_size=args.batch_size, sr_cache_dir=None if args.no_cache else args.cache_dir,
+                            sr_upscaler=args.upscaler)
+    print(reporter.log.summary())
+    return 1 if reporter.errors else 0
+
+
+def cmd_daemon(args):
+    state = sr_daemon.find_daemon(args.state)
+    if args.status or args.stop:
+        if state is None:
+            print("No hay ningún servicio de superresolución en marcha.")
+            return 1
+        if args.stop:
+            sr_daemon.request(state, "shutdown")
+            print(f"Servicio (pid {state.get('pid')}) detenido.")
+            return 0
+        status = sr_daemon.request(state, "status")["status"]
+        current = status["current"]
+        print(f"Servicio en marcha (pid {status['pid']}, {status['uptime_s']:.0f} s): "
+              f"modelo {'cargado' if status['model_loaded'] else 'sin cargar'}, "
+              f"{status['jobs_done']} trabajos hechos, {status['queued']} en cola")
+        if status.get("models"):
+            print(f"Modelos en memoria: {', '.join(status['models'])}")
+        if current:
+            print(f"Trabajo actual: {current['command']} {current['folder'] or ''}".rstrip())
+        return 0
+    if state is not None:
+        print(f"Ya hay un servicio en marcha (pid {state.get('pid')}).", file=sys.stderr)
+        return 1
+    superres.MAX_LOADED_MODELS = args.max_models
+    daemon = sr_daemon.SrDaemon(port=args.port, unix_socket=args.socket, state_path=args.state, usar_gpu=args.gpu,
+                                job_defaults={"sr_backend": args.backend, "sr_model_dir": os.path.abspath(args.model_dir),
+                                              "sr_workers": args.sr_workers, "sr_threads": args.sr_threads,
+                                              "sr_upscaler": args.upscaler})
+    daemon.warm_up()
+    try:
+        daemon.serve_forever()
+    except KeyboardInterrupt:
+        print("Servicio detenido.")
+    return 0
+
+
+def cmd_cache(args):
+    cache = sr_cache.SrCache(args.cache_dir, args.max_mb * 1024 * 1024)
+    if args.clear:
+        removed, freed = cache.clear()
+        print(f"Se borraron {removed} entradas ({freed / 1e6:.1f} MB).")
+    elif args.prune:
+        removed, freed = cache.prune()
+        print(f"Se borraron {removed} entradas poco usadas ({freed / 1e6:.1f} MB).")
+    entries, size = cache.size()
+    print(f"Caché de superresolución en {args.cache_dir}: {entries} entradas, {size / 1e6:.1f} MB "
+          f"(límite {args.max_mb} MB)")
+    return 0
+
+
+def cmd_models(args):
+    if args.action in ("import", "remove") and not args.target:
+        print(f"ERROR: 'models {args.action}' necesita un archivo o una clave.", file=sys.stderr)
+        return 2
+    try:
+        if args.action == "import":
+            entry = model_store.import_weights(args.target, args.architecture, args.scale,
+                                               expected_sha256=args.sha256, directory=args.store_dir)
+            print(f"{entry['key']} importado: {entry['bytes'] / 1e6:.1f} MB, SHA-256 {entry['sha256']}")
+        elif args.action == "download":
+            entry = model_store.download(args.architecture, args.scale, args.store_dir)
+            print(f"{entry['key']} descargado e importado: SHA-256 {entry['sha256']}")
+        elif args.action == "remove":
+            if not model_store.remove(args.target, args.store_dir):
+                print(f"ERROR: {args.target} no está en el almacén.", file=sys.stderr)
+                return 1
+            print(f"{args.target} borrado.")
+        elif args.action == "verify":
+            results = model_store.verify_all(args.store_dir)
+            for key, ok, detail in results:
+                print(f"{key}: {detail}")
+            return 0 if all(ok for _, ok, _ in results) else 1
+    except (OSError, ValueError, ImportError) as e:
+        print(f"ERROR: {e}", file=sys.stderr)
+        return 1
+    entries = model_store.available(args.store_dir)
+    print(f"Almacén de modelos en {args.store_dir}: {len(entries)} modelo{'s' if len(entries) != 1 else ''}")
+    for entry in entries:
+        print(f"  {entry['key']}: {entry['bytes'] / 1e6:.1f} MB, SHA-256 {entry['sha256'][:12]}, "
+              f"importado {entry['imported']} de {entry['source']}")
+    print(f"Sin pesos: {', '.join(f'{superres.UPSCALER_LANCZOS}-x{scale}' for scale in superres.SCALES)} "
+          f"(Pillow, para --upscaler)")
+    return 0
+
+
+def cmd_quantize(args):
+    model_sr, model_error = superres.get_model()
+    if model_sr is None:
+        print(f"ERROR: el modelo de superresolución no se cargó: {model_error}", file=sys.stderr)
+        return 1
+    path = sr_quant.model_path(model_sr, args.model_dir)
+    if os.path.exists(path) and not args.force:
+        print(f"El modelo int8 ya existe: {path} (usa --force para regenerarlo)")
+        return 0
+    pages = sr_quant.library_pages(args.calibrate) if args.calibrate else None
+    if args.calibrate and not pages:
+        print(f"ERROR: no hay imágenes para calibrar en {args.calibrate}", file=sys.stderr)
+        return 1
+    try:
+        path, info = sr_quant.build(model_sr, pages, args.model_dir, args.pages)
+    except Exception as e:
+        print(f"ERROR: no se pudo cuantizar el modelo: {e}", file=sys.stderr)
+        return 1
+    print(f"Modelo int8 guardado en: {path}")
+    print(f"Calibración: {info['calibration_pages']} páginas ({info['calibration']}), motor {info['engine']}")
+    print(f"Calidad frente a fp32: PSNR {info['psnr_db']} dB; "
+          f"{info['fp32_ms']:.0f} -> {info['int8_ms']:.0f} ms por tesela de {sr_quant.CALIBRATION_TILE} px")
+    return 0
+
+
+def cmd_export(args):
+    model_sr, model_error = superres.get_model()
+    if model_sr is None:
+        print(f"ERROR: el modelo de superresolución no se cargó: {model_error}", file=sys.stderr)
+        return 1
+    errors = 0
+    for kind in args.format or (superres.BACKEND_TORCHSCRIPT, superres.BACKEND_ONNX):
+        path = sr_export.export_path(model_sr, kind, args.model_dir)
+        if os.path.exists(path) and not args.force:
+            print(f"El modelo {kind} ya existe: {path} (usa --force para regenerarlo)")
+            continue
+        try:
+            path, info = sr_export.export(model_sr, kind, args.model_dir)
+        except Exception as e:
+            print(f"ERROR: no se pudo exportar a {kind}: {e}", file=sys.stderr)
+            errors += 1
+            continue
+        quality = "idéntico" if info["psnr_db"] is None else f"PSNR {info['psnr_db']} dB"
+        print(f"Modelo {kind} guardado en: {path}")
+        print(f"  Paridad con PyTorch: diferencia máxima {info['max_abs_diff']:.2g}, {quality}; "
+              f"{info['torch_ms']:.0f} -> {info['export_ms']:.0f} ms por tesela")
+    return 1 if errors else 0
+
+
+def cmd_rename(args):
+    reporter = ConsoleReporter()
+    if args.undo:
+        restored = engine.undo_autorename(args.folder, reporter, args.workers)
+        if restored is None:
+            return 1
+        print(f"Se restauraron {restored} imágenes a su nombre original.")
+        return 1 if reporter.errors else 0
+    result = engine.autorename_images_in_subfolders(args.folder, reporter, args.dry_run, args.workers)
+    if result is None:
+        return 1
+    renamed_count, subfolder_count = result
+    if args.dry_run:
+        print(f"Se renombrarían {renamed_count} imágenes en {subfolder_count} subcarpetas (simulación).")
+    else:
+        print(f"Se renombraron {renamed_count} imágenes en {subfolder_count} subcarpetas.")
+    return 0
+
+
+def cmd_scan(args):
+    if not os.path.isdir(args.folder):
+        print("ERROR: La ruta proporcionada no es una carpeta válida.", file=sys.stderr)
+        return 1
+    with library_index.LibraryIndex(args.folder) as index:
+        folders, changed, probed = index.scan(args.workers, full=args.full)
+        pages = sum(1 for rows in index.all_pages().values() for row in rows if row[3] is not None)
+    print(f"{folders} subcarpetas ({changed} revisadas), {pages} imágenes, {probed} archivos leídos.")
+    return 0
+
+
+def cmd_anilist(args):
+    import anilist # Solo se importa requests si se usa AniList
+
+    try:
+        results = anilist.search_anilist(args.title)
+    except Exception as e:
+        print(f"ERROR: Error en la búsqueda: {e}", file=sys.stderr)
+        return 1
+    if not results:
+        print("No se encontraron resultados para la búsqueda.")
+        return 1
+
+    if args.select is None:
+        for index, media in enumerate(results, start=1):
+            print(f"{index:2d}. {anilist.format_title(media)}")
+        return 0
+
+    if not 1 <= args.select <= len(results):
+        print(f"ERROR: --select debe estar entre 1 y {len(results)}.", file=sys.stderr)
+        return 1
+    data = anilist.build_details(results[args.select - 1])
+    if args.write:
+        print(f"Archivo JSON guardado en: {anilist.write_details_json(args.write, data)}")
+    else:
+        import json
+        print(json.dumps(data, indent=4, ensure_ascii=False))
+    return 0
+
+
+def cmd_benchmark(args):
+    import benchmark # Importa torch: solo al pedir el benchmark
+
+    try:
+        if args.accel:
+            print("Aceleraciones de la inferencia frente a fp32:")
+            results = benchmark.run_acceleration_comparison(args.preset, args.model, args.repeat)
+        else:
+            results = benchmark.run_benchmarks(args.preset, args.model, args.repeat, args.workdir, args.only)
+    except Exception as e:
+        print(f"ERROR: el benchmark falló: {e}", file=sys.stderr)
+        return 1
+    output = args.output or benchmark.default_output(results)
+    print(f"Resultados guardados en: {benchmark.save_results(results, output)}")
+    if args.compare:
+        print(f"Comparación con {args.compare}:")
+        for line in benchmark.compare(benchmark.load_results(args.compare), results, args.threshold):
+            print(line)
+    return 0
+
+
+# Módulos que la GUI y la CLI importan al arrancar, y los que nunca deberían cargarse con ellos
+STARTUP_MODULES = ("engine", "anilist", "superres")
+HEAVY_MODULES = ("torch", "super_image")
+
+_STARTUP_PROBE = (
+    "import sys, time\n"
+    "t0 = time.perf_counter()\n"
+    "import {modules}\n"
+    "print(time.perf_counter() - t0)\n"
+    "print(','.join(m for m in {heavy!r} if m in sys.modules))\n"
+)
+
+
+def cmd_startup_time(args):
+    """Mide en procesos nuevos lo que tarda importar los módulos de arranque."""
+    code = _STARTUP_PROBE.format(modules=", ".join(STARTUP_MODULES), heavy=HEAVY_MODULES)
+    timings = []
+    heavy_loaded = set()
+    for _ in range(args.repeat):
+        result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)))
+        if result.returncode != 0:
+            print(f"ERROR: {result.stderr.strip()}", file=sys.stderr)
+            return 1
+        lines = result.stdout.splitlines() + [""]
+        timings.append(float(lines[0]))
+        loaded = lines[1]
+        heavy_loaded.update(m for m in loaded.split(",") if m)
+
+    timings.sort()
+    print(f"Importación de {', '.join(STARTUP_MODULES)}: mínimo {timings[0] * 1000:.0f} ms, "
+          f"mediana {timings[len(timings) // 2] * 1000:.0f} ms ({args.repeat} arranques)")
+    if heavy_loaded:
+        print(f"ERROR: se importaron módulos pesados al arrancar: {', '.join(sorted(heavy_loaded))}", file=sys.stderr)
+        return 1
+    if args.max_ms is not None and timings[len(timings) // 2] * 1000 > args.max_ms:
+        print(f"ERROR: el arranque supera el límite de {args.max_ms} ms", file=sys.stderr)
+        return 1
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Manga Utilities sin interfaz gráfica.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    compress = subparsers.add_parser("compress", help="Comprime cada subcarpeta en un .cbz (CompressIt).")
+    compress.add_argument("source_folder", help="Carpeta que contiene las subcarpetas de capítulos.")
+    compress.add_argument("--delete-folders", action="store_true", help="Eliminar las carpetas originales.")
+    compress.add_argument("--move-to-done", action="store_true", help="Mover la carpeta de origen a 'Done'.")
+    compress.add_argument("--gpu", action="store_true", help="Usar GPU para la superresolución.")
+    compress.add_argument("--no-sr", action="store_true", help="No aplicar superresolución.")
+    compress.add_argument("--upscaler", default=superres.DEFAULT_UPSCALER,
+                          help="Ampliador: un modelo del almacén (arquitectura-xEscala, p. ej. msrn-x2 o edsr-x4; "
+                               "ver 'models') o lanczos-x2/x3/x4, rápido y sin modelo.")
+    compress.add_argument("--tile-size", type=int, default=superres.DEFAULT_TILE_SIZE,
+                          help="Tamaño de tesela para la superresolución en px (0 = página entera).")
+    compress.add_argument("--tile-overlap", type=int, default=superres.DEFAULT_TILE_OVERLAP,
+                          help="Solapamiento entre teselas en px.")
+    compress.add_argument("--batch-size", type=int, default=superres.DEFAULT_BATCH_SIZE,
+                          help="Páginas o teselas del mismo tamaño por pasada del modelo.")
+    compress.add_argument("--decode-workers", type=int, default=pipeline.DEFAULT_DECODE_WORKERS,
+                          help="Hilos que leen las páginas a ampliar o recodificar.")
+    compress.add_argument("--encode-workers", type=int, default=pipeline.DEFAULT_ENCODE_WORKERS,
+                          help="Hilos que codifican las páginas de salida.")
+    compress.add_argument("--chapter-workers", type=int, default=1,
+                          help="Sin superresolución: capítulos empaquetados a la vez en procesos (0 = uno por núcleo).")
+    compress.add_argument("--accel", type=superres.parse_accelerations, default=superres.DEFAULT_ACCELERATIONS,
+                          help=f"Aceleraciones de la inferencia separadas por comas: {', '.join(superres.ACCELERATIONS)} "
+                               f"o none (por defecto {','.join(superres.DEFAULT_ACCELERATIONS)}).")
+    compress.add_argument("--backend", choices=superres.BACKENDS, default=superres.DEFAULT_BACKEND,
+                          help="Modelo de superresolución: fp32, int8 (cuantizado, solo CPU; ver 'quantize'), "
+                               "torchscript u onnx (ONNX Runtime, solo CPU; ver 'export').")
+    compress.add_argument("--model-dir", default=sr_quant.DEFAULT_MODEL_DIR,
+                          help="Carpeta donde se guardan los modelos int8 y exportados.")
+    compress.add_argument("--onnx-threads", type=int, default=0,
+                          help="Hilos intra-op de ONNX Runtime (0 = automático).")
+    compress.add_argument("--sr-workers", type=int, default=1,
+                          help="En CPU: procesos de superresolución, cada uno con su modelo "
+                               "(0 = según núcleos y memoria).")
+    compress.add_argument("--sr-threads", type=int, default=0,
+                          help="Hilos de inferencia por proceso de superresolución (0 = automático).")
+    compress.add_argument("--sr-affinity", action="store_true",
+                          help="Fijar cada proceso de superresolución a sus propios núcleos (Linux).")
+    compress.add_argument("--format", choices=encoders.FORMAT_CHOICES, default=encoders.DEFAULT_FORMAT,
+                          help="Formato de las páginas de salida (auto: JPEG si se amplían, si no se copian).")
+    compress.add_argument("--quality", type=int, default=encoders.DEFAULT_QUALITY,
+                          help="Calidad para JPEG/WebP con pérdida.")
+    compress.add_argument("--compression", choices=cbz.POLICIES, default=cbz.DEFAULT_POLICY,
+                          help="Política de compresión de las entradas del .cbz.")
+    compress.add_argument("--min-saving", type=float, default=cbz.DEFAULT_MIN_SAVING,
+                          help="Ahorro mínimo (fracción) de la muestra para usar DEFLATE.")
+    compress.add_argument("--cache-dir", default=sr_cache.DEFAULT_CACHE_DIR,
+                          help="Carpeta de la caché de páginas ampliadas (o la variable MANGA_SR_CACHE).")
+    compress.add_argument("--cache-max-mb", type=int, default=sr_cache.DEFAULT_MAX_MB,
+                          help="Tamaño máximo de la caché en MB; se borran las entradas menos usadas.")
+    compress.add_argument("--no-cache", action="store_true", help="No usar la caché de superresolución.")
+    compress.add_argument("--validation-workers", type=int, default=validation.DEFAULT_WORKERS,
+                          help="Hilos que validan las cabeceras de las páginas.")
+    compress.add_argument("--deep-validate", action="store_true",
+                          help="Verificar además cada página por completo con Pillow (más lento).")
+    compress.add_argument("--force", action="store_true",
+                          help="Reconstruir todos los .cbz aunque el manifiesto diga que están al día.")
+    compress.add_argument("--report", metavar="RUTA",
+                          help=f"Dónde guardar el informe JSON (por defecto {report.REPORT_NAME} en la carpeta).")
+    compress.add_argument("--no-report", action="store_true", help="No guardar el informe JSON del trabajo.")
+    compress.add_argument("--profile", metavar="ARCHIVO",
+                          help="Guardar un perfil de cProfile del trabajo (ver con python -m pstats).")
+    compress.add_argument("--trace", metavar="ARCHIVO",
+                          help="Guardar el tiempo de cada etapa y página en JSON Lines.")
+    compress.add_argument("--local", action="store_true",
+                          help="Trabajar en este proceso aunque haya un servicio de superresolución (ver 'daemon').")
+    compress.add_argument("-v", "--verbose", action="store_true", help="Mostrar el progreso por archivo.")
+    compress.set_defaults(func=cmd_compress)
+
+    upscale = subparsers.add_parser("upscale", help="Amplía imágenes sueltas o carpetas de capítulo a JPEG.")
+    upscale.add_argument("paths", nargs="+", help="Imágenes o carpetas de capítulo.")
+    upscale.add_argument("--output", required=True, metavar="CARPETA", help="Carpeta donde guardar las imágenes.")
+    upscale.add_argument("--gpu", action="store_true", help="Usar GPU para la superresolución.")
+    upscale.add_argument("--upscaler", default=superres.DEFAULT_UPSCALER,
+                         help="Ampliador, como en compress (p. ej. msrn-x2, edsr-x4 o lanczos-x2).")
+    upscale.add_argument("--tile-size", type=int, default=superres.DEFAULT_TILE_SIZE,
+                         help="Tamaño de tesela en px (0 = página entera).")
+    upscale.add_argument("--tile-overlap", type=int, default=superres.DEFAULT_TILE_OVERLAP,
+                         help="Solapamiento entre teselas en px.")
+    upscale.add_argument("--batch-size", type=int, default=superres.DEFAULT_BATCH_SIZE,
+                         help="Páginas o teselas del mismo tamaño por pasada del modelo.")
+    upscale.add_argument("--cache-dir", default=sr_cache.DEFAULT_CACHE_DIR, help="Carpeta de la caché.")
+    upscale.add_argument("--no-cache", action="store_true", help="No usar la caché de superresolución.")
+    upscale.add_argument("--local", action="store_true",
+                         help="Trabajar en este proceso aunque haya un servicio de superresolución.")
+    upscale.add_argument("-v", "--verbose", action="store_true", help="Mostrar cada imagen guardada.")
+    upscale.set_defaults(func=cmd_upscale)
+
+    daemon = subparsers.add_parser("daemon", help="Servicio local que mantiene el modelo cargado entre trabajos.")
+    daemon.add_argument("--port", type=int, default=0, help="Puerto en 127.0.0.1 (0 = uno libre).")
+    daemon.add_argument("--socket", metavar="RUTA", help="Escuchar en un socket Unix en lugar de TCP.")
+    daemon.add_argument("--gpu", action="store_true", help="Usar GPU para la superresolución.")
+    daemon.add_argument("--backend", choices=superres.BACKENDS, default=superres.DEFAULT_BACKEND,
+                        help="Modelo para los trabajos que no indican otro (los de la interfaz gráfica).")
+    daemon.add_argument("--model-dir", default=sr_quant.DEFAULT_MODEL_DIR,
+                        help="Carpeta de los modelos int8 y exportados.")
+    daemon.add_argument("--sr-workers", type=int, default=1,
+                        help="Procesos de superresolución para los trabajos que no indican otros.")
+    daemon.add_argument("--sr-threads", type=int, default=0, help="Hilos de inferencia por proceso (0 = automático).")
+    daemon.add_argument("--upscaler", default=superres.DEFAULT_UPSCALER,
+                        help="Ampliador para los trabajos que no indican otro.")
+    daemon.add_argument("--max-models", type=int, default=superres.MAX_LOADED_MODELS,
+                        help="Modelos que se conservan cargados a la vez (o la variable MANGA_SR_MAX_MODELS).")
+    daemon.add_argument("--state", default=sr_daemon.STATE_PATH,
+                        help="Archivo con la dirección y el token del servicio (o la variable MANGA_DAEMON_STATE).")
+    daemon.add_argument("--status", action="store_true", help="Mostrar el estado del servicio en marcha.")
+    daemon.add_argument("--stop", action="store_true", help="Detener el servicio en marcha.")
+    daemon.set_defaults(func=cmd_daemon)
+
+    rename = subparsers.add_parser("rename", help="Renombra las imágenes de cada subcarpeta (SnapTitle).")
+    rename.add_argument("folder", help="Carpeta padre con las subcarpetas a renombrar.")
+    rename.add_argument("--dry-run", action="store_true", help="Mostrar el plan sin renombrar nada.")
+    rename.add_argument("--undo", action="store_true", help="Deshacer el último renombrado de esta carpeta.")
+    rename.add_argument("--workers", type=int, default=renamer.DEFAULT_WORKERS,
+                        help="Subcarpetas que se renombran a la vez.")
+    rename.set_defaults(func=cmd_rename)
+
+    scan = subparsers.add_parser("scan", help="Actualiza el índice de la biblioteca.")
+    scan.add_argument("folder", help="Carpeta padre con las subcarpetas de capítulos.")
+    scan.add_argument("--full", action="store_true", help="Comprobar todos los archivos, no solo las carpetas modificadas.")
+    scan.add_argument("--workers", type=int, default=validation.DEFAULT_WORKERS, help="Hilos que leen cabeceras.")
+    scan.set_defaults(func=cmd_scan)
+
+    anilist_parser = subparsers.add_parser("anilist", help="Busca un manga en AniList.")
+    anilist_parser.add_argument("title", help="Título a buscar.")
+    anilist_parser.add_argument("--select", type=int, help="Número del resultado a usar (1..N).")
+    anilist_parser.add_argument("--write", metavar="CARPETA", help="Guardar details.json en esta carpeta.")
+    anilist_parser.set_defaults(func=cmd_anilist)
+
+    cache_parser = subparsers.add_parser("cache", help="Muestra, recorta o vacía la caché de superresolución.")
+    cache_parser.add_argument("--cache-dir", default=sr_cache.DEFAULT_CACHE_DIR, help="Carpeta de la caché.")
+    cache_parser.add_argument("--max-mb", type=int, default=sr_cache.DEFAULT_MAX_MB,
+                              help="Límite de tamaño en MB para --prune.")
+    cache_parser.add_argument("--prune", action="store_true", help="Borrar las entradas menos usadas hasta el límite.")
+    cache_parser.add_argument("--clear", action="store_true", help="Vaciar la caché.")
+    cache_parser.set_defaults(func=cmd_cache)
+
+    models = subparsers.add_parser("models", help="Almacén local de pesos de superresolución (sin red al arrancar).")
+    models.add_argument("action", nargs="?", default="list", choices=("list", "import", "download", "verify", "remove"),
+                        help="list: mostrar los modelos; import: importar un archivo .pt/.safetensors o una carpeta "
+                             "de super_image; download: descargarlo de Hugging Face; verify: comprobar las sumas; "
+                             "remove: borrar un modelo por su clave.")
+    models.add_argument("target", nargs="?", help="Archivo o carpeta a importar, o clave a borrar (p. ej. msrn-x2).")
+    models.add_argument("--architecture", choices=tuple(model_store.ARCHITECTURES),
+                        default=superres.MODEL_ARCHITECTURE, help="Arquitectura de los pesos.")
+    models.add_argument("--scale", type=int, default=superres.MODEL_SCALE, help="Escala de los pesos.")
+    models.add_argument("--sha256", help="Suma SHA-256 esperada del archivo a importar.")
+    models.add_argument("--store-dir", default=model_store.DEFAULT_STORE_DIR,
+                        help="Carpeta del almacén (o la variable MANGA_MODEL_STORE).")
+    models.set_defaults(func=cmd_models)
+
+    quant = subparsers.add_parser("quantize", help="Genera el modelo int8 para CPU y compara su calidad con fp32.")
+    quant.add_argument("--calibrate", metavar="CARPETA",
+                       help="Biblioteca con páginas para calibrar (por defecto, páginas sintéticas).")
+    quant.add_argument("--pages", type=int, default=sr_quant.DEFAULT_CALIBRATION_PAGES,
+                       help="Páginas usadas en la calibración.")
+    quant.add_argument("--model-dir", default=sr_quant.DEFAULT_MODEL_DIR, help="Carpeta donde guardar el modelo.")
+    quant.add_argument("--force", action="store_true", help="Regenerar el modelo aunque ya exista.")
+    quant.set_defaults(func=cmd_quantize)
+
+    export_parser = subparsers.add_parser("export", help="Exporta MSRN a TorchScript y ONNX y comprueba la paridad.")
+    export_parser.add_argument("--format", action="append",
+                               choices=(superres.BACKEND_TORCHSCRIPT, superres.BACKEND_ONNX),
+                               help="Formato a exportar (se puede repetir; por defecto ambos).")
+    export_parser.add_argument("--model-dir", default=sr_quant.DEFAULT_MODEL_DIR,
+                               help="Carpeta donde guardar los modelos.")
+    export_parser.add_argument("--force", action="store_true", help="Regenerar aunque ya existan.")
+    export_parser.set_defaults(func=cmd_export)
+
+    bench = subparsers.add_parser("benchmark", help="Mide el rendimiento con capítulos sintéticos.")
+    bench.add_argument("--preset", choices=("quick", "full"), default="quick",
+                       help="quick: páginas pequeñas y una repetición; full: tamaño real y tres repeticiones.")
+    bench.add_argument("--model", choices=("auto", "pretrained", "tiny"), default="auto",
+                       help="Modelo de superresolución (auto = preentrenado si está descargado, si no uno aleatorio).")
+    bench.add_argument("--repeat", type=int, help="Repeticiones de cada caso (se guarda la mediana).")
+    bench.add_argument("--accel", action="store_true",
+                       help="Comparar las aceleraciones de la inferencia (velocidad y PSNR frente a fp32).")
+    bench.add_argument("--only", metavar="TEXTO", help="Solo los benchmarks cuyo nombre contiene este texto.")
+    bench.add_argument("--workdir", help="Carpeta donde generar los datos (por defecto la temporal del sistema).")
+    bench.add_argument("--output", help="Archivo JSON de resultados (por defecto benchmark-<preset>-<commit>.json).")
+    bench.add_argument("--compare", metavar="JSON", help="Comparar con los resultados de otra ejecución.")
+    bench.add_argument("--threshold", type=float, default=0.05,
+                       help="Cambio relativo por debajo del cual se considera ruido (0.05 = 5 %%).")
+    bench.set_defaults(func=cmd_benchmark)
+
+    startup = subparsers.add_parser("startup-time", help="Mide el tiempo de importación al arrancar.")
+    startup.add_argument("--repeat", type=int, default=5, help="Número de arranques a medir.")
+    startup.add_argument("--max-ms", type=float, help="Fallar si la mediana supera este límite.")
+    startup.set_defaults(func=cmd_startup_time)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
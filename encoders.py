@@ -0,0 +1,108 @@
+"""Codificación de las páginas de salida (formato y calidad por trabajo).
+
+Formatos: ``jpeg``, ``webp``, ``webp-lossless``, ``png``, ``keep`` (el mismo
+formato que la página original) o ``auto`` (JPEG para las páginas ampliadas;
+sin superresolución las páginas se copian tal cual). La extensión de la
+entrada en el .cbz se ajusta al formato real, así una página ``.png`` nunca
+contiene datos JPEG.
+Las páginas originales en escala de grises se guardan en escala de grises.
+"""
+import io
+import os
+from PIL import Image
+
+FORMAT_AUTO = "auto"
+FORMAT_KEEP = "keep"
+# formato -> (formato de Pillow, extensión, sin pérdida)
+FORMATS = {
+    "jpeg": ("JPEG", ".jpg", False),
+    "webp": ("WEBP", ".webp", False),
+    "webp-lossless": ("WEBP", ".webp", True),
+    "png": ("PNG", ".png", True),
+}
+FORMAT_CHOICES = (FORMAT_AUTO, FORMAT_KEEP) + tuple(FORMATS)
+
+# auto: JPEG para las páginas ampliadas (como antes) y sin recodificar si no hay superresolución
+DEFAULT_FORMAT = FORMAT_AUTO
+DEFAULT_QUALITY = 95
+
+# Formato de Pillow de la página original -> formato de salida con "keep"
+_KEEP_FORMATS = {"JPEG": "jpeg", "WEBP": "webp", "PNG": "png"}
+
+
+class OutputEncoder:
+    """Codifica arrays (H, W, 3) uint8 con el formato y la calidad elegidos."""
+
+    def __init__(self, format=DEFAULT_FORMAT, quality=DEFAULT_QUALITY):
+        if format not in FORMAT_CHOICES:
+            raise ValueError(f"Formato de salida desconocido: {format}")
+        self.format = format
+        self.quality = quality
+
+    @property
+    def passthrough(self):
+        """Sin superresolución, las páginas se copian sin recodificar."""
+        return self.format in (FORMAT_AUTO, FORMAT_KEEP)
+
+    def resolve(self, source_format):
+        """Formato de salida para una página cuyo formato original es ``source_format`` (de Pillow)."""
+        if self.format == FORMAT_KEEP:
+            return _KEEP_FORMATS.get(source_format, "png")
+        if self.format == FORMAT_AUTO:
+            return "jpeg"
+        return self.format
+
+    def arcname(self, arcname, source_format):
+        """Nombre de la entrada con la extensión del formato de salida."""
+        return os.path.splitext(arcname)[0] + FORMATS[self.resolve(source_format)][1]
+
+    def encode(self, pixels, source_format=None, grayscale=False):
+        """Codifica la página y devuelve los bytes."""
+        pil_format, _, lossless = FORMATS[self.resolve(source_format)]
+        image = Image.fromarray(pixels, 'RGB')
+        if grayscale:
+            image = image.convert('L')
+        options = {}
+        if pil_format == "JPEG":
+            options = {"quality": self.quality, "optimize": False}
+        elif pil_format == "WEBP":
+            options = {"lossless": True} if lossless else {"quality": self.quality, "method": 4}
+        elif pil_format == "PNG":
+            options = {"compress_level": 6}
+        buffer = io.BytesIO()
+        image.save(buffer, format=pil_format, **options)
+        return buffer.getvalue()
+
+    def cache_key(self):
+        """Texto que identifica estos ajustes (para cachés de resultados)."""
+        # auto produce lo mismo que jpeg: comparten las entradas de la caché
+        format = "jpeg" if self.format == FORMAT_AUTO else self.format
+        return f"{format}:q{self.quality}"
+
+
+class EncodeStats:
+    """Bytes por página de un capítulo."""
+
+    def __init__(self):
+        self.pages = 0
+        self.total_bytes = 0
+        self.min_bytes = None
+        self.max_bytes = 0
+
+    def add(self, size):
+        self.pages += 1
+        self.total_bytes += size
+        self.min_bytes = size if self.min_bytes is None else min(self.min_bytes, size)
+        self.max_bytes = max(self.max_bytes, size)
+
+    @property
+    def mean_bytes(self):
+        return self.total_bytes / self.pages if self.pages else 0.0
+
+    def as_dict(self):
+        return {"pages": self.pages, "total_bytes": self.total_bytes, "mean_bytes": round(self.mean_bytes),
+                "min_bytes": self.min_bytes or 0, "max_bytes": self.max_bytes}
+
+    def summary(self):
+        return (f"{self.pages} páginas, media {self.mean_bytes / 1024:.0f} KB/página "
+                f"(mín {(self.min_bytes or 0) / 1024:.0f} KB, máx {self.max_bytes / 1024:.0f} KB)")
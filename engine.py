@@ -0,0 +1,881 @@
+"""Motor sin interfaz de CompressIt y SnapTitle.
+
+Este módulo no crea ventanas ni carga el modelo al importarse: se puede usar
+desde la GUI, desde ``cli.py`` o desde cualquier otro script. El progreso se
+comunica llamando a ``progress_callback`` con tuplas ``(tipo, *datos)``:
+
+    ('progress_total', páginas, bytes)            total del trabajo, al empezar
+    ('progress_folder', actual, total, nombre)
+    ('progress_file', actual, total, bytes)       bytes de las páginas escritas desde el anterior
+    ('info', mensaje)
+    ('warning' | 'error', mensaje, categoría)     categoría: report.CATEGORY_*
+    ('chapter', nombre, datos)                    estadísticas de un capítulo terminado
+    ('upscaled', origen, destino)                 imagen guardada por upscale_files
+    ('done', mensaje_final_o_None)
+
+Los mensajes de progreso pueden llegar miles de veces por segundo; la GUI
+los agrega con progress.ProgressState en lugar de encolarlos uno a uno. Los
+errores y advertencias se cuentan por categoría (ver report.py) en lugar de
+mostrarse uno a uno.
+"""
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from PIL import Image
+
+import cbz
+import encoders
+import library_index
+import manifest
+import pipeline
+import profiling
+import renamer
+import report
+import sr_cache
+import sr_export
+import sr_pool
+import sr_quant
+import superres
+import validation
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp")
+
+_resident_pools = {} # Ajustes -> sr_pool.SrPool que se conserva entre trabajos (keep_sr_pool)
+
+
+def _emit(progress_callback, *message):
+    """Envía un mensaje de progreso si hay callback."""
+    if progress_callback is not None:
+        progress_callback(message)
+
+
+# --- Funciones Auxiliares ---
+def is_image(filename):
+    """Verifica si un archivo es una imagen válida."""
+    try:
+        with Image.open(filename) as img:
+            img.verify() # Verifica la cabecera, no decodifica toda la imagen
+        return True
+    except Exception:
+        return False
+
+
+def autorename_images_in_subfolders(folder_path, progress_callback=None, dry_run=False,
+                                    workers=renamer.DEFAULT_WORKERS):
+    """Renombra imágenes en subcarpetas a un formato secuencial (01.ext, 02.ext...).
+
+    Devuelve (imágenes_renombradas, subcarpetas) o None si la ruta no es válida.
+    Las imágenes de cada subcarpeta salen del índice de la biblioteca (ver
+    library_index.py): solo se abren los archivos nuevos o modificados. El
+    renombrado se planifica y aplica con renamer.py (orden natural, sin
+    colisiones, diario para deshacer); con ``dry_run`` devuelve cuántas se
+    renombrarían sin tocar nada. Los fallos se informan juntos en un solo
+    'warning' al final.
+    """
+    if not os.path.isdir(folder_path):
+        _emit(progress_callback, 'error', "La ruta proporcionada no es una carpeta válida.", report.CATEGORY_SOURCE)
+        return None
+
+    try:
+        with library_index.LibraryIndex(folder_path) as index:
+            index.scan()
+            library = index.all_pages()
+    except OSError as e:
+        _emit(progress_callback, 'error', f"Error listando subcarpetas en {folder_path}: {e}", report.CATEGORY_SOURCE)
+        return None
+
+    # Recorre solo el primer nivel de subcarpetas
+    folders = {}
+    for item, rows in library.items():
+        if os.path.isdir(os.path.join(folder_path, item)):
+            folders[item] = [name for name, _, _, image_format, _, _ in rows if image_format is not None]
+
+    try:
+        renamed_count, errors, plans = renamer.rename_library(folder_path, folders, workers, dry_run)
+    except OSError as e:
+        # No se pudo escribir el diario: no se ha renombrado nada
+        _emit(progress_callback, 'error', f"No se pudo guardar el diario de renombrado: {e}", report.CATEGORY_RENAME)
+        return None
+    if dry_run:
+        for item, plan in sorted(plans.items()):
+            moves = "\n".join(f"    {original} -> {new_filename}" for original, _, new_filename in plan)
+            _emit(progress_callback, 'info', f"{item}:\n{moves}")
+    if errors:
+        for error in errors:
+            print(f"Error al renombrar en {error}")
+        shown = "\n".join(errors[:10])
+        if len(errors) > 10:
+            shown += f"\n... y {len(errors) - 10} más"
+        _emit(progress_callback, 'warning', f"No se pudieron renombrar {len(errors)} subcarpetas (quedan como estaban):\n{shown}",
+              report.CATEGORY_RENAME)
+
+    return renamed_count, len(folders)
+
+
+def undo_autorename(folder_path, progress_callback=None, workers=renamer.DEFAULT_WORKERS):
+    """Deshace el último renombrado de SnapTitle en ``folder_path``. Devuelve los archivos restaurados o None."""
+    if not renamer.has_journal(folder_path):
+        _emit(progress_callback, 'error', "No hay ningún renombrado que deshacer en esta carpeta.", report.CATEGORY_RENAME)
+        return None
+    try:
+        restored, errors = renamer.undo(folder_path, workers)
+    except (OSError, ValueError) as e:
+        _emit(progress_callback, 'error', f"No se pudo leer el diario de renombrado: {e}", report.CATEGORY_RENAME)
+        return None
+    if errors:
+        _emit(progress_callback, 'warning', "No se pudieron restaurar algunas subcarpetas:\n" + "\n".join(errors[:10]),
+              report.CATEGORY_RENAME)
+    return restored
+
+
+def _chapter_candidates(folder_path):
+    """Archivos de un capítulo con extensión de imagen (sin abrirlos)."""
+    return [
+        f for f in os.listdir(folder_path)
+        if os.path.isfile(os.path.join(folder_path, f)) and
+           f.lower().endswith(IMAGE_EXTENSIONS)
+    ]
+
+
+def list_chapter_pages(folder_path, validation_workers=validation.DEFAULT_WORKERS, deep_validation=False,
+                       timer=None):
+    """Devuelve [(nombre, validation.PageHeader)] de las imágenes válidas, en el orden del .cbz.
+
+    La validación lee solo la cabecera de cada archivo (en paralelo);
+    ``deep_validation`` añade la verificación completa de Pillow. ``timer``
+    (profiling.StageTimer) mide la validación.
+    """
+    timer = timer or profiling.StageTimer()
+    # Lista archivos de imagen válidos en la subcarpeta
+    image_files = sorted(_chapter_candidates(folder_path)) # Orden estable dentro del .cbz
+    # Filtrar de nuevo por si acaso hay archivos corruptos con extensión correcta
+    with timer.stage("validate", count=len(image_files), page=os.path.basename(folder_path)):
+        headers = validation.validate([os.path.join(folder_path, f) for f in image_files], validation_workers,
+                                      deep_validation)
+    pages = []
+    for f, header in zip(image_files, headers):
+        if header is not None:
+            pages.append((f, header))
+        else:
+            print(f"Advertencia: Omitiendo archivo no válido o corrupto: {os.path.join(os.path.basename(folder_path), f)}")
+    return pages
+
+
+def _chapter_from_index(rows):
+    """Páginas válidas [(nombre, PageHeader)], huella para el manifiesto y nombres no válidos, según el índice."""
+    candidates = [row for row in rows if row[0].lower().endswith(IMAGE_EXTENSIONS)]
+    pages = []
+    invalid = []
+    for name, _, _, image_format, width, height in candidates:
+        if image_format in validation.FORMATS:
+            pages.append((name, validation.PageHeader(image_format, width, height)))
+        else:
+            invalid.append(name)
+    fingerprint = [[name, size, mtime_ns] for name, size, mtime_ns, _, _, _ in candidates]
+    return pages, fingerprint, invalid
+
+
+def list_chapter_images(folder_path, validation_workers=validation.DEFAULT_WORKERS, deep_validation=False):
+    """Devuelve las imágenes válidas de un capítulo, ordenadas como irán en el .cbz."""
+    return [f for f, _ in list_chapter_pages(folder_path, validation_workers, deep_validation)]
+
+
+def pack_chapter(folder_path, zip_filename, image_files, on_page_written=None,
+                 compression_policy=cbz.DEFAULT_POLICY, compression_min_saving=cbz.DEFAULT_MIN_SAVING,
+                 encoder=None, decode_workers=pipeline.DEFAULT_DECODE_WORKERS,
+                 encode_workers=pipeline.DEFAULT_ENCODE_WORKERS, source_formats=None, on_page_error=None,
+                 timer=None):
+    """Empaqueta las imágenes de un capítulo en ``zip_filename`` sin superresolución.
+
+    Las páginas se copian tal cual, salvo que ``encoder`` pida otro formato:
+    entonces se recodifican en el pipeline (``on_page_error`` y ``timer`` como
+    en pipeline.encode_into_zip). Devuelve (cbz.CompressionStats,
+    encoders.EncodeStats o None).
+    """
+    timer = timer or profiling.StageTimer()
+    with cbz.CbzWriter(zip_filename, compression_policy, compression_min_saving) as zipf:
+        if encoder is not None and not encoder.passthrough:
+            file_paths = [os.path.join(folder_path, filename) for filename in image_files]
+            encode_stats = pipeline.encode_into_zip(
+                zipf, file_paths, [os.path.basename(filename) for filename in image_files], None, encoder,
+                decode_workers=decode_workers, encode_workers=encode_workers, on_page_written=on_page_written,
+                source_formats=source_formats, on_page_error=on_page_error, timer=timer)
+            return zipf.stats, encode_stats
+        for i, filename in enumerate(image_files):
+            # Usar os.path.basename(filename) para asegurar que se guarde solo el nombre del archivo en el ZIP
+            with timer.stage("zip", page=filename):
+                zipf.write(os.path.join(folder_path, filename), os.path.basename(filename))
+            if on_page_written is not None:
+                on_page_written(i)
+    return zipf.stats, None
+
+
+def _pack_chapter_job(folder_path, zip_filename, pages, compression_policy, compression_min_saving, encoder,
+                      decode_workers, encode_workers):
+    """Trabajo de un proceso del grupo: empaqueta un capítulo.
+
+    ``pages`` viene del índice; si es None el capítulo se lista y valida
+    (a fondo) en el propio proceso. Devuelve (páginas escritas, estadísticas
+    de compresión, estadísticas de codificación, [(página, motivo)] de las
+    que se guardaron sin cambios por un error, tiempos por etapa).
+    """
+    timer = profiling.StageTimer()
+    if pages is None:
+        pages = list_chapter_pages(folder_path, deep_validation=True, timer=timer)
+    if not pages:
+        return 0, None, None, [], timer.as_dict()
+    page_errors = []
+    stats, encode_stats = pack_chapter(folder_path, zip_filename, [f for f, _ in pages], None, compression_policy,
+                                       compression_min_saving, encoder, decode_workers, encode_workers,
+                                       [header.format for _, header in pages],
+                                       lambda file_path, reason: page_errors.append((file_path, reason)), timer)
+    return len(pages), stats, encode_stats, page_errors, timer.as_dict()
+
+
+def _report_compression(subfolder, pages, stats, encode_stats, progress_callback, timings=None):
+    """Informa del ahorro de compresión (y de los bytes por página codificada) de un capítulo.
+
+    ``timings`` (profiling.StageTimer.as_dict) va en los datos del capítulo para el informe.
+    """
+    message = f"{subfolder}: {stats.summary()}"
+    if encode_stats is not None and encode_stats.pages:
+        message += f"; codificadas {encode_stats.summary()}"
+    _emit(progress_callback, 'info', message)
+    _emit(progress_callback, 'chapter', subfolder, {
+        "pages": pages,
+        "compression": stats.as_dict(),
+        "encoding": encode_stats.as_dict() if encode_stats is not None and encode_stats.pages else None,
+        "timings": timings,
+    })
+
+
+def _page_error(progress_callback, subfolder, file_path, reason):
+    """Avisa de una página que se guardó sin cambios por un error."""
+    _emit(progress_callback, 'warning', f"{subfolder}/{os.path.basename(file_path)}: {reason}; se guarda la original.",
+          report.CATEGORY_PAGE)
+
+
+def _sr_runner(backend, model_sr, device, accelerations, warmup_shape, model_dir, onnx_threads, progress_callback):
+    """Función de inferencia del backend pedido y el backend usado; si no se puede preparar, vuelve a fp32 con aviso."""
+    try:
+        if backend == superres.BACKEND_INT8:
+            run_model, info = sr_quant.load(model_sr, model_dir)
+        elif backend == superres.BACKEND_TORCHSCRIPT:
+            run_model, info = sr_export.load_torchscript(model_sr, model_dir, device)
+        elif backend == superres.BACKEND_ONNX:
+            run, info = sr_export.onnx_runner(model_sr, model_dir, onnx_threads)
+        elif backend != superres.BACKEND_FP32:
+            raise ValueError(f"backend desconocido (opciones: {', '.join(superres.BACKENDS)})")
+    except Exception as e:
+        _emit(progress_callback, 'warning', f"No se pudo preparar el backend {backend}, se usa fp32: {e}",
+              report.CATEGORY_MODEL)
+        backend = superres.BACKEND_FP32
+    if backend == superres.BACKEND_FP32:
+        return superres.torch_runner(model_sr, device, accelerations, warmup_shape), backend
+
+    if info.get("psnr_db") is not None:
+        _emit(progress_callback, 'info', f"Backend {backend}: PSNR {info['psnr_db']} dB frente a fp32")
+    # Los modelos exportados no admiten bf16, channels_last ni compile (ONNX Runtime nunca calcula gradientes)
+    ignored = [name for name in accelerations if name != superres.ACCEL_INFERENCE_MODE]
+    if ignored:
+        _emit(progress_callback, 'warning', f"Con el backend {backend} se ignoran: {', '.join(ignored)}",
+              report.CATEGORY_MODEL)
+    if backend == superres.BACKEND_ONNX:
+        return run, backend
+    accelerations = tuple(name for name in accelerations if name == superres.ACCEL_INFERENCE_MODE)
+    return superres.torch_runner(run_model, device, accelerations, warmup_shape), backend
+
+
+def _start_sr_pool(backend, model_sr, model_dir, accelerations, workers, threads, affinity, tile_size, batch_size,
+                   progress_callback):
+    """Arranca el grupo de procesos de superresolución (sr_pool.py), o None si basta uno o no arranca."""
+    workers, threads = sr_pool.plan(workers, threads, tile_size, batch_size)
+    if workers <= 1:
+        return None
+    pool = None
+    try:
+        pool = sr_pool.SrPool(sr_pool.model_spec(backend, model_sr, model_dir), workers, threads, accelerations,
+                              affinity)
+        pool.start()
+    except Exception as e:
+        if pool is not None:
+            pool.close()
+        _emit(progress_callback, 'warning', f"No se pudo arrancar el grupo de procesos de superresolución, "
+                                            f"se usa uno solo: {e}", report.CATEGORY_MODEL)
+        return None
+    if affinity and not pool.affinity:
+        _emit(progress_callback, 'warning', "La afinidad de CPU solo está disponible en Linux; se ignora.",
+              report.CATEGORY_MODEL)
+    pinned = ", fijados a sus núcleos" if pool.affinity else ""
+    _emit(progress_callback, 'info', f"Superresolución en {workers} procesos con {threads} hilo{'s' if threads != 1 else ''} "
+                                     f"cada uno{pinned}")
+    return pool
+
+
+def close_resident_pools():
+    """Cierra los grupos de procesos conservados con keep_sr_pool."""
+    while _resident_pools:
+        _resident_pools.popitem()[1].close()
+
+
+def _run_settings(sr_model_id, sr_tile_size, sr_tile_overlap, encoder, compression_policy, compression_min_saving,
+                  sr_scale=superres.MODEL_SCALE):
+    """Ajustes que cambian el contenido de los .cbz (se comparan con el manifiesto).
+
+    ``sr_model_id`` es superres.model_id() del modelo en uso, o None sin superresolución.
+    """
+    settings = {"compression": compression_policy, "min_saving": compression_min_saving}
+    if sr_model_id:
+        settings.update(sr=sr_model_id, scale=sr_scale, tile_size=sr_tile_size or 0,
+                        tile_overlap=sr_tile_overlap, format=encoder.cache_key())
+    else:
+        settings["format"] = "copy" if encoder.passthrough else encoder.cache_key()
+    return settings
+
+
+def _delete_chapter_folder(folder_path, subfolder, progress_callback):
+    """Elimina la carpeta original de un capítulo ya empaquetado."""
+    try:
+        shutil.rmtree(folder_path)
+        print(f"Carpeta eliminada: {folder_path}")
+    except OSError as e:
+        _emit(progress_callback, 'error', f"Error al eliminar la carpeta {subfolder}: {e}", report.CATEGORY_FILES)
+        # Continuar con las demás carpetas si falla la eliminación
+
+
+def _pack_chapters_parallel(source_folder, subfolders, chapter_pages, delete_folders, chapter_workers,
+                            progress_callback,
+                            compression_policy=cbz.DEFAULT_POLICY, compression_min_saving=cbz.DEFAULT_MIN_SAVING,
+                            encoder=None, decode_workers=pipeline.DEFAULT_DECODE_WORKERS,
+                            encode_workers=pipeline.DEFAULT_ENCODE_WORKERS, on_chapter_packed=None, timer=None):
+    """Empaqueta varios capítulos a la vez en un grupo de procesos (solo sin superresolución).
+
+    Cada capítulo es independiente y DEFLATE usa CPU, así que escala con los
+    núcleos. Los mensajes de progreso se emiten al terminar cada capítulo y
+    un error en uno no afecta a los demás. ``chapter_pages`` da las páginas
+    de cada subcarpeta (None = validarlas en el proceso). ``on_chapter_packed(subcarpeta)``
+    se llama en este proceso tras cada capítulo terminado. Los tiempos por
+    etapa de cada proceso se suman a ``timer``. Devuelve las páginas escritas.
+    """
+    total_files_processed = 0
+    total_subfolders = len(subfolders)
+    completed = 0
+    with ProcessPoolExecutor(max_workers=chapter_workers or os.cpu_count()) as pool:
+        futures = {
+            pool.submit(_pack_chapter_job, os.path.join(source_folder, subfolder),
+                        os.path.join(source_folder, f"{subfolder}.cbz"), chapter_pages.get(subfolder),
+                        compression_policy, compression_min_saving, encoder, decode_workers,
+                        encode_workers): subfolder
+            for subfolder in subfolders
+        }
+        for future in as_completed(futures):
+            subfolder = futures[future]
+            completed += 1
+            try:
+                num_images_in_folder, stats, encode_stats, page_errors, timings = future.result()
+            except FileNotFoundError:
+                _emit(progress_callback, 'error', f"No se encontró la subcarpeta '{subfolder}' durante el procesamiento.",
+                      report.CATEGORY_CHAPTER)
+                continue
+            except Exception as e:
+                _emit(progress_callback, 'error', f"Error procesando la carpeta '{subfolder}': {e}", report.CATEGORY_CHAPTER)
+                continue
+
+            if timer is not None:
+                timer.merge(timings)
+            if num_images_in_folder == 0:
+                print(f"Advertencia: La carpeta '{subfolder}' está vacía o no contiene imágenes válidas. Se omitirá.")
+                continue
+            _emit(progress_callback, 'progress_folder', completed, total_subfolders, subfolder)
+            _emit(progress_callback, 'progress_file', num_images_in_folder, num_images_in_folder, stats.bytes_in)
+            for file_path, reason in page_errors:
+                _page_error(progress_callback, subfolder, file_path, reason)
+            _report_compression(subfolder, num_images_in_folder, stats, encode_stats, progress_callback, timings)
+            total_files_processed += num_images_in_folder
+            if on_chapter_packed is not None:
+                on_chapter_packed(subfolder)
+
+            if delete_folders:
+                _delete_chapter_folder(os.path.join(source_folder, subfolder), subfolder, progress_callback)
+    return total_files_processed
+
+
+def zip_folders_worker(source_folder, delete_folders, move_to_done, usar_gpu, progress_callback=None,
+                       usar_sr=True, sr_tile_size=superres.DEFAULT_TILE_SIZE,
+                       sr_tile_overlap=superres.DEFAULT_TILE_OVERLAP, sr_batch_size=superres.DEFAULT_BATCH_SIZE,
+                       decode_workers=pipeline.DEFAULT_DECODE_WORKERS,
+                       encode_workers=pipeline.DEFAULT_ENCODE_WORKERS, chapter_workers=1,
+                       compression_policy=cbz.DEFAULT_POLICY, compression_min_saving=cbz.DEFAULT_MIN_SAVING,
+                       output_format=encoders.DEFAULT_FORMAT, output_quality=encoders.DEFAULT_QUALITY,
+                       sr_cache_dir=sr_cache.DEFAULT_CACHE_DIR, sr_cache_max_mb=sr_cache.DEFAULT_MAX_MB,
+                       incremental=True, validation_workers=validation.DEFAULT_WORKERS, deep_validation=False,
+                       report_path=None, profile_path=None, trace_path=None,
+                       sr_accelerations=superres.DEFAULT_ACCELERATIONS, sr_backend=superres.DEFAULT_BACKEND,
+                       sr_model_dir=sr_quant.DEFAULT_MODEL_DIR, onnx_threads=0, sr_workers=1, sr_threads=0,
+                       sr_affinity=False, keep_sr_pool=False, sr_upscaler=superres.DEFAULT_UPSCALER):
+    """Comprime cada subcarpeta de ``source_folder`` en un .cbz, con superresolución opcional.
+
+    Pensada para ejecutarse en un hilo aparte desde la GUI o directamente desde la CLI.
+    ``sr_upscaler`` elige el ampliador del trabajo (superres.parse_upscaler):
+    un modelo del almacén como "msrn-x2" (por defecto) o "edsr-x4", o
+    "lanczos-x2", que amplía con Pillow sin modelo (no usa teselas, backend
+    ni grupo de procesos). ``sr_tile_size`` (px, 0/None = página entera) y ``sr_tile_overlap`` controlan
+    la inferencia por teselas; ``sr_batch_size`` cuántas páginas o teselas del
+    mismo tamaño se pasan juntas al modelo y ``sr_accelerations`` elige cómo
+    se ejecuta (ver superres.torch_runner). ``sr_backend`` elige el modelo
+    (superres.BACKENDS): "int8" usa en CPU el modelo cuantizado y
+    "torchscript" u "onnx" el modelo exportado, que se generan la primera vez
+    en ``sr_model_dir`` (ver sr_quant.py y sr_export.py); "onnx" se ejecuta
+    con ONNX Runtime en CPU con ``onnx_threads`` hilos (0 = automático).
+    En CPU, ``sr_workers`` > 1 (o 0 = según núcleos y memoria) reparte la
+    inferencia entre procesos con su propio modelo y ``sr_threads`` hilos cada
+    uno (0 = automático), fijados a sus núcleos con ``sr_affinity`` (ver
+    sr_pool.py). Con ``keep_sr_pool`` el grupo sigue en marcha al terminar y
+    lo reutiliza el siguiente trabajo con los mismos ajustes (ver sr_daemon.py;
+    close_resident_pools lo cierra). Con superresolución las páginas
+    pasan por pipeline.encode_into_zip con ``decode_workers`` hilos de
+    lectura y ``encode_workers`` de codificación.
+
+    ``output_format`` y ``output_quality`` eligen cómo se codifican las páginas
+    (ver encoders.py); con "auto" o "keep" y sin superresolución se copian tal cual.
+
+    Sin superresolución, ``chapter_workers`` > 1 (o 0 = un proceso por núcleo)
+    empaqueta varios capítulos a la vez en un grupo de procesos. Quien lo use
+    desde un script debe protegerlo con ``if __name__ == "__main__":``.
+
+    ``compression_policy`` y ``compression_min_saving`` eligen la compresión de
+    cada entrada (ver cbz.py); el ahorro de cada capítulo se informa con 'info'.
+
+    Las páginas ampliadas se guardan en la caché de ``sr_cache_dir`` (None la
+    desactiva) con un límite de ``sr_cache_max_mb``; al repetir un trabajo con
+    los mismos ajustes de modelo, teselas y formato no se vuelven a ampliar.
+
+    Con ``incremental`` se omiten los capítulos cuyo .cbz está al día según el
+    manifiesto de la carpeta (ver manifest.py), de modo que repetir el trabajo
+    o reanudar uno interrumpido solo procesa lo pendiente. Los .cbz se
+    escriben con un nombre temporal y se renombran al terminar.
+
+    Las subcarpetas y páginas salen del índice de la biblioteca (ver
+    library_index.py), que comprueba el tamaño y la fecha de cada página (una
+    página sobrescrita no cambia la fecha de su carpeta) y solo vuelve a leer
+    las que cambiaron desde la última vez, con ``validation_workers`` hilos. ``deep_validation`` valida además
+    cada página a fondo con Pillow (ver validation.py).
+
+    Errores y advertencias llevan categoría y, al terminar, se escribe un
+    informe JSON del trabajo (ajustes, capítulos, recuentos y mensajes; ver
+    report.py) en ``report_path``. None lo guarda como ``.compressit_report.json``
+    en la carpeta de origen (o donde se haya movido); False no lo escribe.
+
+    Cada etapa (índice, validación, lectura, modelo, codificación, ZIP) se
+    mide por página y por capítulo (ver profiling.py); los tiempos, el pico de
+    memoria y, con GPU, la memoria de torch van al informe. ``profile_path``
+    guarda un perfil de cProfile del trabajo y ``trace_path`` cada medición
+    en JSON Lines (solo del proceso principal).
+    """
+    device = None
+    upscale_pool = None
+    profiler = profiling.Profiler(None)
+    trace = None
+    run_timer = profiling.StageTimer()
+    run_report = report.RunReport(progress_callback)
+    progress_callback = run_report
+    run_report.settings = {
+        "source_folder": os.path.abspath(source_folder), "delete_folders": delete_folders,
+        "move_to_done": move_to_done, "use_gpu": usar_gpu, "use_sr": usar_sr, "incremental": incremental,
+        "deep_validation": deep_validation, "chapter_workers": chapter_workers,
+    }
+    report_folder = source_folder
+    try:
+        # Rutas de la traza y el perfil: un error aquí se informa como cualquier otro
+        if profile_path and not os.path.isdir(os.path.dirname(os.path.abspath(profile_path))):
+            _emit(progress_callback, 'error', f"No existe la carpeta del perfil: {profile_path}", report.CATEGORY_GENERAL)
+            _emit(progress_callback, 'done', None)
+            return
+        try:
+            trace = profiling.TraceWriter(trace_path) if trace_path else None
+        except OSError as e:
+            _emit(progress_callback, 'error', f"No se pudo crear la traza {trace_path}: {e}", report.CATEGORY_GENERAL)
+            _emit(progress_callback, 'done', None)
+            return
+        run_timer = profiling.StageTimer(trace)
+        profiler = profiling.Profiler(profile_path)
+        profiler.start()
+
+        if not os.path.isdir(source_folder):
+            _emit(progress_callback, 'error', "La carpeta de origen no existe.", report.CATEGORY_SOURCE)
+            _emit(progress_callback, 'done', None)
+            return
+
+        # --- Preparación del Modelo y Dispositivo (una sola vez) ---
+        local_model = None
+        sr_runner = None
+        sr_architecture, sr_scale = superres.MODEL_ARCHITECTURE, superres.MODEL_SCALE
+        if usar_sr:
+            try:
+                sr_architecture, sr_scale = superres.parse_upscaler(sr_upscaler)
+            except ValueError as e:
+                _emit(progress_callback, 'error', str(e), report.CATEGORY_MODEL)
+                _emit(progress_callback, 'done', None)
+                return
+            run_report.settings["sr_upscaler"] = f"{sr_architecture}-x{sr_scale}"
+        if usar_sr and sr_architecture == superres.UPSCALER_LANCZOS:
+            sr_runner = superres.lanczos_runner(sr_scale)
+            sr_tile_size = 0 # Lanczos no acumula activaciones: no hacen falta teselas
+            _emit(progress_callback, 'info', f"Ampliación con Lanczos x{sr_scale} (sin modelo)")
+            if sr_backend != superres.DEFAULT_BACKEND or sr_workers != 1:
+                _emit(progress_callback, 'warning', "Con Lanczos se ignoran el backend y el grupo de procesos.",
+                      report.CATEGORY_MODEL)
+        elif usar_sr:
+            local_model, model_error = superres.get_model(sr_architecture, sr_scale)
+            if local_model is None:
+                if usar_gpu:
+                    _emit(progress_callback, 'error', f"El modelo de superresolución no se cargó. No se puede usar GPU.\n{model_error}",
+                          report.CATEGORY_MODEL)
+                    _emit(progress_callback, 'done', None)
+                    return
+                # Continuar sin superresolución si no se marcó usar GPU
+                print("Advertencia: El modelo no está cargado, se omitirá la superresolución.")
+                _emit(progress_callback, 'warning', f"El modelo {sr_architecture}-x{sr_scale} no está cargado, "
+                                                    f"se omitirá la superresolución.", report.CATEGORY_MODEL)
+
+        # Obtener lista de subcarpetas directas (del índice, actualizado solo donde hubo cambios)
+        try:
+            with library_index.LibraryIndex(source_folder) as index:
+                with run_timer.stage("scan"):
+                    index.scan(validation_workers, full=True)
+                library = index.all_pages()
+            subfolders = list(library)
+        except FileNotFoundError:
+            _emit(progress_callback, 'error', f"No se pudo acceder a la carpeta de origen: {source_folder}",
+                  report.CATEGORY_SOURCE)
+            _emit(progress_callback, 'done', None)
+            return
+        except Exception as e:
+            _emit(progress_callback, 'error', f"Error listando subcarpetas en {source_folder}: {e}", report.CATEGORY_SOURCE)
+            _emit(progress_callback, 'done', None)
+            return
+
+        if not subfolders:
+            _emit(progress_callback, 'warning', "No hay subcarpetas para comprimir.", report.CATEGORY_SOURCE)
+            _emit(progress_callback, 'done', None)
+            return
+
+        backend = sr_backend if local_model is not None else None
+        cpu_only = backend in superres.CPU_BACKENDS
+        if cpu_only and usar_gpu:
+            _emit(progress_callback, 'warning', f"El backend {backend} solo funciona en CPU; no se usará la GPU.",
+                  report.CATEGORY_MODEL)
+        if local_model is not None:
+            device, device_info = superres.select_device(usar_gpu and not cpu_only)
+            print(f"Usando {device_info} para superresolución")
+            _emit(progress_callback, 'info', device_info)
+            try:
+                local_model.to(device) # Mueve el modelo al dispositivo UNA VEZ
+                local_model.eval() # Poner el modelo en modo evaluación
+                tile = sr_tile_size or superres.DEFAULT_TILE_SIZE
+                sr_runner, backend = _sr_runner(backend, local_model, device, sr_accelerations,
+                                                (max(1, sr_batch_size), 3, tile, tile), sr_model_dir,
+                                                onnx_threads, progress_callback)
+                profiling.reset_torch_peak()
+                if sr_runner.accelerations:
+                    _emit(progress_callback, 'info', f"Aceleraciones: {', '.join(sr_runner.accelerations)}")
+            except Exception as e:
+                _emit(progress_callback, 'error', f"Error al mover el modelo al dispositivo {device}: {e}",
+                      report.CATEGORY_MODEL)
+                _emit(progress_callback, 'done', None)
+                return
+
+        if local_model is not None and sr_runner is not None and sr_workers != 1:
+            if 'cuda' in str(device):
+                _emit(progress_callback, 'warning', "El grupo de procesos de superresolución solo se usa en CPU.",
+                      report.CATEGORY_MODEL)
+            else:
+                pool_key = (id(local_model), sr_architecture, sr_scale, backend, sr_model_dir,
+                            tuple(sr_runner.accelerations), sr_workers, sr_threads, sr_affinity, sr_tile_size,
+                            sr_batch_size)
+                upscale_pool = _resident_pools.get(pool_key) if keep_sr_pool else None
+                if upscale_pool is not None:
+                    try:
+                        upscale_pool.start() # Comprueba que los procesos siguen vivos
+                        _emit(progress_callback, 'info', f"Superresolución en {upscale_pool.workers} procesos "
+                                                         f"ya en marcha")
+                    except Exception:
+                        close_resident_pools()
+                        upscale_pool = None
+                if upscale_pool is None:
+                    upscale_pool = _start_sr_pool(backend, local_model, sr_model_dir, sr_runner.accelerations,
+                                                  sr_workers, sr_threads, sr_affinity, sr_tile_size, sr_batch_size,
+                                                  progress_callback)
+                    if keep_sr_pool and upscale_pool is not None:
+                        close_resident_pools() # Solo uno a la vez: cada proceso tiene su modelo en memoria
+                        _resident_pools[pool_key] = upscale_pool
+
+        encoder = encoders.OutputEncoder(output_format, output_quality)
+        cache = None
+        if sr_runner is not None and sr_cache_dir:
+            cache = sr_cache.SrCache(sr_cache_dir, sr_cache_max_mb * 1024 * 1024)
+
+        # --- Capítulos al día según el manifiesto ---
+        sr_model_id = None
+        if sr_runner is not None:
+            sr_model_id = superres.model_id(sr_runner.accelerations, backend, sr_architecture)
+        settings = _run_settings(sr_model_id, sr_tile_size, sr_tile_overlap, encoder,
+                                 compression_policy, compression_min_saving, sr_scale)
+        run_report.settings.update(settings)
+        if sr_runner is not None:
+            run_report.settings["accelerations"] = list(sr_runner.accelerations)
+            run_report.settings["sr_backend"] = backend
+            if upscale_pool is not None:
+                run_report.settings["sr_workers"] = upscale_pool.workers
+                run_report.settings["sr_threads"] = upscale_pool.threads
+        chapter_manifest = manifest.Manifest(source_folder) if incremental else None
+        chapter_pages = {}
+        fingerprints = {}
+        invalid_pages = {}
+        for subfolder in subfolders:
+            chapter_pages[subfolder], fingerprints[subfolder], invalid_pages[subfolder] = \
+                _chapter_from_index(library[subfolder])
+            if deep_validation:
+                chapter_pages[subfolder] = None # Se validan a fondo al procesar cada capítulo
+        skipped = 0
+        if chapter_manifest is not None:
+            pending = []
+            for subfolder in subfolders:
+                folder_path = os.path.join(source_folder, subfolder)
+                if chapter_manifest.is_up_to_date(subfolder, fingerprints[subfolder], settings,
+                                                  os.path.join(source_folder, f"{subfolder}.cbz")):
+                    skipped += 1
+                    if delete_folders:
+                        _delete_chapter_folder(folder_path, subfolder, progress_callback)
+                else:
+                    pending.append(subfolder)
+            if skipped:
+                _emit(progress_callback, 'info', f"{skipped} capítulos sin cambios, se omiten.")
+            subfolders = pending
+        if not deep_validation:
+            # Solo de los capítulos que se van a procesar (los omitidos ya se avisaron en su día)
+            for subfolder in subfolders:
+                for name in invalid_pages[subfolder]:
+                    _emit(progress_callback, 'warning', f"Omitiendo archivo no válido o corrupto: {subfolder}/{name}",
+                          report.CATEGORY_PAGE)
+
+        def chapter_packed(subfolder):
+            """Anota en el manifiesto un capítulo terminado (para reanudar si se interrumpe)."""
+            if chapter_manifest is None:
+                return
+            try:
+                chapter_manifest.record(subfolder, fingerprints[subfolder], settings,
+                                        os.path.join(source_folder, f"{subfolder}.cbz"))
+            except OSError as e:
+                _emit(progress_callback, 'warning', f"No se pudo actualizar el manifiesto: {e}", report.CATEGORY_MANIFEST)
+
+        total_files_processed = 0
+        total_subfolders = len(subfolders)
+        _emit(progress_callback, 'progress_total', sum(len(fingerprints[subfolder]) for subfolder in subfolders),
+              sum(size for subfolder in subfolders for _, size, _ in fingerprints[subfolder]))
+
+        # --- Procesamiento de cada subcarpeta ---
+        if sr_runner is None and chapter_workers != 1:
+            total_files_processed = _pack_chapters_parallel(
+                source_folder, subfolders, chapter_pages, delete_folders, chapter_workers, progress_callback,
+                compression_policy, compression_min_saving, encoder, decode_workers, encode_workers,
+                chapter_packed, run_timer)
+            subfolders = [] # Ya procesadas
+
+        for idx, subfolder in enumerate(subfolders):
+            folder_path = os.path.join(source_folder, subfolder)
+            zip_filename = os.path.join(source_folder, f"{subfolder}.cbz")
+            chapter_timer = profiling.StageTimer(trace)
+
+            try:
+                pages = chapter_pages[subfolder]
+                if pages is None:
+                    pages = list_chapter_pages(folder_path, validation_workers, deep_validation=True,
+                                               timer=chapter_timer)
+                image_files = [f for f, _ in pages]
+                source_formats = [header.format for _, header in pages]
+                num_images_in_folder = len(image_files)
+
+                if num_images_in_folder == 0:
+                    print(f"Advertencia: La carpeta '{subfolder}' está vacía o no contiene imágenes válidas. Se omitirá.")
+                    continue # Saltar a la siguiente subcarpeta
+
+                # Actualizar progreso general (basado en carpetas)
+                _emit(progress_callback, 'progress_folder', idx + 1, total_subfolders, subfolder)
+
+                page_sizes = {name: size for name, size, _ in fingerprints[subfolder]}
+
+                def page_written(i):
+                    # Actualizar progreso detallado (basado en archivos dentro de la carpeta actual)
+                    nonlocal total_files_processed
+                    _emit(progress_callback, 'progress_file', i + 1, num_images_in_folder,
+                          page_sizes.get(image_files[i], 0))
+                    total_files_processed += 1
+
+                def page_error(file_path, reason):
+                    _page_error(progress_callback, subfolder, file_path, reason)
+
+                if sr_runner is not None:
+                    file_paths = [os.path.join(folder_path, filename) for filename in image_files]
+                    # Usar os.path.basename(filename) para asegurar que se guarde solo el nombre del archivo en el ZIP
+                    arcnames = [os.path.basename(filename) for filename in image_files]
+                    with cbz.CbzWriter(zip_filename, compression_policy, compression_min_saving) as zipf:
+                        # Lectura, modelo, codificación y escritura del ZIP se solapan en un pipeline
+                        encode_stats = pipeline.encode_into_zip(
+                            zipf, file_paths, arcnames, sr_runner, encoder, sr_tile_size, sr_tile_overlap,
+                            sr_batch_size, decode_workers, encode_workers, on_page_written=page_written,
+                            cache=cache, source_formats=source_formats, on_page_error=page_error,
+                            timer=chapter_timer, model_id=sr_model_id, sr_pool=upscale_pool,
+                            model_scale=sr_scale)
+                    stats = zipf.stats
+                else:
+                    stats, encode_stats = pack_chapter(folder_path, zip_filename, image_files, page_written,
+                                                       compression_policy, compression_min_saving, encoder,
+                                                       decode_workers, encode_workers, source_formats, page_error,
+                                                       chapter_timer)
+                _report_compression(subfolder, num_images_in_folder, stats, encode_stats, progress_callback,
+                                    chapter_timer.as_dict())
+                chapter_packed(subfolder)
+
+                # Eliminar carpeta original si se marcó la opción
+                if delete_folders:
+                    _delete_chapter_folder(folder_path, subfolder, progress_callback)
+
+            except FileNotFoundError:
+                _emit(progress_callback, 'error', f"No se encontró la subcarpeta '{subfolder}' durante el procesamiento.",
+                      report.CATEGORY_CHAPTER)
+                continue # Saltar a la siguiente carpeta
+            except Exception as e:
+                _emit(progress_callback, 'error', f"Error procesando la carpeta '{subfolder}': {e}", report.CATEGORY_CHAPTER)
+                continue # Por ahora, continuar
+            finally:
+                run_timer.merge(chapter_timer.as_dict())
+
+        # Mover carpeta original a "Done" si se marcó la opción y no se eliminaron las carpetas
+        if move_to_done and not delete_folders:
+            done_folder = os.path.join(os.path.dirname(source_folder), "Done")
+            target_path = os.path.join(done_folder, os.path.basename(source_folder))
+            try:
+                os.makedirs(done_folder, exist_ok=True)
+                # Verificar si el destino ya existe
+                if os.path.exists(target_path):
+                    _emit(progress_callback, 'warning', f"La carpeta '{os.path.basename(source_folder)}' ya existe en 'Done'. No se movió.",
+                          report.CATEGORY_FILES)
+                else:
+                    shutil.move(source_folder, done_folder)
+                    report_folder = target_path
+                    print(f"Carpeta movida a: {done_folder}")
+            except Exception as e:
+                _emit(progress_callback, 'error', f"Error al mover la carpeta a 'Done': {e}", report.CATEGORY_FILES)
+        elif move_to_done and delete_folders:
+            print("Nota: Las carpetas originales fueron eliminadas, no se movió nada a 'Done'.")
+
+        if cache is not None:
+            _emit(progress_callback, 'info', cache.summary())
+        _emit(progress_callback, 'info', f"Tiempos por etapa: {run_timer.summary()}")
+
+        # Indicar finalización exitosa
+        final_message = f"Proceso completado. {total_files_processed} archivos procesados en {total_subfolders} carpetas."
+        if skipped:
+            final_message += f" {skipped} sin cambios."
+        _emit(progress_callback, 'done', final_message)
+
+    except Exception as e:
+        # Captura errores generales antes de empezar el bucle o errores inesperados
+        _emit(progress_callback, 'error', f"Error inesperado en el proceso de compresión: {e}", report.CATEGORY_GENERAL)
+        _emit(progress_callback, 'done', None) # Asegura que quien escucha sepa que terminó (con error)
+    finally:
+        # Limpieza final (liberar memoria de GPU si se usó)
+        if upscale_pool is not None and not keep_sr_pool:
+            upscale_pool.close()
+        run_report.profile = {"stages": run_timer.as_dict(), "memory": profiling.memory_report()}
+        superres.release_device(device)
+        profiler.stop()
+        if trace is not None:
+            trace.close()
+        if report_path is None and os.path.isdir(report_folder):
+            report_path = os.path.join(report_folder, report.REPORT_NAME)
+        if report_path:
+            try:
+                print(f"Informe guardado en: {run_report.write(report_path)}")
+            except OSError as e:
+                print(f"Advertencia: no se pudo guardar el informe {report_path}: {e}")
+
+
+def upscale_files(paths, output_dir, usar_gpu=False, progress_callback=None,
+                  sr_tile_size=superres.DEFAULT_TILE_SIZE, sr_tile_overlap=superres.DEFAULT_TILE_OVERLAP,
+                  sr_batch_size=superres.DEFAULT_BATCH_SIZE, sr_cache_dir=sr_cache.DEFAULT_CACHE_DIR,
+                  sr_cache_max_mb=sr_cache.DEFAULT_MAX_MB, sr_upscaler=superres.DEFAULT_UPSCALER):
+    """Amplía imágenes sueltas o las de carpetas de capítulo y las guarda como JPEG en ``output_dir``.
+
+    Cada imagen se guarda como ``<nombre>.jpg``; las de una carpeta, en una
+    subcarpeta con su nombre. Por cada una se envía ('upscaled', origen,
+    destino) y 'progress_file'; las que no se pueden ampliar se omiten con
+    una advertencia. ``sr_upscaler`` elige el ampliador, como en
+    zip_folders_worker. Devuelve el número de imágenes guardadas.
+    """
+    device = None
+    saved = 0
+    try:
+        try:
+            sr_architecture, sr_scale = superres.parse_upscaler(sr_upscaler)
+        except ValueError as e:
+            _emit(progress_callback, 'error', str(e), report.CATEGORY_MODEL)
+            _emit(progress_callback, 'done', None)
+            return 0
+        model_sr = run = cache_model = None
+        if sr_architecture == superres.UPSCALER_LANCZOS:
+            run = superres.lanczos_runner(sr_scale)
+            cache_model = (superres.model_id(run.accelerations, superres.BACKEND_FP32, sr_architecture), sr_scale)
+            sr_tile_size = 0 # Lanczos no acumula activaciones: no hacen falta teselas
+            _emit(progress_callback, 'info', f"Ampliación con Lanczos x{sr_scale} (sin modelo)")
+        else:
+            model_sr, model_error = superres.get_model(sr_architecture, sr_scale)
+            if model_sr is None:
+                _emit(progress_callback, 'error', f"El modelo {sr_architecture}-x{sr_scale} no se cargó.\n{model_error}",
+                      report.CATEGORY_MODEL)
+                _emit(progress_callback, 'done', None)
+                return 0
+        jobs = [] # (origen, destino)
+        for path in paths:
+            if os.path.isdir(path):
+                folder_out = os.path.join(output_dir, os.path.basename(os.path.normpath(path)))
+                jobs += [(os.path.join(path, name), os.path.join(folder_out, os.path.splitext(name)[0] + ".jpg"))
+                         for name, _ in list_chapter_pages(path)]
+            elif os.path.isfile(path):
+                name = os.path.splitext(os.path.basename(path))[0] + ".jpg"
+                jobs.append((path, os.path.join(output_dir, name)))
+            else:
+                _emit(progress_callback, 'warning', f"No existe: {path}", report.CATEGORY_SOURCE)
+
+        if model_sr is not None:
+            device, device_info = superres.select_device(usar_gpu)
+            _emit(progress_callback, 'info', device_info)
+            model_sr.to(device)
+            model_sr.eval()
+        cache = sr_cache.SrCache(sr_cache_dir, sr_cache_max_mb * 1024 * 1024) if sr_cache_dir else None
+        sizes = [os.path.getsize(source) for source, _ in jobs]
+        _emit(progress_callback, 'progress_total', len(jobs), sum(sizes))
+        batch_size = max(1, sr_batch_size)
+        for start in range(0, len(jobs), batch_size):
+            chunk = jobs[start:start + batch_size]
+            results = superres.aplicar_superresolucion_lote([source for source, _ in chunk], model_sr, device,
+                                                            sr_tile_size, sr_tile_overlap, batch_size, cache,
+                                                            run=run, cache_model=cache_model)
+            for offset, ((source, target), data) in enumerate(zip(chunk, results)):
+                if data is None:
+                    _emit(progress_callback, 'warning', f"No se pudo ampliar {source}", report.CATEGORY_PAGE)
+                else:
+                    os.makedirs(os.path.dirname(target), exist_ok=True)
+                    with open(target, 'wb') as f:
+                        f.write(data)
+                    saved += 1
+                    _emit(progress_callback, 'upscaled', source, target)
+                _emit(progress_callback, 'progress_file', start + offset + 1, len(jobs), sizes[start + offset])
+        _emit(progress_callback, 'done', f"{saved} de {len(jobs)} imágenes ampliadas en {output_dir}.")
+    except Exception as e:
+        _emit(progress_callback, 'error', f"Error inesperado al ampliar las imágenes: {e}", report.CATEGORY_GENERAL)
+        _emit(progress_callback, 'done', None)
+    finally:
+        superres.release_device(device)
+    return saved
@@ -5,6 +5,7 @@ import tkinter as tk
 from tkinter import filedialog, messagebox, Toplevel, Listbox, Label, Scrollbar, StringVar
 import requests
 from PIL import Image, ImageTk
+from anilist import format_title, search_anilist
 from typing import List, Dict, Any, Optional
 
 
@@ -86,44 +87,8 @@ class MangaJSONGenerator:
             messagebox.showwarning("Advertencia", "Por favor, ingrese un título antes de buscar.")
             return
 
-        query = """
-        query ($search: String) {
-          Page(perPage: 10) {
-            media(search: $search, type: MANGA) {
-              title {
-                romaji
-                english
-              }
-              description
-              genres
-              status
-              isAdult
-              coverImage {
-                large
-              }
-              staff {
-                edges {
-                  node {
-                    name {
-                      full
-                    }
-                  }
-                  role
-                }
-              }
-            }
-          }
-        }
-        """
-
-        variables = {"search": title}
-        url = "https://graphql.anilist.co"
-        
         try:
-            response = requests.post(url, json={"query": query, "variables": variables})
-            response.raise_for_status()  # Lanzar excepción para códigos de error HTTP
-            
-            results = response.json().get("data", {}).get("Page", {}).get("media", [])
+            results = search_anilist(title)
             if not results:
                 messagebox.showinfo("Información", "No se encontraron resultados para la búsqueda.")
                 return
@@ -204,13 +169,7 @@ class MangaJSONGenerator:
         
         # Insertar títulos en la lista
         for item in results:
-            title = item["title"]["romaji"]
-            if item["title"].get("english") and item["title"]["english"] != title:
-                title += f" ({item['title']['english']})"
-            # Marcar títulos para adultos
-            if item.get("isAdult", False):
-                title += " [NSFW]"
-            listbox.insert(tk.END, title)
+            listbox.insert(tk.END, format_title(item))
 
         def update_preview(event):
             """Actualizar la vista previa al seleccionar un elemento"""
@@ -0,0 +1,188 @@
+"""Índice persistente de una biblioteca (carpeta con subcarpetas de capítulos).
+
+SnapTitle y CompressIt recorrían el árbol en cada ejecución con ``listdir``,
+``isdir``/``isfile`` y abriendo cada imagen. Este módulo hace un único
+recorrido con ``os.scandir`` y guarda en ``.manga_index.sqlite`` (en la
+carpeta raíz) las subcarpetas y, por página, tamaño, fecha, formato y
+dimensiones.
+
+En los recorridos siguientes:
+- una subcarpeta cuya fecha de modificación no cambió se da por igual (añadir,
+  borrar o renombrar archivos cambia la fecha de la carpeta);
+- en las que cambiaron solo se vuelven a leer los archivos con otro tamaño o
+  fecha. Un archivo renombrado conserva su tamaño y fecha, así que se
+  reutiliza lo que ya se sabía de él.
+``full=True`` comprueba todos los archivos aunque la carpeta no haya cambiado
+(p. ej. si se sobrescribieron páginas sin cambiar su nombre); solo se vuelven
+a leer los que tienen otro tamaño o fecha. CompressIt lo usa siempre, porque
+su manifiesto decide con la fecha de cada página si un capítulo está al día.
+"""
+import os
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image
+
+import validation
+
+INDEX_NAME = ".manga_index.sqlite"
+INDEX_VERSION = 1
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS folders (name TEXT PRIMARY KEY, mtime_ns INTEGER);
+CREATE TABLE IF NOT EXISTS pages (
+    folder TEXT, name TEXT, size INTEGER, mtime_ns INTEGER,
+    format TEXT, width INTEGER, height INTEGER,
+    PRIMARY KEY (folder, name)
+);
+"""
+
+
+def probe(file_path):
+    """(formato, ancho, alto) de una imagen, o (None, None, None) si no lo es.
+
+    Lee la cabecera (validation.sniff) y, para formatos que no reconoce, deja
+    que Pillow lo intente, como hacía is_image.
+    """
+    header = validation.sniff(file_path)
+    if header is not None:
+        return tuple(header)
+    try:
+        with Image.open(file_path) as img:
+            image_format, size = img.format, img.size
+            img.verify()
+        return image_format, size[0], size[1]
+    except Exception:
+        return None, None, None
+
+
+class LibraryIndex:
+    """Índice SQLite de las subcarpetas y páginas de ``root``.
+
+    Se usa como gestor de contexto::
+
+        with LibraryIndex(carpeta) as index:
+            index.scan()
+            for folder in index.folders():
+                paginas = index.pages(folder)
+    """
+
+    def __init__(self, root, path=None):
+        self.root = root
+        self.path = path or os.path.join(root, INDEX_NAME)
+        try:
+            self._db = self._open(self.path)
+        except (sqlite3.Error, OSError) as e:
+            # Carpeta de solo lectura o índice dañado: se indexa en memoria para esta ejecución
+            print(f"Advertencia: no se pudo usar el índice {self.path}, se usará uno temporal: {e}")
+            self._db = self._open(":memory:")
+
+    @staticmethod
+    def _open(path):
+        db = sqlite3.connect(path)
+        try:
+            if db.execute("PRAGMA user_version").fetchone()[0] != INDEX_VERSION:
+                db.executescript("DROP TABLE IF EXISTS folders; DROP TABLE IF EXISTS pages;")
+                db.execute(f"PRAGMA user_version = {INDEX_VERSION}")
+            db.executescript(_SCHEMA)
+        except sqlite3.Error:
+            db.close()
+            raise
+        return db
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        self._db.close()
+
+    def scan(self, workers=validation.DEFAULT_WORKERS, full=False):
+        """Actualiza el índice. Devuelve (subcarpetas, subcarpetas revisadas, archivos leídos)."""
+        known = dict(self._db.execute("SELECT name, mtime_ns FROM folders"))
+        seen = []
+        changed = probed = 0
+        with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="index-probe") as pool:
+            with os.scandir(self.root) as entries:
+                for entry in entries:
+                    if not entry.is_dir():
+                        continue
+                    seen.append(entry.name)
+                    # La fecha se lee antes de listar: un cambio durante el recorrido se verá la próxima vez
+                    mtime_ns = entry.stat().st_mtime_ns
+                    if not full and known.get(entry.name) == mtime_ns:
+                        continue
+                    try:
+                        folder_probed, folder_changed = self._scan_folder(entry.name, entry.path, pool)
+                    except OSError as e:
+                        print(f"Error listando archivos en {entry.path}: {e}")
+                        continue # Se reintentará en el próximo recorrido
+                    probed += folder_probed
+                    if folder_changed or known.get(entry.name) != mtime_ns:
+                        self._db.execute("INSERT OR REPLACE INTO folders VALUES (?, ?)", (entry.name, mtime_ns))
+                        changed += 1
+        for name in set(known) - set(seen):
+            self._db.execute("DELETE FROM folders WHERE name = ?", (name,))
+            self._db.execute("DELETE FROM pages WHERE folder = ?", (name,))
+        self._db.commit()
+        return len(seen), changed, probed
+
+    def _scan_folder(self, folder, folder_path, pool):
+        """Actualiza las páginas de una subcarpeta.
+
+        Devuelve (archivos leídos, si cambió algo respecto a lo indexado).
+        """
+        old = {row[0]: row[1:] for row in self._db.execute(
+            "SELECT name, size, mtime_ns, format, width, height FROM pages WHERE folder = ?", (folder,))}
+        # Para reconocer archivos renombrados: (tamaño, fecha, extensión) -> datos
+        by_stat = {(size, mtime_ns, os.path.splitext(name)[1].lower()): info
+                   for name, (size, mtime_ns, *info) in old.items()}
+
+        rows = []
+        to_probe = []
+        unchanged = 0
+        with os.scandir(folder_path) as entries:
+            for entry in entries:
+                if not entry.is_file():
+                    continue
+                stat = entry.stat()
+                previous = old.get(entry.name)
+                if previous is not None and previous[:2] == (stat.st_size, stat.st_mtime_ns):
+                    rows.append((folder, entry.name) + tuple(previous))
+                    unchanged += 1
+                    continue
+                reused = by_stat.get((stat.st_size, stat.st_mtime_ns, os.path.splitext(entry.name)[1].lower()))
+                if reused is not None:
+                    rows.append((folder, entry.name, stat.st_size, stat.st_mtime_ns) + tuple(reused))
+                else:
+                    to_probe.append((entry.name, entry.path, stat.st_size, stat.st_mtime_ns))
+
+        for (name, _, size, mtime_ns), info in zip(to_probe, pool.map(probe, [item[1] for item in to_probe])):
+            rows.append((folder, name, size, mtime_ns) + info)
+
+        if unchanged == len(rows) == len(old):
+            return 0, False # Todo igual: no hace falta reescribir las filas
+        self._db.execute("DELETE FROM pages WHERE folder = ?", (folder,))
+        self._db.executemany("INSERT INTO pages VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+        return len(to_probe), True
+
+    def folders(self):
+        """Subcarpetas indexadas, ordenadas por nombre."""
+        return [row[0] for row in self._db.execute("SELECT name FROM folders ORDER BY name")]
+
+    def pages(self, folder):
+        """[(nombre, tamaño, mtime_ns, formato, ancho, alto)] de los archivos de ``folder``.
+
+        ``formato`` es None si el archivo no es una imagen válida.
+        """
+        return self._db.execute("SELECT name, size, mtime_ns, format, width, height FROM pages "
+                                "WHERE folder = ? ORDER BY name", (folder,)).fetchall()
+
+    def all_pages(self):
+        """{subcarpeta: pages(subcarpeta)} de todo el índice, en una sola consulta."""
+        result = {folder: [] for folder in self.folders()}
+        for row in self._db.execute("SELECT folder, name, size, mtime_ns, format, width, height FROM pages "
+                                    "ORDER BY folder, name"):
+            result.setdefault(row[0], []).append(row[1:])
+        return result
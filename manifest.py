@@ -0,0 +1,87 @@
+"""Manifiesto de CompressIt para ejecuciones incrementales y reanudables.
+
+En cada carpeta de origen se guarda ``.compressit_manifest.json`` con, por
+capítulo, la lista de páginas (nombre, tamaño y fecha de modificación), los
+ajustes usados y el tamaño y fecha del .cbz generado. Un capítulo cuyo .cbz
+sigue así y cuyas páginas y ajustes no han cambiado no se vuelve a
+empaquetar. El manifiesto se actualiza después de cada capítulo, así que un
+trabajo interrumpido continúa donde se quedó.
+"""
+import json
+import os
+import tempfile
+
+MANIFEST_NAME = ".compressit_manifest.json"
+MANIFEST_VERSION = 1
+
+
+def _umask_file_mode():
+    """Permisos de un archivo nuevo según la umask del proceso (como ``open``)."""
+    mask = os.umask(0)
+    os.umask(mask)
+    return 0o666 & ~mask
+
+
+# mkstemp crea los temporales con 0600; al renombrarlos se les dan estos
+# permisos. La umask solo se puede leer cambiándola, así que se hace una vez
+# al importar, antes de que haya otros hilos creando archivos.
+FILE_MODE = _umask_file_mode()
+
+
+def _archive_state(zip_filename):
+    """[tamaño, mtime en ns] del .cbz, o None si no existe."""
+    try:
+        stat = os.stat(zip_filename)
+    except OSError:
+        return None
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+class Manifest:
+    """Estado de los capítulos ya empaquetados de una carpeta de origen."""
+
+    def __init__(self, source_folder):
+        self.path = os.path.join(source_folder, MANIFEST_NAME)
+        self.chapters = {}
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == MANIFEST_VERSION:
+                self.chapters = data.get("chapters", {})
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, AttributeError) as e:
+            # Un manifiesto dañado solo obliga a reconstruir los capítulos
+            print(f"Advertencia: se ignora el manifiesto {self.path}: {e}")
+
+    def is_up_to_date(self, subfolder, files, settings, zip_filename):
+        """Indica si el .cbz de ``subfolder`` corresponde a estas páginas y ajustes.
+
+        ``files`` es la huella de las páginas: [nombre, tamaño, mtime en ns] por archivo.
+        """
+        entry = self.chapters.get(subfolder)
+        if entry is None:
+            return False
+        return (entry.get("files") == files and entry.get("settings") == settings
+                and entry.get("archive") == _archive_state(zip_filename))
+
+    def record(self, subfolder, files, settings, zip_filename):
+        """Anota un capítulo recién empaquetado y guarda el manifiesto."""
+        self.chapters[subfolder] = {"files": files, "settings": settings,
+                                    "archive": _archive_state(zip_filename)}
+        self.save()
+
+    def save(self):
+        """Escribe el manifiesto de forma atómica (temporal + renombrado)."""
+        data = {"version": MANIFEST_VERSION, "chapters": self.chapters}
+        folder = os.path.dirname(self.path)
+        fd, tmp_path = tempfile.mkstemp(dir=folder, prefix=MANIFEST_NAME, suffix=".part")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.chmod(tmp_path, FILE_MODE)
+            os.replace(tmp_path, self.path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
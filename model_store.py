@@ -0,0 +1,355 @@
+"""Almacén local de pesos de superresolución: sin red al arrancar.
+
+Antes el modelo se pedía a Hugging Face con ``MsrnModel.from_pretrained``;
+sin conexión fallaba y la superresolución quedaba desactivada. Ahora los
+pesos se importan una vez (``python cli.py models import ARCHIVO`` o
+``models download``) a ``DEFAULT_STORE_DIR`` y se cargan siempre de ahí.
+
+``registry.json`` lista los modelos disponibles (arquitectura y escala) con
+su configuración, tamaño y SHA-256. La primera carga de cada proceso
+comprueba la suma: un archivo dañado o cambiado se rechaza en lugar de dar
+páginas corruptas. Las siguientes solo la repiten si el archivo cambió de
+tamaño o de fecha.
+
+Los pesos se guardan en el formato zip de torch, que torch.load puede
+proyectar en memoria (``mmap=True``): los tensores del modelo apuntan al
+archivo y no se copian. Además el modelo se construye sin la inicialización
+aleatoria de las capas, que se sobrescribiría al cargar los pesos.
+"""
+import contextlib
+import glob
+import hashlib
+import json
+import os
+import tempfile
+import time
+
+STORE_VERSION = 1
+DEFAULT_STORE_DIR = os.environ.get("MANGA_MODEL_STORE") or os.path.join(
+    os.path.expanduser("~"), ".cache", "manga_utilities", "store")
+REGISTRY_NAME = "registry.json"
+
+# Arquitecturas admitidas: nombre -> (clase del modelo, clase de la configuración) de super_image
+ARCHITECTURES = {
+    "edsr": ("EdsrModel", "EdsrConfig"),
+    "msrn": ("MsrnModel", "MsrnConfig"),
+    "a2n": ("A2nModel", "A2nConfig"),
+    "pan": ("PanModel", "PanConfig"), # El más ligero (0,26 M parámetros)
+    "carn": ("CarnModel", "CarnConfig"),
+    "awsrn": ("AwsrnModel", "AwsrnConfig"),
+    "mdsr": ("MdsrModel", "MdsrConfig"),
+    "drln": ("DrlnModel", "DrlnConfig"), # Los tres últimos son los más pesados (15-35 M parámetros)
+    "han": ("HanModel", "HanConfig"),
+    "rcan": ("RcanModel", "RcanConfig"),
+}
+# Repositorio de Hugging Face de cada arquitectura (solo para 'models download' y para importar su caché)
+HUB_REPOS = {
+    "edsr": "eugenesiow/edsr-base",
+    "msrn": "eugenesiow/msrn",
+    "a2n": "eugenesiow/a2n",
+    "pan": "eugenesiow/pan",
+    "carn": "eugenesiow/carn",
+    "awsrn": "eugenesiow/awsrn-bam",
+    "mdsr": "eugenesiow/mdsr",
+    "drln": "eugenesiow/drln",
+    "han": "eugenesiow/han",
+    "rcan": "eugenesiow/rcan-bam",
+}
+
+_INIT_FUNCTIONS = ("kaiming_uniform_", "uniform_", "normal_")
+
+# Ruta -> (SHA-256, tamaño, mtime_ns) de los archivos cuya suma ya se comprobó en este proceso
+_verified = {}
+
+
+def model_key(architecture, scale):
+    return f"{architecture}-x{scale}"
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# --- Registro ---
+def read_registry(directory=DEFAULT_STORE_DIR):
+    """Contenido de registry.json ({"version", "models": {clave: entrada}}); vacío si no existe."""
+    try:
+        with open(os.path.join(directory, REGISTRY_NAME), encoding="utf-8") as f:
+            registry = json.load(f)
+    except (OSError, ValueError):
+        registry = {}
+    registry.setdefault("version", STORE_VERSION)
+    registry.setdefault("models", {})
+    return registry
+
+
+def _write_registry(directory, registry):
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".part")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(registry, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, os.path.join(directory, REGISTRY_NAME))
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def registry_stamp(directory=DEFAULT_STORE_DIR):
+    """Fecha de modificación del registro (None si no existe); cambia al importar o borrar un modelo."""
+    try:
+        return os.stat(os.path.join(directory, REGISTRY_NAME)).st_mtime_ns
+    except OSError:
+        return None
+
+
+def available(directory=DEFAULT_STORE_DIR):
+    """Entradas del registro ordenadas por clave."""
+    models = read_registry(directory)["models"]
+    return [models[key] for key in sorted(models)]
+
+
+def find(architecture, scale, directory=DEFAULT_STORE_DIR):
+    return read_registry(directory)["models"].get(model_key(architecture, scale))
+
+
+# --- Construcción del modelo ---
+@contextlib.contextmanager
+def _skip_init():
+    """Construye capas sin inicializar sus pesos (los pisa load_state_dict).
+
+    Se hace con un modo de ``__torch_function__``, que solo afecta al hilo
+    actual: un modelo que se construya a la vez en otro hilo se inicializa
+    con normalidad. (``torch.nn.utils.skip_init`` necesita que el modelo
+    acepte ``device`` y el dispositivo "meta" falla en el MeanShift de
+    super_image, que crea tensores con ``torch.Tensor``.)
+    """
+    import torch
+    from torch.overrides import TorchFunctionMode
+
+    skipped = {getattr(torch.nn.init, name) for name in _INIT_FUNCTIONS}
+    skipped.update((torch.Tensor.uniform_, torch.Tensor.normal_))
+
+    class SkipInit(TorchFunctionMode):
+        def __torch_function__(self, func, types, args=(), kwargs=None):
+            kwargs = kwargs or {}
+            if func in skipped:
+                return args[0] if args else kwargs["tensor"]
+            return func(*args, **kwargs)
+
+    with SkipInit():
+        yield
+
+
+def _build(architecture, config, state_dict):
+    """Modelo de ``architecture`` con ``config`` y los tensores de ``state_dict`` (sin copiarlos)."""
+    import torch
+    import super_image
+
+    if architecture not in ARCHITECTURES:
+        raise ValueError(f"Arquitectura no admitida: {architecture} (admitidas: {', '.join(ARCHITECTURES)})")
+    model_class, config_class = (getattr(super_image, name) for name in ARCHITECTURES[architecture])
+    with _skip_init():
+        model = model_class(config_class(**config))
+    # El load_state_dict de super_image copia y no admite assign: se usa el de torch
+    torch.nn.Module.load_state_dict(model, state_dict, strict=True, assign=True)
+    return model.eval()
+
+
+def _clean_config(config, scale):
+    """Parámetros de la configuración de super_image que se guardan en el registro."""
+    config = {key: list(value) if isinstance(value, tuple) else value for key, value in (config or {}).items()
+              if not key.startswith("_") and key != "model_type"}
+    config["scale"] = scale
+    return config
+
+
+def snapshot(model_sr):
+    """(arquitectura, configuración, state_dict en CPU) de un modelo de super_image, sin tocar el modelo.
+
+    Sirve para reconstruirlo en otro proceso con ``rebuild`` (ver sr_pool.py).
+    """
+    config = model_sr.config
+    architecture = (config.model_type or "msrn").lower()
+    state_dict = {name: tensor.detach().cpu() for name, tensor in model_sr.state_dict().items()}
+    return architecture, _clean_config(config.to_dict(), config.scale), state_dict
+
+
+def rebuild(state):
+    """Modelo en CPU y en modo eval a partir de ``snapshot``."""
+    return _build(*state)
+
+
+# --- Importación ---
+def _read_state_dict(path):
+    """state_dict de un archivo .pt/.pth/.bin de PyTorch o .safetensors."""
+    if path.endswith(".safetensors"):
+        try:
+            from safetensors.torch import load_file
+        except ImportError:
+            raise ImportError("Para importar .safetensors hace falta el paquete safetensors "
+                              "(pip install safetensors)") from None
+        return load_file(path)
+    import torch
+
+    state_dict = torch.load(path, map_location="cpu", weights_only=True)
+    if isinstance(state_dict, dict) and isinstance(state_dict.get("state_dict"), dict):
+        state_dict = state_dict["state_dict"] # Checkpoints de entrenamiento
+    return state_dict
+
+
+def _weights_in(folder, scale):
+    """Pesos y config.json de una carpeta con el formato de super_image (como la del repositorio del hub)."""
+    weights = os.path.join(folder, f"pytorch_model_{scale}x.pt")
+    if not os.path.isfile(weights):
+        weights = os.path.join(folder, "pytorch_model.pt")
+    config_path = os.path.join(folder, "config.json")
+    config = None
+    if os.path.isfile(config_path):
+        with open(config_path, encoding="utf-8") as f:
+            config = json.load(f)
+    return weights, config
+
+
+def import_weights(path, architecture="msrn", scale=2, config=None, expected_sha256=None, source=None,
+                   directory=DEFAULT_STORE_DIR):
+    """Importa los pesos de ``path`` (archivo o carpeta de super_image) al almacén. Devuelve la entrada.
+
+    Lanza ValueError si la suma no coincide con ``expected_sha256`` o si los
+    pesos no corresponden a la arquitectura; el almacén no cambia en ese caso.
+    """
+    import torch
+
+    if os.path.isdir(path):
+        path, folder_config = _weights_in(path, scale)
+        config = config or folder_config
+    source_sha256 = file_sha256(path)
+    if expected_sha256 and source_sha256 != expected_sha256.lower():
+        raise ValueError(f"La suma SHA-256 de {path} no coincide: {source_sha256} (se esperaba {expected_sha256})")
+    config = _clean_config(config, scale)
+    state_dict = {name: tensor.contiguous() for name, tensor in _read_state_dict(path).items()}
+    try:
+        _build(architecture, config, state_dict)
+    except (RuntimeError, KeyError, TypeError) as e:
+        detail = " ".join(line.strip() for line in str(e).splitlines()[1:2]) or str(e) # La primera diferencia
+        raise ValueError(f"Los pesos de {path} no son de {model_key(architecture, scale)}: {detail[:200]}") from None
+
+    os.makedirs(directory, exist_ok=True)
+    key = model_key(architecture, scale)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".part")
+    os.close(fd)
+    try:
+        with open(tmp_path, "wb") as f:
+            torch.save(state_dict, f) # Con un archivo abierto el contenido no depende del nombre temporal
+        sha256 = file_sha256(tmp_path)
+        file_name = f"{key}-{sha256[:12]}.pt"
+        os.replace(tmp_path, os.path.join(directory, file_name))
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    entry = {"key": key, "architecture": architecture, "scale": scale, "config": config, "file": file_name,
+             "sha256": sha256, "bytes": os.path.getsize(os.path.join(directory, file_name)),
+             "source": source or os.path.abspath(path), "source_sha256": source_sha256,
+             "imported": time.strftime("%Y-%m-%dT%H:%M:%S")}
+    registry = read_registry(directory)
+    previous = registry["models"].get(key)
+    registry["models"][key] = entry
+    _write_registry(directory, registry)
+    if previous and previous["file"] != file_name:
+        _remove_file(directory, previous["file"])
+    return entry
+
+
+def hub_cache_folder(architecture="msrn", scale=2):
+    """Carpeta de la caché local de Hugging Face con los pesos de ``architecture`` (sin red), o None."""
+    repo = HUB_REPOS.get(architecture)
+    if repo is None:
+        return None
+    hub_home = os.environ.get("HF_HUB_CACHE") or os.path.join(
+        os.environ.get("HF_HOME") or os.path.join(os.path.expanduser("~"), ".cache", "huggingface"), "hub")
+    pattern = os.path.join(hub_home, "models--" + repo.replace("/", "--"), "snapshots", "*",
+                           f"pytorch_model_{scale}x.pt")
+    matches = sorted(glob.glob(pattern), key=os.path.getmtime)
+    return os.path.dirname(matches[-1]) if matches else None
+
+
+def download(architecture="msrn", scale=2, directory=DEFAULT_STORE_DIR):
+    """Descarga los pesos del hub con super_image (única función que usa la red) y los importa."""
+    import super_image
+
+    if architecture not in HUB_REPOS:
+        raise ValueError(f"No hay repositorio conocido para {architecture}")
+    model_class = getattr(super_image, ARCHITECTURES[architecture][0])
+    model = model_class.from_pretrained(HUB_REPOS[architecture], scale=scale)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "pesos.pt")
+        import torch
+        torch.save(model.state_dict(), path)
+        return import_weights(path, architecture, scale, model.config.to_dict(), source=HUB_REPOS[architecture],
+                              directory=directory)
+
+
+# --- Carga y mantenimiento ---
+def load(architecture="msrn", scale=2, directory=DEFAULT_STORE_DIR, verify=True):
+    """Devuelve (modelo en CPU y en modo eval, entrada) desde el almacén, sin red.
+
+    Los pesos quedan proyectados en memoria desde el archivo. Lanza
+    FileNotFoundError si el modelo no está importado y ValueError si su
+    SHA-256 no coincide con el registro (``verify``; solo se calcula si el
+    archivo no se comprobó ya en este proceso con el mismo tamaño y fecha).
+    """
+    import torch
+
+    entry = find(architecture, scale, directory)
+    if entry is None:
+        options = f"--architecture {architecture} --scale {scale}"
+        raise FileNotFoundError(f"{model_key(architecture, scale)} no está en el almacén de modelos ({directory}). "
+                                f"Impórtalo con 'python cli.py models import ARCHIVO {options}' o descárgalo "
+                                f"una vez con 'python cli.py models download {options}'.")
+    path = os.path.join(directory, entry["file"])
+    if verify:
+        stat = os.stat(path)
+        state = (entry["sha256"], stat.st_size, stat.st_mtime_ns)
+        if _verified.get(path) != state:
+            sha256 = file_sha256(path)
+            if sha256 != entry["sha256"]:
+                raise ValueError(f"El archivo {path} está dañado o ha cambiado: SHA-256 {sha256}, "
+                                 f"registrado {entry['sha256']}. Vuelve a importarlo.")
+            _verified[path] = state
+    state_dict = torch.load(path, map_location="cpu", weights_only=True, mmap=True)
+    return _build(architecture, entry["config"], state_dict), entry
+
+
+def verify_all(directory=DEFAULT_STORE_DIR):
+    """Comprueba la suma de todos los modelos. Devuelve [(clave, correcto, detalle)]."""
+    results = []
+    for entry in available(directory):
+        path = os.path.join(directory, entry["file"])
+        if not os.path.isfile(path):
+            results.append((entry["key"], False, f"falta {path}"))
+            continue
+        sha256 = file_sha256(path)
+        results.append((entry["key"], sha256 == entry["sha256"],
+                        "correcto" if sha256 == entry["sha256"] else f"SHA-256 {sha256}, registrado {entry['sha256']}"))
+    return results
+
+
+def _remove_file(directory, file_name):
+    try:
+        os.remove(os.path.join(directory, file_name))
+    except OSError:
+        pass # En Windows puede seguir proyectado en memoria por otro proceso
+
+
+def remove(key, directory=DEFAULT_STORE_DIR):
+    """Quita un modelo del registro y borra su archivo. Devuelve False si no estaba."""
+    registry = read_registry(directory)
+    entry = registry["models"].pop(key, None)
+    if entry is None:
+        return False
+    _write_registry(directory, registry)
+    _remove_file(directory, entry["file"])
+    return True
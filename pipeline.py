@@ -0,0 +1,338 @@
+"""Pipeline por etapas para ampliar (o recodificar) y empaquetar las páginas de un capítulo.
+
+    decodificar (hilos) -> superresolución (un hilo) -> codificar (hilos) -> ZIP (hilo que llama)
+
+Las páginas se codifican en memoria (Pillow libera el GIL al codificar, así
+que los hilos de codificación trabajan en paralelo) y se escriben en el ZIP
+con ``writestr``: no hay archivos temporales que escribir, releer ni limpiar.
+Sin modelo (``run=None``) la etapa de superresolución solo deja pasar las
+páginas, lo que sirve para cambiar de formato sin ampliar. Con una caché
+(sr_cache.SrCache) las páginas ya ampliadas se copian de ella sin pasar por
+el modelo ni por el codificador. Cada etapa se mide con un
+profiling.StageTimer.
+
+Con un grupo de procesos (sr_pool.SrPool) la etapa de superresolución solo
+reparte los lotes entre los procesos y cada página se codifica cuando su
+lote termina, así que hay tantos lotes en marcha como procesos.
+
+Las etapas se comunican por colas acotadas, así que mientras el modelo
+trabaja en un lote ya se están leyendo las páginas siguientes y codificando
+las anteriores. El escritor recibe las páginas en el orden original, por lo
+que el orden de las entradas del .cbz es siempre el mismo.
+"""
+import io
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from PIL import Image
+
+import encoders
+import profiling
+import sr_cache
+import superres
+
+DEFAULT_DECODE_WORKERS = 2
+DEFAULT_ENCODE_WORKERS = 2
+
+# Modos de Pillow que indican una página en escala de grises
+_GRAYSCALE_MODES = ("1", "L", "LA", "I", "I;16")
+
+_END = object() # Marca de fin de etapa
+
+
+class _Stopped(Exception):
+    """El pipeline se canceló (el escritor falló o terminó antes de tiempo)."""
+
+
+def _put(q, item, stop):
+    """Encola ``item`` esperando mientras la cola esté llena, salvo que se cancele el pipeline."""
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return
+        except queue.Full:
+            continue
+    raise _Stopped()
+
+
+def _get(q, stop):
+    """Saca el siguiente elemento de la cola, salvo que se cancele el pipeline."""
+    while not stop.is_set():
+        try:
+            return q.get(timeout=0.1)
+        except queue.Empty:
+            continue
+    raise _Stopped()
+
+
+def _decode(file_path, for_model, source_format=None):
+    """Lee una página. Devuelve (píxeles, formato original, es_gris).
+
+    Para el modelo los píxeles son (3, H, W) float32; si no, (H, W, 3) uint8.
+    ``source_format`` (de la validación) abre la página directamente con su
+    decodificador, sin probar los demás formatos.
+    """
+    with Image.open(file_path, formats=[source_format] if source_format else None) as image:
+        source_format = image.format
+        grayscale = image.mode in _GRAYSCALE_MODES
+        if for_model:
+            pixels = superres.imagen_a_array(image)
+        else:
+            pixels = np.asarray(image.convert('RGB'))
+    return pixels, source_format, grayscale
+
+
+def _load(file_path, for_model, source_format, cache, cache_settings, timer):
+    """Lee una página consultando antes la caché.
+
+    Devuelve (clave de caché, (bytes, extensión) si estaba en la caché, página decodificada).
+    """
+    name = os.path.basename(file_path)
+    if cache is None:
+        with timer.stage("decode", page=name):
+            return None, None, _decode(file_path, for_model, source_format)
+    with timer.stage("read", page=name):
+        with open(file_path, 'rb') as f:
+            data = f.read()
+        key = sr_cache.make_key(data, *cache_settings)
+        cached = cache.get(key)
+    if cached is not None:
+        return key, cached, None
+    with timer.stage("decode", page=name):
+        return key, None, _decode(io.BytesIO(data), for_model, source_format)
+
+
+def upscale_batch(run, arrays, tile_size, tile_overlap, batch_size, file_paths, page_errors, timer):
+    """Amplía un lote; si falla, reintenta página a página. None = conservar la original.
+
+    También lo usan los procesos de sr_pool.SrPool.
+    """
+    try:
+        with timer.stage("upscale", count=len(arrays), page=os.path.basename(file_paths[0])):
+            return superres.upscale_arrays(run, arrays, tile_size, tile_overlap, batch_size)
+    except Exception as e:
+        print(f"Error en el lote de superresolución ({len(arrays)} páginas), reintentando una a una: {e}")
+    results = []
+    for array, file_path in zip(arrays, file_paths):
+        try:
+            with timer.stage("upscale", page=os.path.basename(file_path)):
+                results.append(superres.upscale_array(run, array, tile_size, tile_overlap, batch_size))
+        except Exception as e:
+            print(f"Error al aplicar superresolución a {os.path.basename(file_path)}: {e}")
+            page_errors[file_path] = f"no se pudo aplicar superresolución: {e}"
+            results.append(None)
+    return results
+
+
+def _encode(encoder, decoded, file_path, page_errors, timer):
+    """Codifica la página en memoria. Devuelve (bytes, formato original) o None = guardar la original."""
+    if decoded is None:
+        return None
+    pixels, source_format, grayscale = decoded
+    try:
+        with timer.stage("encode", page=os.path.basename(file_path)):
+            return encoder.encode(pixels, source_format, grayscale), source_format
+    except Exception as e:
+        print(f"Error al codificar la página {os.path.basename(file_path)}: {e}")
+        page_errors[file_path] = f"no se pudo codificar: {e}"
+        return None
+
+
+def _encode_pooled(encoder, upscaled, position, decoded, file_path, page_errors, timer):
+    """Espera el lote ``upscaled`` (Future de sr_pool.SrPool) y codifica su página ``position``."""
+    try:
+        results, errors, timings = upscaled.result()
+    except Exception as e:
+        print(f"Error en el grupo de superresolución con {os.path.basename(file_path)}: {e}")
+        page_errors[file_path] = f"no se pudo aplicar superresolución: {e}"
+        return None
+    if position == 0:
+        timer.merge(timings) # Una vez por lote
+    if file_path in errors:
+        page_errors[file_path] = errors[file_path]
+    if results[position] is None:
+        return None
+    return _encode(encoder, (results[position],) + decoded[1:], file_path, page_errors, timer)
+
+
+def _unique_arcname(arcname, ext, used_names):
+    """Nombre libre en el .cbz para la página ``arcname`` guardada con la extensión ``ext``.
+
+    Prueba ``01.jpg`` y, si ya está (p. ej. 01.png y 01.jpg en la misma
+    carpeta), ``01.png.jpg``, que queda justo detrás; luego ``01.png-2.jpg``...
+    """
+    candidate = os.path.splitext(arcname)[0] + ext
+    if candidate not in used_names:
+        return candidate
+    candidate = arcname + ext
+    number = 2
+    while candidate in used_names:
+        candidate = f"{arcname}-{number}{ext}"
+        number += 1
+    return candidate
+
+
+def encode_into_zip(zipf, file_paths, arcnames, run=None, encoder=None, tile_size=superres.DEFAULT_TILE_SIZE,
+                    tile_overlap=superres.DEFAULT_TILE_OVERLAP, batch_size=superres.DEFAULT_BATCH_SIZE,
+                    decode_workers=DEFAULT_DECODE_WORKERS, encode_workers=DEFAULT_ENCODE_WORKERS,
+                    on_page_written=None, cache=None, source_formats=None, on_page_error=None, timer=None,
+                    model_id=superres.MODEL_ID, sr_pool=None, model_scale=superres.MODEL_SCALE):
+    """Amplía ``file_paths`` con ``run`` (si hay modelo), los codifica con ``encoder`` y los escribe en ``zipf``.
+
+    ``zipf`` debe ser un cbz.CbzWriter (usa ``write`` y ``writestr``). Las
+    entradas se llaman como ``arcnames`` pero con la extensión del formato de
+    salida. ``on_page_written(índice)`` se llama tras escribir cada página.
+    Una página que no se pueda leer, ampliar o codificar se guarda sin
+    cambios, como hasta ahora. Devuelve las estadísticas de bytes por página.
+
+    ``cache`` (sr_cache.SrCache, solo con modelo) evita ampliar otra vez las
+    páginas ya procesadas con los mismos ajustes y guarda las nuevas;
+    ``model_id`` (superres.model_id) y ``model_scale`` forman parte de su clave.
+    ``source_formats`` (formato de Pillow por página, de validation.py) evita
+    que Pillow tenga que adivinar el formato al abrir cada página.
+    ``on_page_error(ruta, motivo)`` se llama (desde el hilo que llama) por
+    cada página que se guarda sin cambios por un error. ``timer``
+    (profiling.StageTimer) acumula el tiempo de cada etapa.
+
+    Con ``sr_pool`` (sr_pool.SrPool) los lotes se amplían en sus procesos
+    en lugar de con ``run``, que solo indica que hay modelo.
+    """
+    encoder = encoder or encoders.OutputEncoder()
+    timer = timer or profiling.StageTimer()
+    batch_size = max(1, batch_size)
+    # Páginas en vuelo entre etapas: acota la memoria (con procesos, un lote por proceso)
+    depth = 2 * batch_size * (sr_pool.workers if sr_pool is not None else 1)
+    decoded_q = queue.Queue(maxsize=depth)
+    encoded_q = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+    errors = []
+    page_errors = {} # ruta -> motivo por el que se guarda la original
+    stats = encoders.EncodeStats()
+    if run is None:
+        cache = None # Solo se guardan resultados de superresolución
+    cache_settings = (encoder.cache_key(), tile_size, tile_overlap, model_id, model_scale)
+
+    decode_pool = ThreadPoolExecutor(max_workers=max(1, decode_workers), thread_name_prefix="page-decode")
+    encode_pool = ThreadPoolExecutor(max_workers=max(1, encode_workers), thread_name_prefix="page-encode")
+
+    def feeder():
+        """Etapa 1: lanza la decodificación de cada página (en orden) en el grupo de hilos."""
+        try:
+            for file_path, source_format in zip(file_paths, source_formats or [None] * len(file_paths)):
+                future = decode_pool.submit(_load, file_path, run is not None, source_format, cache,
+                                            cache_settings, timer)
+                _put(decoded_q, (file_path, future), stop)
+            _put(decoded_q, _END, stop)
+        except _Stopped:
+            pass
+
+    def inference():
+        """Etapa 2: agrupa páginas decodificadas en lotes, ejecuta el modelo y lanza la codificación."""
+        try:
+            done = False
+            while not done:
+                batch = []
+                while len(batch) < batch_size:
+                    item = _get(decoded_q, stop)
+                    if item is _END:
+                        done = True
+                        break
+                    batch.append(item)
+
+                keys = [None] * len(batch)
+                cached = [None] * len(batch) # (bytes, extensión) de la caché
+                results = [None] * len(batch) # (píxeles, formato, es_gris) o None
+                for index, (file_path, future) in enumerate(batch):
+                    try:
+                        keys[index], cached[index], results[index] = future.result()
+                    except Exception as e:
+                        print(f"Advertencia: no se pudo leer {os.path.basename(file_path)}: {e}")
+                        page_errors[file_path] = f"no se pudo leer: {e}"
+                ready = [index for index, decoded in enumerate(results) if decoded is not None]
+                if sr_pool is not None and ready:
+                    upscaled = sr_pool.upscale([results[index][0] for index in ready], tile_size, tile_overlap,
+                                               batch_size, [batch[index][0] for index in ready])
+                    positions = {index: position for position, index in enumerate(ready)}
+                    for index, ((file_path, _), key, hit, decoded) in enumerate(zip(batch, keys, cached, results)):
+                        if hit is not None:
+                            future = None
+                        elif index in positions:
+                            future = encode_pool.submit(_encode_pooled, encoder, upscaled, positions[index], decoded,
+                                                        file_path, page_errors, timer)
+                        else:
+                            future = encode_pool.submit(_encode, encoder, None, file_path, page_errors, timer)
+                        _put(encoded_q, (file_path, key, hit, future), stop)
+                    continue
+                if run is not None and ready:
+                    paths = [batch[index][0] for index in ready]
+                    upscaled = upscale_batch(run, [results[index][0] for index in ready], tile_size,
+                                              tile_overlap, batch_size, paths, page_errors, timer)
+                    for index, pixels in zip(ready, upscaled):
+                        results[index] = None if pixels is None else (pixels,) + results[index][1:]
+                for (file_path, _), key, hit, decoded in zip(batch, keys, cached, results):
+                    future = None if hit is not None else encode_pool.submit(_encode, encoder, decoded, file_path,
+                                                                                  page_errors, timer)
+                    _put(encoded_q, (file_path, key, hit, future), stop)
+            _put(encoded_q, _END, stop)
+        except _Stopped:
+            pass
+        except Exception as e:
+            errors.append(e)
+            stop.set()
+
+    threads = [threading.Thread(target=feeder, name="page-feeder", daemon=True),
+               threading.Thread(target=inference, name="page-inference", daemon=True)]
+    for thread in threads:
+        thread.start()
+
+    # Etapa 4: escritor único, en el hilo que llama, en el orden original
+    used_names = set()
+    try:
+        index = 0
+        wait_start = time.perf_counter()
+        while True:
+            try:
+                item = encoded_q.get(timeout=0.1)
+            except queue.Empty:
+                if errors:
+                    raise errors[0]
+                continue
+            if item is _END:
+                break
+            file_path, key, hit, future = item
+            encoded = hit if hit is not None else future.result()
+            timer.add("wait", time.perf_counter() - wait_start)
+            if hit is None and encoded is not None:
+                data, source_format = encoded
+                encoded = data, os.path.splitext(encoder.arcname(arcnames[index], source_format))[1]
+                if cache is not None:
+                    with timer.stage("cache", page=os.path.basename(file_path)):
+                        cache.put(key, *encoded)
+            zip_start = time.perf_counter()
+            if encoded is None:
+                arcname = _unique_arcname(arcnames[index], os.path.splitext(arcnames[index])[1], used_names)
+                zipf.write(file_path, arcname)
+                if on_page_error is not None and file_path in page_errors:
+                    on_page_error(file_path, page_errors[file_path])
+            else:
+                data, ext = encoded
+                arcname = _unique_arcname(arcnames[index], ext, used_names)
+                # La página va de memoria al ZIP, sin archivos temporales
+                zipf.writestr(arcname, data, source_path=file_path)
+                stats.add(len(data))
+            timer.add("zip", time.perf_counter() - zip_start, page=arcname)
+            used_names.add(arcname)
+            if on_page_written is not None:
+                on_page_written(index)
+            index += 1
+            wait_start = time.perf_counter()
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
+        decode_pool.shutdown(wait=True)
+        encode_pool.shutdown(wait=True)
+    return stats
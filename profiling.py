@@ -0,0 +1,248 @@
+"""Tiempos por etapa, memoria y perfil opcional de un trabajo de CompressIt.
+
+Para saber si un trabajo lento está limitado por la lectura, el modelo, la
+codificación, el ZIP o la validación, el motor y el pipeline miden cada
+etapa con un ``StageTimer``:
+
+    scan      recorrido del índice de la biblioteca
+    validate  validación a fondo de las páginas (deep_validation)
+    read      lectura de la página para la clave de la caché
+    decode    decodificación con Pillow
+    upscale   inferencia de MSRN (por lote; cuenta páginas)
+    encode    codificación de la página de salida
+    cache     guardar las páginas nuevas en la caché de superresolución
+    zip       escritura en el .cbz (incluye DEFLATE si se aplica)
+    wait      tiempo que el escritor espera a las etapas anteriores
+
+Las etapas que corren en varios hilos suman el tiempo de todos ellos, así
+que el total de una etapa puede superar la duración del trabajo. Si ``wait``
+es alto, el cuello de botella está antes del ZIP.
+
+``TraceWriter`` guarda además cada medición (etapa, página, hilo) en un
+archivo JSON Lines, y ``Profiler`` ejecuta el trabajo bajo cProfile.
+"""
+import cProfile
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+STAGES = ("scan", "validate", "read", "decode", "upscale", "encode", "cache", "zip", "wait")
+
+
+class StageTimer:
+    """Tiempo acumulado por etapa: veces, segundos y máximo. Se puede usar desde varios hilos.
+
+    ``trace`` (opcional) se llama con (etapa, segundos, página) en cada medición.
+    """
+
+    def __init__(self, trace=None):
+        self.trace = trace
+        self._lock = threading.Lock()
+        self._stages = {} # etapa -> [veces, segundos, máximo]
+
+    def add(self, stage, seconds, count=1, page=None):
+        with self._lock:
+            entry = self._stages.setdefault(stage, [0, 0.0, 0.0])
+            entry[0] += count
+            entry[1] += seconds
+            entry[2] = max(entry[2], seconds / count if count else seconds)
+        if self.trace is not None:
+            self.trace(stage, seconds, page)
+
+    @contextmanager
+    def stage(self, name, count=1, page=None):
+        """Mide el bloque ``with`` como ``count`` ejecuciones de la etapa ``name``."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start, count, page)
+
+    def merge(self, data):
+        """Suma las mediciones de otro StageTimer, en el formato de ``as_dict`` (p. ej. de otro proceso)."""
+        with self._lock:
+            for stage, values in data.items():
+                entry = self._stages.setdefault(stage, [0, 0.0, 0.0])
+                entry[0] += values["count"]
+                entry[1] += values["total_s"]
+                entry[2] = max(entry[2], values["max_ms"] / 1000)
+
+    def total(self, stage):
+        with self._lock:
+            return self._stages.get(stage, [0, 0.0, 0.0])[1]
+
+    def as_dict(self):
+        """{etapa: {"count", "total_s", "mean_ms", "max_ms"}}, en el orden de STAGES."""
+        with self._lock:
+            order = [stage for stage in STAGES if stage in self._stages]
+            order += sorted(stage for stage in self._stages if stage not in STAGES)
+            return {stage: {"count": self._stages[stage][0],
+                            "total_s": round(self._stages[stage][1], 4),
+                            "mean_ms": round(1000 * self._stages[stage][1] / max(1, self._stages[stage][0]), 3),
+                            "max_ms": round(1000 * self._stages[stage][2], 3)}
+                    for stage in order}
+
+    def summary(self):
+        """Texto corto: "upscale 31.2 s (120 ms/u), encode 4.1 s (16 ms/u), ..."."""
+        stages = self.as_dict()
+        if not stages:
+            return "Sin mediciones."
+        return ", ".join(f"{stage} {values['total_s']:.1f} s ({values['mean_ms']:.0f} ms/u)"
+                         for stage, values in stages.items())
+
+
+class TraceWriter:
+    """Escribe cada medición en ``path`` como una línea JSON (para analizarla página a página)."""
+
+    def __init__(self, path):
+        self._file = open(path, "w", encoding="utf-8")
+        self._lock = threading.Lock()
+        self._start = time.perf_counter()
+
+    def __call__(self, stage, seconds, page=None):
+        record = {"t": round(time.perf_counter() - self._start, 6), "stage": stage, "ms": round(seconds * 1000, 3),
+                  "page": page, "thread": threading.current_thread().name}
+        with self._lock:
+            self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+def _peak_rss_windows():
+    """Pico de memoria (working set) del proceso en Windows, con ctypes."""
+    import ctypes
+    from ctypes import wintypes
+
+    class ProcessMemoryCounters(ctypes.Structure):
+        _fields_ = [("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD),
+                    ("PeakWorkingSetSize", ctypes.c_size_t), ("WorkingSetSize", ctypes.c_size_t),
+                    ("QuotaPeakPagedPoolUsage", ctypes.c_size_t), ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                    ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t), ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                    ("PagefileUsage", ctypes.c_size_t), ("PeakPagefileUsage", ctypes.c_size_t)]
+
+    counters = ProcessMemoryCounters()
+    counters.cb = ctypes.sizeof(counters)
+    process = ctypes.windll.kernel32.GetCurrentProcess()
+    if not ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb):
+        return None
+    return counters.PeakWorkingSetSize
+
+
+def peak_rss(children=False):
+    """Pico de memoria residente de este proceso en bytes, o None si no se puede saber.
+
+    Con ``children``, el mayor de los procesos hijos ya terminados (p. ej. el
+    grupo de procesos de chapter_workers); solo donde existe ``resource``.
+    """
+    try:
+        import resource
+    except ImportError:
+        if children:
+            return None
+        try:
+            return _peak_rss_windows()
+        except Exception:
+            return None
+    peak = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024 # Linux lo da en KB
+
+
+def _available_memory_windows():
+    """Memoria física disponible en Windows (GlobalMemoryStatusEx), con ctypes."""
+    import ctypes
+    from ctypes import wintypes
+
+    class MemoryStatusEx(ctypes.Structure):
+        _fields_ = [("dwLength", wintypes.DWORD), ("dwMemoryLoad", wintypes.DWORD),
+                    ("ullTotalPhys", ctypes.c_ulonglong), ("ullAvailPhys", ctypes.c_ulonglong),
+                    ("ullTotalPageFile", ctypes.c_ulonglong), ("ullAvailPageFile", ctypes.c_ulonglong),
+                    ("ullTotalVirtual", ctypes.c_ulonglong), ("ullAvailVirtual", ctypes.c_ulonglong),
+                    ("ullAvailExtendedVirtual", ctypes.c_ulonglong)]
+
+    status = MemoryStatusEx()
+    status.dwLength = ctypes.sizeof(status)
+    if not ctypes.windll.kernel32.GlobalMemoryStatusEx(ctypes.byref(status)):
+        return None
+    return status.ullAvailPhys
+
+
+def available_memory():
+    """Memoria física disponible en bytes (MemAvailable en Linux), o None si no se puede saber."""
+    try:
+        with open("/proc/meminfo", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError):
+        pass
+    if sys.platform == "win32":
+        try:
+            return _available_memory_windows()
+        except Exception:
+            return None
+    try:
+        return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    except (AttributeError, OSError, ValueError):
+        return None
+
+
+def available_cores():
+    """Núcleos que puede usar este proceso (respeta la afinidad en Linux)."""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def torch_memory():
+    """Picos de memoria de CUDA según torch, o None sin GPU en uso.
+
+    No importa torch: si el trabajo no lo cargó, no hay nada que medir.
+    """
+    torch = sys.modules.get("torch")
+    if torch is None or not torch.cuda.is_available() or not torch.cuda.is_initialized():
+        return None
+    return {"max_allocated": torch.cuda.max_memory_allocated(), "max_reserved": torch.cuda.max_memory_reserved()}
+
+
+def reset_torch_peak():
+    """Reinicia los picos de memoria de CUDA para medir solo este trabajo."""
+    torch = sys.modules.get("torch")
+    if torch is not None and torch.cuda.is_available() and torch.cuda.is_initialized():
+        torch.cuda.reset_peak_memory_stats()
+
+
+def memory_report():
+    """Memoria para el informe: picos de este proceso y de sus hijos (bytes o None) y de torch."""
+    return {"peak_rss": peak_rss(), "peak_rss_children": peak_rss(children=True) or None,
+            "torch": torch_memory()}
+
+
+class Profiler:
+    """cProfile entre ``start()`` y ``stop()``; guarda las estadísticas en ``path`` (None = no hace nada).
+
+    cProfile solo ve el hilo que lo activa: los hilos del pipeline aparecen
+    en los tiempos por etapa, no en el perfil.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._profile = cProfile.Profile() if path else None
+
+    def start(self):
+        if self._profile is not None:
+            self._profile.enable()
+
+    def stop(self):
+        if self._profile is None:
+            return
+        self._profile.disable()
+        try:
+            self._profile.dump_stats(self.path)
+            print(f"Perfil guardado en: {os.path.abspath(self.path)} (ver con: python -m pstats {self.path})")
+        except OSError as e:
+            print(f"Advertencia: no se pudo guardar el perfil {self.path}: {e}")
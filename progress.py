@@ -0,0 +1,119 @@
+"""Progreso coalescido entre el motor (hilo de trabajo) y la GUI.
+
+El motor envía un 'progress_file' por página; meter cada uno en una cola y
+redibujar la ventana por cada mensaje hacía que, empaquetando sin
+superresolución, Tk gastara más CPU que el propio trabajo. ``ProgressState``
+se pasa como ``progress_callback``: los mensajes de progreso solo
+actualizan contadores (gana el último valor) y los demás ('info',
+'warning', 'error', 'done') se guardan en orden. La GUI lee una
+instantánea a ritmo fijo con ``snapshot()``, que además calcula páginas/s,
+MB/s y el tiempo restante.
+"""
+import threading
+import time
+
+# Intervalo de lectura de la GUI: rápido mientras hay cambios y más lento si no los hay
+DEFAULT_INTERVAL_MS = 100
+MAX_INTERVAL_MS = 500
+
+
+def next_interval(interval, changed):
+    """Siguiente intervalo de sondeo (ms): vuelve al mínimo si hubo cambios y se duplica si no."""
+    return DEFAULT_INTERVAL_MS if changed else min(interval * 2, MAX_INTERVAL_MS)
+
+
+def format_eta(seconds):
+    """Segundos -> "h:mm:ss" o "m:ss"."""
+    seconds = int(round(seconds))
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes}:{seconds:02d}"
+
+
+class ProgressSnapshot:
+    """Estado del trabajo en un instante, con los mensajes pendientes de mostrar."""
+
+    def __init__(self, version, folder, file, pages_done, pages_total, bytes_done, elapsed, events):
+        self.version = version
+        self.folder = folder # (actual, total, nombre)
+        self.file = file # (actual, total)
+        self.pages_done = pages_done
+        self.pages_total = pages_total
+        self.bytes_done = bytes_done
+        self.elapsed = elapsed
+        self.events = events
+
+    @property
+    def pages_per_second(self):
+        return self.pages_done / self.elapsed if self.elapsed > 0 else 0.0
+
+    @property
+    def mb_per_second(self):
+        return self.bytes_done / 1e6 / self.elapsed if self.elapsed > 0 else 0.0
+
+    @property
+    def eta(self):
+        """Segundos restantes estimados, o None si aún no se puede estimar."""
+        rate = self.pages_per_second
+        if not rate or not self.pages_total:
+            return None
+        return max(0, self.pages_total - self.pages_done) / rate
+
+    def rate_text(self):
+        """Texto para la GUI: "12.3 pág/s · 4.5 MB/s · quedan 1:23"."""
+        if not self.pages_done:
+            return ""
+        text = f"{self.pages_per_second:.1f} pág/s · {self.mb_per_second:.1f} MB/s"
+        eta = self.eta
+        if eta is not None:
+            text += f" · quedan {format_eta(eta)}"
+        return text
+
+
+class ProgressState:
+    """Callback de progreso para el motor que la GUI lee con ``snapshot()``.
+
+    Mensajes que entiende además del protocolo de engine.py:
+    ``('progress_total', páginas, bytes)`` con el total del trabajo, y el
+    cuarto dato opcional de 'progress_file' con los bytes de esa página.
+    """
+
+    def __init__(self, clock=time.monotonic):
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._version = 0
+        self._folder = (0, 0, "")
+        self._file = (0, 0)
+        self._pages_done = 0
+        self._pages_total = 0
+        self._bytes_done = 0
+        self._started = None # Primera página: la carga del modelo no cuenta para la velocidad
+        self._events = []
+
+    def __call__(self, message):
+        msg_type, msg_data = message[0], message[1:]
+        with self._lock:
+            self._version += 1
+            if msg_type == 'progress_folder':
+                self._folder = tuple(msg_data)
+                self._file = (0, 0)
+            elif msg_type == 'progress_file':
+                current, total = msg_data[:2]
+                if self._started is None:
+                    self._started = self._clock()
+                self._pages_done += max(0, current - self._file[0])
+                if len(msg_data) > 2:
+                    self._bytes_done += msg_data[2]
+                self._file = (current, total)
+            elif msg_type == 'progress_total':
+                self._pages_total = msg_data[0]
+            else:
+                self._events.append(message)
+
+    def snapshot(self):
+        """Devuelve el estado actual y vacía la lista de mensajes pendientes."""
+        with self._lock:
+            events, self._events = self._events, []
+            elapsed = self._clock() - self._started if self._started is not None else 0.0
+            return ProgressSnapshot(self._version, self._folder, self._file, self._pages_done,
+                                    self._pages_total, self._bytes_done, elapsed, events)
@@ -0,0 +1,181 @@
+"""Renombrado de SnapTitle: plan completo, dos fases y diario para deshacer.
+
+Para cada subcarpeta se calcula primero el plan entero (orden natural:
+``2.png`` va antes que ``10.png``) y se comprueba que ningún nombre nuevo
+pise un archivo que no forma parte del plan. Después se aplica en dos
+fases: todas las páginas pasan a un nombre temporal único y de ahí a su
+nombre final, así que renombrar ``1.png`` a ``01.png`` nunca choca con un
+``01.png`` que también se va a renombrar.
+
+Antes de tocar nada se escribe ``.snaptitle_undo.json`` en la carpeta raíz
+con (original, temporal, nuevo) de cada archivo. ``undo`` lo usa para
+devolver cada archivo a su nombre original, esté donde esté (también si el
+proceso se cortó a medias). Las subcarpetas se procesan en paralelo.
+"""
+import json
+import os
+import re
+import tempfile
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from manifest import FILE_MODE
+
+JOURNAL_NAME = ".snaptitle_undo.json"
+JOURNAL_VERSION = 1
+TEMP_PREFIX = ".snaptitle-"
+DEFAULT_WORKERS = 8
+
+
+def natural_key(name):
+    """Clave de orden natural: los números se comparan por valor (2 < 10)."""
+    parts = re.split(r"(\d+)", name.lower())
+    return [int(part) if index % 2 else part for index, part in enumerate(parts)], name
+
+
+def plan_folder(folder_path, image_files):
+    """Calcula el plan de una subcarpeta: [[original, temporal, nuevo]] solo de los que cambian.
+
+    Lanza ``ValueError`` si un nombre nuevo ya lo usa un archivo que no se renombra.
+    """
+    token = uuid.uuid4().hex[:8]
+    plan = []
+    for index, filename in enumerate(sorted(image_files, key=natural_key), start=1):
+        file_extension = os.path.splitext(filename)[1]
+        new_filename = f"{index:02d}{file_extension}"
+        if new_filename != filename: # Evita renombrar si el nombre ya es correcto
+            plan.append([filename, f"{TEMP_PREFIX}{token}-{index}{file_extension}", new_filename])
+
+    sources = set(image_files)
+    existing = set(os.listdir(folder_path))
+    for _, _, new_filename in plan:
+        if new_filename in existing and new_filename not in sources:
+            raise ValueError(f"'{new_filename}' ya existe y no es una de las imágenes a renombrar")
+    return plan
+
+
+def _apply(folder_path, moves):
+    """Aplica [(actual, temporal, final)] en dos fases; si falla, deshace lo hecho y relanza."""
+    to_temp = []
+    to_final = []
+    try:
+        for current, temp, final in moves:
+            os.rename(os.path.join(folder_path, current), os.path.join(folder_path, temp))
+            to_temp.append((current, temp))
+        for current, temp, final in moves:
+            os.rename(os.path.join(folder_path, temp), os.path.join(folder_path, final))
+            to_final.append((temp, final))
+    except OSError:
+        # Vuelta atrás en orden inverso (lo que no se pueda, queda en el diario)
+        for temp, final in reversed(to_final):
+            try:
+                os.rename(os.path.join(folder_path, final), os.path.join(folder_path, temp))
+            except OSError:
+                pass
+        for current, temp in reversed(to_temp):
+            try:
+                os.rename(os.path.join(folder_path, temp), os.path.join(folder_path, current))
+            except OSError:
+                pass
+        raise
+
+
+def _write_journal(root, plans):
+    """Guarda el diario de forma atómica antes de renombrar."""
+    data = {"version": JOURNAL_VERSION, "folders": plans}
+    fd, tmp_path = tempfile.mkstemp(dir=root, prefix=JOURNAL_NAME, suffix=".part")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp_path, FILE_MODE) # mkstemp lo crea con 0600
+        os.replace(tmp_path, os.path.join(root, JOURNAL_NAME))
+    except OSError:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def _run(root, plans, apply_folder, workers):
+    """Aplica ``apply_folder(subcarpeta, plan)`` en paralelo. Devuelve (renombrados, errores)."""
+    renamed = 0
+    errors = []
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="snaptitle") as pool:
+        futures = {pool.submit(apply_folder, os.path.join(root, folder), plan): folder
+                   for folder, plan in plans.items()}
+        for future, folder in futures.items():
+            try:
+                renamed += future.result()
+            except (OSError, ValueError) as e:
+                errors.append(f"{folder}: {e}")
+    return renamed, errors
+
+
+def rename_library(root, folders, workers=DEFAULT_WORKERS, dry_run=False):
+    """Renombra las imágenes de varias subcarpetas de ``root``.
+
+    ``folders`` es {subcarpeta: [imágenes]}. Devuelve (renombradas, errores,
+    planes), con planes = {subcarpeta: [[original, temporal, nuevo]]}. Con
+    ``dry_run`` solo se calculan los planes. Una subcarpeta con conflicto o
+    error queda como estaba y su error se añade a la lista, sin detener las demás.
+    """
+    plans = {}
+    errors = []
+    for folder, image_files in folders.items():
+        try:
+            plan = plan_folder(os.path.join(root, folder), image_files)
+        except (OSError, ValueError) as e:
+            errors.append(f"{folder}: {e}")
+            continue
+        if plan:
+            plans[folder] = plan
+    if dry_run or not plans:
+        return sum(len(plan) for plan in plans.values()) if dry_run else 0, errors, plans
+
+    _write_journal(root, plans)
+
+    def apply_folder(folder_path, plan):
+        _apply(folder_path, plan)
+        return len(plan)
+
+    renamed, apply_errors = _run(root, plans, apply_folder, workers)
+    return renamed, errors + apply_errors, plans
+
+
+def has_journal(root):
+    return os.path.isfile(os.path.join(root, JOURNAL_NAME))
+
+
+def undo(root, workers=DEFAULT_WORKERS):
+    """Devuelve a su nombre original los archivos del último renombrado de ``root``.
+
+    Devuelve (restaurados, errores). Si todo se restauró, borra el diario.
+    """
+    journal_path = os.path.join(root, JOURNAL_NAME)
+    with open(journal_path, encoding="utf-8") as f:
+        data = json.load(f)
+    if data.get("version") != JOURNAL_VERSION:
+        raise ValueError(f"Versión de diario no soportada: {data.get('version')}")
+
+    def undo_folder(folder_path, plan):
+        existing = set(os.listdir(folder_path))
+        token = uuid.uuid4().hex[:8]
+        moves = []
+        for index, (original, temp, new_filename) in enumerate(plan):
+            # El archivo puede estar con su nombre nuevo o, si se cortó el proceso, con el temporal
+            current = new_filename if new_filename in existing else temp if temp in existing else None
+            if current is None or current == original:
+                continue
+            moves.append((current, f"{TEMP_PREFIX}{token}-{index}{os.path.splitext(original)[1]}", original))
+        currents = {current for current, _, _ in moves}
+        for _, _, original in moves:
+            if original in existing and original not in currents:
+                raise ValueError(f"'{original}' ya existe; no se puede restaurar sin sobrescribirlo")
+        _apply(folder_path, moves)
+        return len(moves)
+
+    restored, errors = _run(root, data.get("folders", {}), undo_folder, workers)
+    if not errors:
+        os.remove(journal_path)
+    return restored, errors
@@ -0,0 +1,136 @@
+"""Registro de errores agregado e informe estructurado de cada trabajo.
+
+Los mensajes 'error' y 'warning' del motor llevan una categoría opcional
+como tercer elemento: ``('warning', mensaje, categoria)``. Así cientos de
+páginas dañadas se resumen como "página no válida: 312" en lugar de abrir
+un diálogo por cada una.
+
+- ``ErrorLog``: registro en memoria (acotado) con recuentos por categoría;
+  la GUI lo muestra en un panel que no bloquea.
+- ``RunReport``: envuelve el ``progress_callback`` del motor, guarda todo lo
+  que pasa durante el trabajo y lo escribe como JSON al terminar.
+"""
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import Counter, deque
+
+from manifest import FILE_MODE
+
+REPORT_NAME = ".compressit_report.json"
+MAX_LOG_ENTRIES = 1000
+
+# Categorías de los mensajes del motor
+CATEGORY_GENERAL = "general"
+CATEGORY_SOURCE = "carpeta de origen"
+CATEGORY_MODEL = "modelo"
+CATEGORY_CHAPTER = "capítulo"
+CATEGORY_PAGE = "página no válida"
+CATEGORY_MANIFEST = "manifiesto"
+CATEGORY_FILES = "archivos"
+CATEGORY_RENAME = "renombrado"
+
+
+def message_category(message):
+    """Categoría de un mensaje 'error'/'warning' (la general si no trae ninguna)."""
+    return message[2] if len(message) > 2 and message[2] else CATEGORY_GENERAL
+
+
+class ErrorLog:
+    """Errores y advertencias de un trabajo: recuentos completos y los últimos mensajes."""
+
+    def __init__(self, max_entries=MAX_LOG_ENTRIES):
+        self.counts = {"error": Counter(), "warning": Counter()}
+        self.entries = deque(maxlen=max_entries) # (nivel, categoría, mensaje)
+
+    def add(self, level, message, category=CATEGORY_GENERAL):
+        self.counts[level][category] += 1
+        self.entries.append((level, category, message))
+
+    def total(self, level):
+        return sum(self.counts[level].values())
+
+    def summary(self):
+        """Texto corto: "2 errores, 312 advertencias (página no válida: 310, ...)"."""
+        if not self.total("error") and not self.total("warning"):
+            return "Sin errores."
+        categories = self.counts["error"] + self.counts["warning"]
+        detail = ", ".join(f"{category}: {count}" for category, count in categories.most_common())
+        return f"{self.total('error')} errores, {self.total('warning')} advertencias ({detail})"
+
+
+class RunReport:
+    """Callback que registra los mensajes de un trabajo y los reenvía a ``forward``.
+
+    Además de los mensajes normales recoge ``('chapter', nombre, datos)`` con
+    las estadísticas de cada capítulo. ``write`` guarda el informe en JSON.
+    De los mensajes se guardan los últimos ``max_messages``; los recuentos
+    por nivel y categoría incluyen todos, y se anota cuántos se descartaron.
+    """
+
+    def __init__(self, forward=None, clock=time.time, max_messages=MAX_LOG_ENTRIES):
+        self.forward = forward
+        self._clock = clock
+        self._lock = threading.Lock() # El pipeline informa desde sus hilos
+        self.started = clock()
+        self.finished = None
+        self.settings = {}
+        self.profile = None # Tiempos por etapa y memoria (ver profiling.py)
+        self.result = None
+        self.chapters = []
+        self.messages = deque(maxlen=max_messages)
+        self.message_counts = Counter() # Por nivel, incluidos los descartados
+        self.log = ErrorLog()
+
+    def __call__(self, message):
+        msg_type = message[0]
+        with self._lock:
+            if msg_type in ("error", "warning", "info"):
+                self.message_counts[msg_type] += 1
+            if msg_type in ("error", "warning"):
+                self.log.add(msg_type, message[1], message_category(message))
+                self.messages.append({"time": round(self._clock() - self.started, 3), "level": msg_type,
+                                      "category": message_category(message), "message": message[1]})
+            elif msg_type == "info":
+                self.messages.append({"time": round(self._clock() - self.started, 3), "level": "info",
+                                      "message": message[1]})
+            elif msg_type == "chapter":
+                self.chapters.append(dict(message[2], name=message[1]))
+            elif msg_type == "done":
+                self.result = message[1] if len(message) > 1 else None
+                self.finished = self._clock()
+        if self.forward is not None:
+            self.forward(message)
+
+    def as_dict(self):
+        with self._lock:
+            finished = self.finished if self.finished is not None else self._clock()
+            return {
+                "started": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started)),
+                "duration_s": round(finished - self.started, 3),
+                "result": self.result,
+                "settings": self.settings,
+                "counts": {level: dict(counts) for level, counts in self.log.counts.items()},
+                "profile": self.profile,
+                "chapters": list(self.chapters),
+                "message_counts": dict(self.message_counts),
+                "messages_dropped": sum(self.message_counts.values()) - len(self.messages),
+                "messages": list(self.messages),
+            }
+
+    def write(self, path):
+        """Escribe el informe (de forma atómica) y devuelve la ruta."""
+        folder = os.path.dirname(os.path.abspath(path))
+        fd, tmp_path = tempfile.mkstemp(dir=folder, prefix=os.path.basename(path), suffix=".part")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(self.as_dict(), f, indent=2, ensure_ascii=False)
+            os.chmod(tmp_path, FILE_MODE) # mkstemp lo crea con 0600
+            os.replace(tmp_path, path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return path
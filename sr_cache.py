@@ -0,0 +1,150 @@
+"""Caché en disco de páginas ya ampliadas, direccionada por contenido.
+
+La superresolución es, con diferencia, el paso más caro. Cada resultado se
+guarda con una clave que combina el hash de los bytes de la página original,
+el modelo, la escala, los ajustes del codificador y los de las teselas, así
+que repetir un trabajo interrumpido o re-empaquetar con otra compresión ZIP
+solo lee de la caché.
+
+Estructura: ``<directorio>/<2 primeros hex>/<clave><extensión>``. La
+extensión es la del formato de salida, para que la entrada del .cbz se llame
+igual que sin caché. Al leer una entrada se actualiza su fecha de
+modificación; al superar ``max_bytes`` se borran las menos usadas (LRU).
+"""
+import hashlib
+import os
+import tempfile
+import threading
+
+CACHE_VERSION = 1 # Subir si cambia algo que altere los resultados sin cambiar la clave
+
+DEFAULT_CACHE_DIR = os.environ.get("MANGA_SR_CACHE") or os.path.join(
+    os.path.expanduser("~"), ".cache", "manga_utilities", "sr")
+DEFAULT_MAX_MB = 4096
+PRUNE_TARGET = 0.9 # Al superar el límite se borra hasta quedar en el 90 %
+
+
+def make_key(data, encoder_key, tile_size, tile_overlap, model_id, scale):
+    """Clave (hex) de una página: hash de sus bytes y de todo lo que cambia el resultado."""
+    digest = hashlib.sha256(data)
+    settings = f"v{CACHE_VERSION}|{model_id}|x{scale}|{encoder_key}|t{tile_size or 0}:{tile_overlap}"
+    digest.update(b"\0" + settings.encode("utf-8"))
+    return digest.hexdigest()
+
+
+class SrCache:
+    """Caché de resultados de superresolución con límite de tamaño y contadores.
+
+    Segura para usar desde varios hilos (los de lectura del pipeline consultan
+    y el escritor guarda).
+    """
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_MB * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.stored = 0
+        self._lock = threading.Lock()
+        self._size = None # Se calcula al guardar la primera entrada
+
+    def _path(self, key, ext=""):
+        return os.path.join(self.directory, key[:2], key + ext)
+
+    def _entries(self):
+        """(ruta, tamaño, última vez usada) de cada entrada."""
+        entries = []
+        if not os.path.isdir(self.directory):
+            return entries
+        for prefix in os.scandir(self.directory):
+            if not prefix.is_dir():
+                continue
+            for entry in os.scandir(prefix.path):
+                if entry.is_file() and not entry.name.endswith(".part"):
+                    stat = entry.stat()
+                    entries.append((entry.path, stat.st_size, stat.st_mtime))
+        return entries
+
+    def get(self, key):
+        """Devuelve (bytes, extensión) o None si la página no está en la caché."""
+        folder = os.path.join(self.directory, key[:2])
+        try:
+            names = [name for name in os.listdir(folder)
+                     if name.startswith(key) and not name.endswith(".part")]
+        except FileNotFoundError:
+            names = []
+        for name in names:
+            path = os.path.join(folder, name)
+            try:
+                with open(path, "rb") as f:
+                    data = f.read()
+                os.utime(path) # Marca la entrada como usada recientemente (LRU)
+            except OSError:
+                continue
+            with self._lock:
+                self.hits += 1
+            return data, os.path.splitext(name)[1]
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, data, ext):
+        """Guarda el resultado de una página. Los errores de disco no interrumpen el trabajo."""
+        path = self._path(key, ext)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Escritura atómica: un proceso cortado a medias no deja entradas corruptas
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".part")
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Advertencia: no se pudo guardar en la caché de superresolución: {e}")
+            return
+        with self._lock:
+            self.stored += 1
+            if self._size is None:
+                self._size = sum(size for _, size, _ in self._entries())
+            else:
+                self._size += len(data)
+            over_limit = self.max_bytes is not None and self._size > self.max_bytes
+        if over_limit:
+            self.prune(int(self.max_bytes * PRUNE_TARGET))
+
+    def prune(self, max_bytes=None):
+        """Borra las entradas menos usadas hasta ocupar como mucho ``max_bytes``.
+
+        Sin argumento usa el límite de la caché. Devuelve (entradas borradas, bytes liberados).
+        """
+        if max_bytes is None:
+            max_bytes = self.max_bytes
+        entries = sorted(self._entries(), key=lambda entry: entry[2]) # Más antiguas primero
+        total = sum(size for _, size, _ in entries)
+        removed = freed = 0
+        for path, size, _ in entries:
+            if total <= max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+            freed += size
+        with self._lock:
+            self._size = total
+        return removed, freed
+
+    def clear(self):
+        """Vacía la caché. Devuelve (entradas borradas, bytes liberados)."""
+        return self.prune(0)
+
+    def size(self):
+        """(número de entradas, bytes ocupados)."""
+        entries = self._entries()
+        return len(entries), sum(size for _, size, _ in entries)
+
+    def summary(self):
+        total = self.hits + self.misses
+        rate = self.hits / total if total else 0.0
+        return f"caché de superresolución: {self.hits} aciertos, {self.misses} fallos ({rate:.0%}), {self.stored} guardadas"
@@ -0,0 +1,351 @@
+"""Servicio local que mantiene el modelo de superresolución cargado entre trabajos.
+
+Cada ejecución de la GUI o de la CLI carga MSRN, lo mueve al dispositivo y
+paga la primera inferencia; con muchos trabajos pequeños ese coste fijo es
+la mayor parte del tiempo. ``python cli.py daemon`` arranca un proceso que
+carga el modelo una vez, lo calienta y atiende trabajos de varios clientes
+a la vez: se encolan y se ejecutan de uno en uno con el modelo ya en
+memoria (y, con ``--sr-workers``, con el mismo grupo de procesos de
+sr_pool.py entre trabajos).
+
+El servicio escucha en 127.0.0.1 (puerto libre) o en un socket Unix y
+escribe la dirección y un token en ``STATE_PATH`` (solo legible por el
+usuario). Protocolo: una petición JSON por conexión y respuestas en JSON
+Lines::
+
+    {"token": ..., "command": "ping" | "status" | "shutdown"}
+    {"token": ..., "command": "compress", "args": {argumentos de engine.zip_folders_worker}}
+    {"token": ..., "command": "upscale", "args": {argumentos de engine.upscale_files}}
+
+    -> {"queued": trabajos_por_delante}, luego {"message": [tipo, ...]} con
+       los mensajes del motor hasta ["done", ...]
+
+``zip_folders`` y ``upscale_files`` son los clientes: envían el trabajo al
+servicio si hay uno en marcha y, si no, lo ejecutan en este proceso.
+"""
+import json
+import os
+import queue
+import secrets
+import socket
+import socketserver
+import threading
+import time
+
+import engine
+import report
+import superres
+
+STATE_PATH = os.environ.get("MANGA_DAEMON_STATE") or os.path.join(
+    os.path.expanduser("~"), ".cache", "manga_utilities", "daemon.json")
+PROTOCOL_VERSION = 1
+CONNECT_TIMEOUT = 1.0 # s para detectar el servicio
+MAX_REQUEST_BYTES = 1024 * 1024
+
+# Argumentos con rutas: el servicio puede tener otro directorio de trabajo
+_PATH_ARGS = ("source_folder", "report_path", "profile_path", "trace_path", "sr_cache_dir", "sr_model_dir",
+              "output_dir")
+
+_END = object() # Fin de los mensajes de un trabajo
+
+
+class DaemonError(Exception):
+    """El servicio rechazó la petición o la conexión se cortó a mitad de un trabajo."""
+
+
+class _Job:
+    """Trabajo en cola: hace de progress_callback y guarda los mensajes para el cliente."""
+
+    def __init__(self, command, args):
+        self.command = command
+        self.args = args
+        self.messages = queue.Queue()
+        self.detached = False # El cliente se desconectó: el trabajo sigue, los mensajes se descartan
+
+    def __call__(self, message):
+        if not self.detached:
+            self.messages.put(message)
+
+
+class SrDaemon:
+    """Servidor de trabajos con el modelo residente. ``serve_forever`` bloquea hasta ``shutdown``."""
+
+    def __init__(self, host="127.0.0.1", port=0, unix_socket=None, state_path=STATE_PATH, usar_gpu=False,
+                 job_defaults=None):
+        self.state_path = state_path
+        self.usar_gpu = usar_gpu
+        self.job_defaults = dict(job_defaults or {}) # Ajustes de SR del servicio (los del cliente mandan)
+        self.token = secrets.token_hex(16)
+        self.started = time.time()
+        self.jobs_done = 0
+        self.current = None
+        self._jobs = queue.Queue()
+        self._lock = threading.Lock()
+        if unix_socket:
+            if os.path.exists(unix_socket):
+                os.remove(unix_socket)
+            self._server = _UnixServer(unix_socket, _Handler)
+            self.address = {"socket": unix_socket}
+        else:
+            self._server = _TcpServer((host, port), _Handler)
+            self.address = {"host": host, "port": self._server.server_address[1]}
+        self._server.daemon_ref = self
+        self._worker = threading.Thread(target=self._run_jobs, name="sr-daemon-jobs", daemon=True)
+
+    # --- Ciclo de vida ---
+    def warm_up(self):
+        """Carga el modelo del ampliador por defecto, lo mueve al dispositivo y hace una inferencia de prueba."""
+        import numpy as np
+
+        start = time.perf_counter()
+        architecture, scale = superres.parse_upscaler(self.job_defaults.get("sr_upscaler", superres.DEFAULT_UPSCALER))
+        if architecture == superres.UPSCALER_LANCZOS:
+            return True # Sin modelo que cargar
+        model_sr, model_error = superres.get_model(architecture, scale)
+        if model_sr is None:
+            print(f"Advertencia: el modelo no se cargó; los trabajos se harán sin superresolución: {model_error}")
+            return False
+        device, device_info = superres.select_device(self.usar_gpu)
+        model_sr.to(device)
+        model_sr.eval()
+        superres.torch_runner(model_sr, device)(np.zeros((1, 3, 64, 64), np.float32))
+        print(f"Modelo listo en {time.perf_counter() - start:.1f} s ({device_info})")
+        return True
+
+    def serve_forever(self):
+        self._worker.start()
+        self._write_state()
+        where = self.address.get("socket") or f"{self.address['host']}:{self.address['port']}"
+        print(f"Servicio de superresolución escuchando en {where} (estado en {self.state_path})")
+        try:
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+            self._jobs.put(None)
+            self._worker.join()
+            engine.close_resident_pools()
+            self._remove_state()
+
+    def shutdown(self):
+        """Deja de aceptar conexiones; el trabajo en curso termina antes de salir."""
+        self._server.shutdown()
+
+    def _write_state(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.state_path)), exist_ok=True)
+        fd = os.open(self.state_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(dict(self.address, pid=os.getpid(), token=self.token, version=PROTOCOL_VERSION), f)
+
+    def _remove_state(self):
+        try:
+            with open(self.state_path, encoding="utf-8") as f:
+                if json.load(f).get("token") != self.token:
+                    return # Otro servicio lo sobrescribió
+            os.remove(self.state_path)
+        except (OSError, ValueError):
+            pass
+
+    # --- Trabajos ---
+    def submit(self, command, args):
+        """Encola un trabajo. Devuelve (trabajo, trabajos por delante)."""
+        job = _Job(command, args)
+        with self._lock:
+            ahead = self._jobs.qsize() + (1 if self.current is not None else 0)
+            self._jobs.put(job)
+        return job, ahead
+
+    def status(self):
+        with self._lock:
+            current = self.current
+            return {"pid": os.getpid(), "uptime_s": round(time.time() - self.started, 1),
+                    "model_loaded": superres.is_model_loaded(), "use_gpu": self.usar_gpu,
+                    "queued": self._jobs.qsize(), "jobs_done": self.jobs_done, "models": superres.loaded_models(),
+                    "current": None if current is None else {"command": current.command,
+                                                             "folder": current.args.get("source_folder")}}
+
+    def _run_jobs(self):
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                return
+            with self._lock:
+                self.current = job
+            try:
+                if job.command == "compress":
+                    args = dict(self.job_defaults, **job.args)
+                    args.setdefault("usar_gpu", self.usar_gpu)
+                    engine.zip_folders_worker(progress_callback=job, keep_sr_pool=True, **args)
+                else:
+                    engine.upscale_files(progress_callback=job, **dict({"usar_gpu": self.usar_gpu}, **job.args))
+            except TypeError as e: # Argumentos que no existen en esta versión del motor
+                job(('error', f"Petición no válida: {e}", report.CATEGORY_GENERAL))
+                job(('done', None))
+            except Exception as e: # Un trabajo que falla no debe parar el servicio ni dejar la cola esperando
+                print(f"Error en el trabajo {job.command}: {e}")
+                job(('error', f"Error inesperado en el servicio: {e}", report.CATEGORY_GENERAL))
+                job(('done', None))
+            finally:
+                job.messages.put(_END)
+                with self._lock:
+                    self.current = None
+                    self.jobs_done += 1
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    """Una conexión: lee la petición y envía las respuestas en JSON Lines."""
+
+    def _send(self, data):
+        self.wfile.write((json.dumps(data, ensure_ascii=False, default=str) + "\n").encode("utf-8"))
+        self.wfile.flush()
+
+    def handle(self):
+        daemon = self.server.daemon_ref
+        try:
+            request = json.loads(self.rfile.readline(MAX_REQUEST_BYTES))
+        except ValueError:
+            self._send({"error": "Petición no válida"})
+            return
+        if not isinstance(request, dict) or not secrets.compare_digest(str(request.get("token", "")), daemon.token):
+            self._send({"error": "Token no válido"})
+            return
+        command = request.get("command")
+        if command == "ping":
+            self._send({"ok": True, "pid": os.getpid(), "version": PROTOCOL_VERSION})
+        elif command == "status":
+            self._send({"status": daemon.status()})
+        elif command == "shutdown":
+            self._send({"ok": True})
+            threading.Thread(target=daemon.shutdown, daemon=True).start()
+        elif command in ("compress", "upscale"):
+            job, ahead = daemon.submit(command, request.get("args") or {})
+            try:
+                self._send({"queued": ahead})
+                while True:
+                    message = job.messages.get()
+                    if message is _END:
+                        break
+                    self._send({"message": list(message)})
+            except OSError:
+                job.detached = True
+        else:
+            self._send({"error": f"Orden desconocida: {command}"})
+
+
+class _TcpServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+if hasattr(socketserver, "ThreadingUnixStreamServer"):
+    class _UnixServer(socketserver.ThreadingUnixStreamServer):
+        daemon_threads = True
+else:
+    _UnixServer = None # Windows: solo TCP
+
+
+# --- Cliente ---
+def read_state(state_path=STATE_PATH):
+    try:
+        with open(state_path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _connect(state, timeout=CONNECT_TIMEOUT):
+    if state.get("socket"):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(timeout)
+        sock.connect(state["socket"])
+    else:
+        sock = socket.create_connection((state["host"], state["port"]), timeout)
+    return sock
+
+
+def request(state, command, args=None, on_message=None):
+    """Envía una orden al servicio. Los mensajes del motor van a ``on_message``; devuelve la respuesta final.
+
+    Lanza OSError si no se puede conectar y DaemonError si el servicio la rechaza
+    o la conexión se corta antes de 'done'.
+    """
+    with _connect(state) as sock:
+        sock.settimeout(None) # Un trabajo puede tardar horas
+        payload = {"token": state.get("token"), "command": command, "args": args or {}}
+        sock.sendall((json.dumps(payload, ensure_ascii=False) + "\n").encode("utf-8"))
+        with sock.makefile("r", encoding="utf-8") as reader:
+            for line in reader:
+                response = json.loads(line)
+                if "error" in response:
+                    raise DaemonError(response["error"])
+                if "queued" in response:
+                    if response["queued"] and on_message is not None:
+                        on_message(('info', f"En cola del servicio: {response['queued']} trabajos por delante"))
+                    continue
+                if "message" not in response:
+                    return response
+                message = tuple(response["message"])
+                if on_message is not None:
+                    on_message(message)
+                if message[0] == 'done':
+                    return response
+    if command in ("compress", "upscale"):
+        raise DaemonError("El servicio cerró la conexión antes de terminar el trabajo")
+    return None
+
+
+def find_daemon(state_path=STATE_PATH):
+    """Estado del servicio en marcha (dirección y token), o None si no hay ninguno que responda."""
+    state = read_state(state_path)
+    if not state or state.get("version") != PROTOCOL_VERSION:
+        return None
+    try:
+        response = request(state, "ping")
+    except (OSError, ValueError, DaemonError):
+        return None
+    return state if response and response.get("ok") else None
+
+
+def _absolute(args):
+    return {key: os.path.abspath(value) if key in _PATH_ARGS and isinstance(value, str) and value else value
+            for key, value in args.items()}
+
+
+def _remote(state, command, args, progress_callback):
+    if progress_callback is not None:
+        progress_callback(('info', f"Trabajo enviado al servicio de superresolución (pid {state.get('pid')})"))
+    try:
+        request(state, command, args, progress_callback)
+        return True
+    except (OSError, ValueError, DaemonError) as e:
+        if progress_callback is not None:
+            progress_callback(('error', f"Se perdió la conexión con el servicio de superresolución: {e}",
+                               report.CATEGORY_GENERAL))
+            progress_callback(('done', None))
+        return False
+
+
+def zip_folders(source_folder, delete_folders, move_to_done, usar_gpu, progress_callback=None, use_daemon=True,
+                state_path=STATE_PATH, **options):
+    """Como engine.zip_folders_worker, pero en el servicio si hay uno en marcha (y ``use_daemon``)."""
+    state = find_daemon(state_path) if use_daemon else None
+    if state is None:
+        return engine.zip_folders_worker(source_folder, delete_folders, move_to_done, usar_gpu, progress_callback,
+                                         **options)
+    args = dict(options, source_folder=source_folder, delete_folders=delete_folders, move_to_done=move_to_done,
+                usar_gpu=usar_gpu)
+    _remote(state, "compress", _absolute(args), progress_callback)
+
+
+def upscale_files(paths, output_dir, usar_gpu=False, progress_callback=None, use_daemon=True,
+                  state_path=STATE_PATH, **options):
+    """Como engine.upscale_files, pero en el servicio si hay uno en marcha (y ``use_daemon``)."""
+    state = find_daemon(state_path) if use_daemon else None
+    if state is None:
+        return engine.upscale_files(paths, output_dir, usar_gpu, progress_callback, **options)
+    args = dict(_absolute(dict(options, output_dir=output_dir)), usar_gpu=usar_gpu,
+                paths=[os.path.abspath(path) for path in paths])
+    saved = []
+    _remote(state, "upscale", args,
+            lambda message: (saved.append(message) if message[0] == 'upscaled' else None,
+                             progress_callback(message) if progress_callback is not None else None))
+    return len(saved)
@@ -0,0 +1,158 @@
+"""Exportación de MSRN a TorchScript y ONNX, y su ejecución con ONNX Runtime.
+
+El modelo eager de super_image se exporta una vez y se guarda junto al
+int8 (ver sr_quant.py), con un .json que incluye la comprobación de
+paridad: diferencia máxima y PSNR frente a la salida de PyTorch en teselas
+de prueba. Si la diferencia supera ``MAX_ABS_DIFF`` la exportación se
+descarta.
+
+- TorchScript: mismo resultado que el modelo eager, sin el código Python de
+  super_image; funciona en CPU y en GPU.
+- ONNX: se ejecuta con el proveedor de CPU de ONNX Runtime y
+  ``threads`` hilos intra-op, sin torch en la inferencia. onnxruntime es
+  opcional: sin él este backend no está disponible.
+"""
+import importlib.util
+import os
+import shutil
+import warnings
+import numpy as np
+
+import sr_quant
+import superres
+
+EXPORT_VERSION = 1 # Subir si cambia la forma de exportar
+ONNX_OPSET = 17
+EXPORT_TILE = 64 # Tamaño del ejemplo al exportar (los ejes de lote, alto y ancho son dinámicos)
+# Diferencia máxima admitida frente a PyTorch (salida en [0, 1])
+MAX_ABS_DIFF = 1e-3
+
+_EXTENSIONS = {superres.BACKEND_TORCHSCRIPT: "pt", superres.BACKEND_ONNX: "onnx"}
+
+
+def onnx_available():
+    return importlib.util.find_spec("onnxruntime") is not None
+
+
+def export_path(model_sr, kind, directory=sr_quant.DEFAULT_MODEL_DIR):
+    """Ruta del modelo exportado ``kind`` (BACKEND_TORCHSCRIPT u BACKEND_ONNX) de ``model_sr``."""
+    if kind == superres.BACKEND_ONNX:
+        variant = f"opset{ONNX_OPSET}"
+    else:
+        import torch
+        variant = f"torch{torch.__version__.split('+')[0]}" # TorchScript depende de la versión de torch
+    return os.path.join(directory, f"{superres.model_name(model_sr)}-fp32-v{EXPORT_VERSION}-{variant}-"
+                                   f"{sr_quant.weights_fingerprint(model_sr)}.{_EXTENSIONS[kind]}")
+
+
+def _write_torchscript(model_sr, path):
+    import torch
+    torch.jit.save(torch.jit.trace(model_sr, torch.zeros(1, 3, EXPORT_TILE, EXPORT_TILE)), path)
+
+
+def _write_onnx(model_sr, path):
+    import torch
+    axes = {0: "batch", 2: "height", 3: "width"}
+    torch.onnx.export(model_sr, (torch.zeros(1, 3, EXPORT_TILE, EXPORT_TILE),), path,
+                      input_names=["input"], output_names=["output"],
+                      dynamic_axes={"input": axes, "output": axes}, opset_version=ONNX_OPSET, dynamo=False)
+
+
+def onnx_session(path, threads=0):
+    import onnxruntime
+
+    options = onnxruntime.SessionOptions()
+    options.intra_op_num_threads = max(0, threads) # 0 = lo que decida ONNX Runtime (un hilo por núcleo)
+    options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+    return onnxruntime.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+
+
+def session_runner(session):
+    """Función lote_numpy -> lote_numpy sobre una sesión de ONNX Runtime (como superres.torch_runner)."""
+    input_name = session.get_inputs()[0].name
+
+    def run(batch):
+        return session.run(None, {input_name: np.ascontiguousarray(batch, dtype=np.float32)})[0]
+
+    run.accelerations = () # Las de torch no se aplican
+    return run
+
+
+def export(model_sr, kind, directory=sr_quant.DEFAULT_MODEL_DIR):
+    """Exporta ``model_sr`` (fp32) como ``kind``, comprueba la paridad y lo guarda. Devuelve (ruta, metadatos).
+
+    Lanza ValueError si la salida se aleja de PyTorch más de MAX_ABS_DIFF (y no guarda nada).
+    """
+    import copy
+    import tempfile
+    import torch
+
+    model_sr = copy.deepcopy(model_sr).cpu().eval() # El original puede estar en la GPU
+    cpu = torch.device("cpu")
+    write = _write_onnx if kind == superres.BACKEND_ONNX else _write_torchscript
+    tiles, _ = sr_quant.calibration_tiles(None, sr_quant.CHECK_PAGES, seed=1)
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp_path = os.path.join(tmp, f"modelo.{_EXTENSIONS[kind]}")
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            write(model_sr, tmp_path)
+            if kind == superres.BACKEND_ONNX:
+                candidate = session_runner(onnx_session(tmp_path))
+            else:
+                candidate = superres.torch_runner(torch.jit.load(tmp_path, map_location=cpu).eval(), cpu)
+        parity = sr_quant.compare_runs(superres.torch_runner(model_sr, cpu), candidate, tiles)
+        if parity["max_abs_diff"] > MAX_ABS_DIFF:
+            raise ValueError(f"La exportación a {kind} no coincide con PyTorch: diferencia máxima "
+                             f"{parity['max_abs_diff']:.2g} (máximo {MAX_ABS_DIFF:g})")
+
+        path = export_path(model_sr, kind, directory)
+        metadata = {"version": EXPORT_VERSION, "format": kind, "torch": torch.__version__,
+                    "opset": ONNX_OPSET if kind == superres.BACKEND_ONNX else None,
+                    "model": superres.model_name(model_sr), "scale": model_sr.config.scale,
+                    "weights": sr_quant.weights_fingerprint(model_sr), "parity_tiles": len(tiles),
+                    "psnr_db": parity["psnr_db"], "max_abs_diff": parity["max_abs_diff"],
+                    "torch_ms": parity["reference_ms"], "export_ms": parity["candidate_ms"]}
+        sr_quant.save_artifact(path, metadata, lambda target: shutil.copyfile(tmp_path, target))
+    return path, metadata
+
+
+def _load_or_export(model_sr, kind, directory, create):
+    path = export_path(model_sr, kind, directory)
+    if not os.path.exists(path):
+        if not create:
+            return None
+        print(f"Exportando {superres.model_name(model_sr)} a {kind} (solo la primera vez)...")
+        path, metadata = export(model_sr, kind, directory)
+        print(f"Modelo {kind} guardado en {path}: diferencia máxima {metadata['max_abs_diff']:.2g} frente a PyTorch, "
+              f"{metadata['torch_ms']:.0f} -> {metadata['export_ms']:.0f} ms por tesela")
+    return path
+
+
+def load_torchscript(model_sr, directory=sr_quant.DEFAULT_MODEL_DIR, device="cpu", create=True):
+    """Devuelve (modelo TorchScript en ``device``, metadatos), exportándolo si hace falta y ``create``.
+
+    Devuelve (None, None) si no existe y no se debe crear.
+    """
+    import torch
+
+    path = _load_or_export(model_sr, superres.BACKEND_TORCHSCRIPT, directory, create)
+    if path is None:
+        return None, None
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        return torch.jit.load(path, map_location=device).eval(), sr_quant.read_metadata(path)
+
+
+def onnx_runner(model_sr, directory=sr_quant.DEFAULT_MODEL_DIR, threads=0, create=True):
+    """Devuelve (función lote -> lote con ONNX Runtime, metadatos), exportando el modelo si hace falta.
+
+    ``threads`` son los hilos intra-op (0 = los que decida ONNX Runtime).
+    Lanza ImportError si onnxruntime no está instalado; devuelve (None, None)
+    si el modelo no existe y no se debe crear.
+    """
+    if not onnx_available():
+        raise ImportError("onnxruntime no está instalado (pip install onnxruntime)")
+    path = _load_or_export(model_sr, superres.BACKEND_ONNX, directory, create)
+    if path is None:
+        return None, None
+    return session_runner(onnx_session(path, threads)), sr_quant.read_metadata(path)
@@ -0,0 +1,168 @@
+"""Grupo de procesos de superresolución para CPU.
+
+En CPU, PyTorch reparte cada convolución de MSRN entre hilos, pero pasados
+unos pocos núcleos apenas escala: con un solo modelo una máquina de 32
+núcleos queda casi ociosa. ``SrPool`` arranca N procesos, cada uno con su
+propia copia del modelo, ``threads`` hilos de inferencia
+(torch.set_num_threads o los hilos intra-op de ONNX Runtime) y,
+opcionalmente, fijado a sus propios núcleos (solo Linux). El pipeline le
+envía lotes de páginas y recibe Futures; como el escritor los consume en
+orden, las páginas salen en el mismo orden que entraron.
+
+``plan`` elige cuántos procesos e hilos usar a partir de los núcleos
+disponibles y de la memoria libre: cada proceso necesita el runtime de
+torch más la memoria de las activaciones de un lote de teselas.
+"""
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import model_store
+import profiling
+import sr_export
+import sr_quant
+import superres
+
+DEFAULT_THREADS_PER_WORKER = 4 # MSRN deja de escalar más allá de unos pocos hilos
+# Estimación de memoria por proceso (medida con MSRN x2 fp32 y 4 hilos)
+WORKER_BASE_BYTES = 800 * 1024 * 1024 # torch, super_image y el modelo
+ACTIVATION_BYTES_PER_PIXEL = 8 * 1024 # Activaciones por píxel de entrada
+FULL_PAGE_PIXELS = 1200 * 1800 # Sin teselas, se supone una página de este tamaño
+MEMORY_FRACTION = 0.75 # Parte de la memoria libre que puede ocupar el grupo
+
+# Tipos de modelo que se envían a los procesos
+_SPEC_MODULE = "module" # El modelo eager: arquitectura, configuración y pesos (model_store.snapshot)
+
+_run = None # Función de inferencia de este proceso (la crea _init_worker)
+
+
+def worker_memory(tile_size, batch_size):
+    """Memoria estimada (bytes) de un proceso que amplía lotes de ``batch_size`` teselas de ``tile_size``."""
+    pixels = tile_size * tile_size if tile_size else FULL_PAGE_PIXELS
+    return WORKER_BASE_BYTES + max(1, batch_size) * pixels * ACTIVATION_BYTES_PER_PIXEL
+
+
+def plan(workers=0, threads=0, tile_size=superres.DEFAULT_TILE_SIZE, batch_size=superres.DEFAULT_BATCH_SIZE):
+    """Devuelve (procesos, hilos por proceso); 0 = automático.
+
+    Automático: DEFAULT_THREADS_PER_WORKER hilos por proceso, tantos
+    procesos como quepan en los núcleos disponibles y en MEMORY_FRACTION de
+    la memoria libre. Si se indican los procesos, los hilos salen de repartir
+    los núcleos entre ellos.
+    """
+    cores = profiling.available_cores()
+    if workers <= 0:
+        threads = threads if threads > 0 else min(DEFAULT_THREADS_PER_WORKER, cores)
+        workers = max(1, cores // threads)
+        memory = profiling.available_memory()
+        if memory:
+            workers = max(1, min(workers, int(memory * MEMORY_FRACTION // worker_memory(tile_size, batch_size))))
+    elif threads <= 0:
+        threads = max(1, cores // workers)
+    return workers, threads
+
+
+def model_spec(backend, model_sr, model_dir=sr_quant.DEFAULT_MODEL_DIR):
+    """Lo que cada proceso necesita para cargar el modelo del backend: (tipo, modelo o ruta).
+
+    Los modelos int8 y exportados ya deben existir en ``model_dir`` (el motor
+    los prepara antes con sr_quant.load o sr_export); del eager se envían la
+    arquitectura, la configuración y los pesos (model_store.snapshot), sin
+    mover el modelo compartido de su dispositivo.
+    """
+    if backend == superres.BACKEND_INT8:
+        return backend, sr_quant.model_path(model_sr, model_dir)
+    if backend in (superres.BACKEND_TORCHSCRIPT, superres.BACKEND_ONNX):
+        return backend, sr_export.export_path(model_sr, backend, model_dir)
+    return _SPEC_MODULE, model_store.snapshot(model_sr)
+
+
+def _cpu_sets(workers, threads):
+    """Núcleos de cada proceso: bloques consecutivos de ``threads`` (se repiten si no hay suficientes)."""
+    cores = sorted(os.sched_getaffinity(0))
+    return [[cores[(index * threads + offset) % len(cores)] for offset in range(threads)]
+            for index in range(workers)]
+
+
+def _init_worker(spec, threads, accelerations, cpu_sets):
+    """Inicializa un proceso del grupo: afinidad, hilos y modelo."""
+    global _run
+    if cpu_sets is not None:
+        os.sched_setaffinity(0, set(cpu_sets.get()))
+    kind, model = spec
+    if kind == superres.BACKEND_ONNX:
+        _run = sr_export.session_runner(sr_export.onnx_session(model, threads))
+        return
+    import warnings
+    import torch
+
+    torch.set_num_threads(threads)
+    if kind == superres.BACKEND_INT8:
+        torch.backends.quantized.engine = sr_quant.quant_engine()
+    if kind == _SPEC_MODULE:
+        model = model_store.rebuild(model)
+    else:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            model = torch.jit.load(model, map_location="cpu").eval()
+        accelerations = tuple(name for name in accelerations if name == superres.ACCEL_INFERENCE_MODE)
+    _run = superres.torch_runner(model, torch.device("cpu"), accelerations)
+
+
+def _worker_info():
+    return os.getpid(), tuple(sorted(os.sched_getaffinity(0))) if hasattr(os, "sched_getaffinity") else None
+
+
+def _upscale(arrays, tile_size, tile_overlap, batch_size, file_paths):
+    """Amplía un lote en este proceso. Devuelve (resultados, errores por página, tiempos)."""
+    import pipeline
+
+    page_errors = {}
+    timer = profiling.StageTimer()
+    results = pipeline.upscale_batch(_run, arrays, tile_size, tile_overlap, batch_size, file_paths,
+                                     page_errors, timer)
+    return results, page_errors, timer.as_dict()
+
+
+class SrPool:
+    """Procesos de superresolución en CPU, cada uno con su modelo (ver ``model_spec``).
+
+    ``affinity`` fija cada proceso a ``threads`` núcleos propios (solo donde
+    existe os.sched_setaffinity). Usar con ``with`` o llamar a ``close``.
+    Quien lo use desde un script debe protegerlo con ``if __name__ == "__main__":``.
+    """
+
+    def __init__(self, spec, workers, threads, accelerations=superres.DEFAULT_ACCELERATIONS, affinity=False):
+        self.workers = workers
+        self.threads = threads
+        self.affinity = affinity and hasattr(os, "sched_setaffinity")
+        # spawn en todas las plataformas: hacer fork de un proceso con hilos de torch puede bloquearse
+        context = multiprocessing.get_context("spawn")
+        cpu_sets = None
+        if self.affinity:
+            cpu_sets = context.Queue()
+            for cores in _cpu_sets(workers, threads):
+                cpu_sets.put(cores)
+        self._executor = ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_worker,
+                                             initargs=(spec, threads, tuple(accelerations), cpu_sets))
+
+    def start(self):
+        """Arranca los procesos y espera a que carguen el modelo (los errores de carga salen aquí).
+
+        Devuelve [(pid, núcleos)] de los procesos que respondieron.
+        """
+        futures = [self._executor.submit(_worker_info) for _ in range(self.workers)]
+        return sorted(set(future.result() for future in futures))
+
+    def upscale(self, arrays, tile_size, tile_overlap, batch_size, file_paths):
+        """Envía un lote a un proceso libre. Devuelve un Future con (resultados, errores, tiempos)."""
+        return self._executor.submit(_upscale, arrays, tile_size, tile_overlap, batch_size, file_paths)
+
+    def close(self):
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
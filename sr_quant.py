@@ -0,0 +1,274 @@
+"""MSRN cuantizado a int8 para CPU, generado una vez y guardado en disco.
+
+MSRN son casi solo convoluciones, así que la cuantización dinámica (que solo
+toca capas lineales) no sirve: se usa cuantización estática (FX) con una
+calibración sobre páginas de manga. Las teselas de calibración salen de una
+biblioteca (``calibration_paths``) o, si no se da ninguna, de páginas
+sintéticas (ver synthetic.py).
+
+El modelo resultante se guarda como TorchScript en ``DEFAULT_MODEL_DIR`` con
+un .json al lado: motor de cuantización, versión de torch, huella de los
+pesos fp32 de los que sale, páginas de calibración y la comprobación de
+calidad (PSNR frente a fp32 en teselas que no se usaron para calibrar). Si
+cambia cualquiera de ellos se genera otro archivo. Si la calidad no llega a
+``MIN_PSNR_DB`` se guarda en su lugar un ``.rejected`` con el resultado, para
+que ``--backend int8`` vuelva a fp32 al momento en vez de repetir la
+calibración en cada trabajo; ``cli.py quantize`` lo vuelve a intentar.
+
+Solo se ejecuta en CPU; los pesos ocupan una cuarta parte y la inferencia
+es varias veces más rápida, a cambio de una pequeña pérdida de calidad.
+"""
+import hashlib
+import json
+import os
+import platform
+import random
+import tempfile
+import time
+import warnings
+import numpy as np
+from PIL import Image
+
+import superres
+import synthetic
+
+QUANT_VERSION = 1 # Subir si cambia la forma de cuantizar
+DEFAULT_MODEL_DIR = os.environ.get("MANGA_MODEL_DIR") or os.path.join(
+    os.path.expanduser("~"), ".cache", "manga_utilities", "models")
+DEFAULT_CALIBRATION_PAGES = 16
+CALIBRATION_TILE = 128
+CHECK_PAGES = 4
+# Por debajo de este PSNR frente a fp32 el modelo int8 se descarta
+MIN_PSNR_DB = 35.0
+REJECTED_SUFFIX = ".rejected"
+
+_IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp")
+
+
+def quant_engine():
+    """Motor de cuantización de PyTorch para esta CPU."""
+    return "x86" if platform.machine().lower() in ("x86_64", "amd64", "i386", "i686") else "qnnpack"
+
+
+def weights_fingerprint(model_sr):
+    """Huella corta de los pesos fp32 (el int8 de un modelo no sirve para otro)."""
+    digest = hashlib.sha256()
+    for name, tensor in sorted(model_sr.state_dict().items()):
+        digest.update(name.encode())
+        digest.update(tensor.detach().cpu().contiguous().numpy().tobytes())
+    return digest.hexdigest()[:12]
+
+
+def model_path(model_sr, directory=DEFAULT_MODEL_DIR):
+    """Ruta del modelo int8 correspondiente a ``model_sr`` en esta CPU y versión de torch."""
+    import torch
+    version = torch.__version__.split("+")[0]
+    return os.path.join(directory, f"{superres.model_name(model_sr)}-int8-v{QUANT_VERSION}-{quant_engine()}-"
+                                   f"torch{version}-{weights_fingerprint(model_sr)}.pt")
+
+
+# --- Calibración ---
+def library_pages(folder, limit=None):
+    """Imágenes de las subcarpetas de ``folder`` (una biblioteca), ordenadas."""
+    pages = []
+    for root, dirs, files in os.walk(folder):
+        dirs.sort()
+        depth = 0 if root == folder else os.path.relpath(root, folder).count(os.sep) + 1
+        if depth >= 1:
+            dirs[:] = [] # Solo biblioteca/capítulo/página
+        if depth != 1:
+            continue
+        pages.extend(os.path.join(root, f) for f in sorted(files) if f.lower().endswith(_IMAGE_EXTENSIONS))
+        if limit and len(pages) >= limit:
+            break
+    return pages
+
+
+def _crop(array, tile, rng):
+    """Tesela aleatoria de ``tile`` px (o la página entera si es más pequeña)."""
+    _, height, width = array.shape
+    y = rng.randrange(0, max(1, height - tile + 1))
+    x = rng.randrange(0, max(1, width - tile + 1))
+    return np.ascontiguousarray(array[:, y:y + tile, x:x + tile])
+
+
+def calibration_tiles(paths=None, count=DEFAULT_CALIBRATION_PAGES, tile=CALIBRATION_TILE, seed=0):
+    """Teselas (3, tile, tile) para calibrar, de ``paths`` o, sin ellas, de páginas sintéticas.
+
+    Devuelve (teselas, origen). La elección es determinista para una misma lista y semilla.
+    """
+    rng = random.Random(seed)
+    tiles = []
+    if paths:
+        for path in rng.sample(list(paths), min(count, len(paths))):
+            try:
+                with Image.open(path) as image:
+                    tiles.append(_crop(superres.imagen_a_array(image), tile, rng))
+            except Exception as e:
+                print(f"Advertencia: no se pudo usar {path} para calibrar: {e}")
+        source = "biblioteca"
+    if not tiles:
+        for index in range(count):
+            page = synthetic.synthetic_page(tile * 3, tile * 4, color=index % 4 == 3, seed=(seed, index))
+            tiles.append(_crop(superres.imagen_a_array(page), tile, rng))
+        source = "sintética"
+    return tiles, source
+
+
+# --- Cuantización ---
+def quantize(model_sr, tiles):
+    """Cuantiza ``model_sr`` (fp32, CPU) a int8 calibrando con ``tiles``. Devuelve el modelo int8."""
+    import copy
+    import torch
+    from torch.ao.quantization import get_default_qconfig_mapping
+    from torch.ao.quantization.quantize_fx import convert_fx, prepare_fx
+
+    engine = quant_engine()
+    torch.backends.quantized.engine = engine
+    model = copy.deepcopy(model_sr).cpu().eval()
+    example = torch.from_numpy(tiles[0][None])
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore") # Avisos de API en desuso de torch.ao
+        prepared = prepare_fx(model, get_default_qconfig_mapping(engine), (example,))
+        with torch.inference_mode():
+            for tile in tiles:
+                prepared(torch.from_numpy(tile[None]))
+        return convert_fx(prepared)
+
+
+def compare_runs(reference, candidate, tiles):
+    """Compara dos funciones lote -> lote (ver superres.torch_runner) tesela a tesela.
+
+    Devuelve {"psnr_db", "max_abs_diff", "reference_ms", "candidate_ms"}: PSNR
+    medio de las imágenes uint8 (None = idénticas), la mayor diferencia de la
+    salida en [0, 1] y el tiempo medio por tesela de cada una.
+    """
+    outputs = []
+    timings = []
+    for run in (reference, candidate):
+        start = time.perf_counter()
+        outputs.append([run(tile[None])[0] for tile in tiles])
+        timings.append((time.perf_counter() - start) * 1000 / len(tiles))
+    values = [superres.psnr(superres._a_uint8(ref), superres._a_uint8(out)) for ref, out in zip(*outputs)]
+    finite = [value for value in values if value is not None]
+    return {"psnr_db": round(float(np.mean(finite)), 2) if finite else None,
+            "max_abs_diff": float(max(np.abs(ref - out).max() for ref, out in zip(*outputs))),
+            "reference_ms": round(timings[0], 1), "candidate_ms": round(timings[1], 1)}
+
+
+def check_quality(model_sr, quantized, tiles):
+    """Compara int8 con fp32 en ``tiles``. Devuelve {"psnr_db", "fp32_ms", "int8_ms"} (por tesela)."""
+    import copy
+    import torch
+
+    cpu = torch.device("cpu")
+    # Una copia: el modelo del llamador puede estar en la GPU y compartido con otros trabajos
+    result = compare_runs(superres.torch_runner(copy.deepcopy(model_sr).cpu().eval(), cpu),
+                          superres.torch_runner(quantized, cpu), tiles)
+    return {"psnr_db": result["psnr_db"], "fp32_ms": result["reference_ms"], "int8_ms": result["candidate_ms"]}
+
+
+def save_artifact(path, metadata, write):
+    """Guarda un modelo exportado y su .json de forma atómica; ``write(ruta)`` escribe el modelo."""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".part")
+    os.close(fd)
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore") # torch.jit y torch.onnx avisan de APIs en desuso
+            write(tmp_path)
+        with open(tmp_path + ".json", "w", encoding="utf-8") as f:
+            json.dump(metadata, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path + ".json", path + ".json")
+        os.replace(tmp_path, path)
+    finally:
+        for leftover in (tmp_path, tmp_path + ".json"):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+    return path
+
+
+def read_metadata(path):
+    """Metadatos del .json de un modelo guardado ({} si no hay o no se puede leer)."""
+    try:
+        with open(path + ".json", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def build(model_sr, calibration_paths=None, directory=DEFAULT_MODEL_DIR, pages=DEFAULT_CALIBRATION_PAGES,
+          seed=0):
+    """Genera, comprueba y guarda el modelo int8 de ``model_sr``. Devuelve (ruta, metadatos).
+
+    Lanza ValueError si la calidad queda por debajo de MIN_PSNR_DB: no guarda el
+    modelo, sino el rechazo (ver rejection).
+    """
+    import torch
+
+    path = model_path(model_sr, directory)
+    tiles, source = calibration_tiles(calibration_paths, pages, seed=seed)
+    check_tiles, _ = calibration_tiles(calibration_paths, CHECK_PAGES, seed=seed + 1)
+    start = time.perf_counter()
+    quantized = quantize(model_sr, tiles)
+    quality = check_quality(model_sr, quantized, check_tiles)
+    if quality["psnr_db"] is not None and quality["psnr_db"] < MIN_PSNR_DB:
+        _save_rejection(path, {"psnr_db": quality["psnr_db"], "min_psnr_db": MIN_PSNR_DB, "calibration": source,
+                               "calibration_pages": len(tiles)})
+        raise ValueError(f"El modelo int8 pierde demasiada calidad: PSNR {quality['psnr_db']} dB "
+                         f"(mínimo {MIN_PSNR_DB} dB)")
+
+    metadata = {"version": QUANT_VERSION, "engine": quant_engine(), "torch": torch.__version__,
+                "model": superres.model_name(model_sr), "scale": model_sr.config.scale,
+                "weights": weights_fingerprint(model_sr), "calibration": source, "calibration_pages": len(tiles),
+                "seconds": round(time.perf_counter() - start, 1), **quality}
+    example = torch.from_numpy(tiles[0][None])
+    save_artifact(path, metadata, lambda tmp_path: torch.jit.save(torch.jit.trace(quantized, example), tmp_path))
+    if os.path.exists(path + REJECTED_SUFFIX):
+        os.remove(path + REJECTED_SUFFIX)
+    return path, metadata
+
+
+def _save_rejection(path, result):
+    """Anota que el modelo int8 de ``path`` se descartó (no es grave si no se puede)."""
+    try:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path + REJECTED_SUFFIX, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False)
+    except OSError as e:
+        print(f"Advertencia: no se pudo guardar el rechazo del modelo int8: {e}")
+
+
+def rejection(model_sr, directory=DEFAULT_MODEL_DIR):
+    """Resultado guardado si el modelo int8 de ``model_sr`` se descartó por calidad, o None."""
+    try:
+        with open(model_path(model_sr, directory) + REJECTED_SUFFIX, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def load(model_sr, directory=DEFAULT_MODEL_DIR, create=True, calibration_paths=None):
+    """Devuelve (modelo int8, metadatos) para ``model_sr``, generándolo si no está en disco y ``create``.
+
+    Devuelve (None, None) si no existe y no se puede o no se debe crear.
+    """
+    import torch
+
+    torch.backends.quantized.engine = quant_engine()
+    path = model_path(model_sr, directory)
+    if not os.path.exists(path):
+        if not create:
+            return None, None
+        rejected = rejection(model_sr, directory)
+        if rejected is not None:
+            raise ValueError(f"el modelo int8 se descartó por calidad (PSNR {rejected.get('psnr_db')} dB, "
+                             f"mínimo {MIN_PSNR_DB} dB); 'cli.py quantize --calibrate' lo vuelve a intentar")
+        print("Generando el modelo int8 (solo la primera vez)...")
+        path, metadata = build(model_sr, calibration_paths, directory)
+        print(f"Modelo int8 guardado en {path}: PSNR {metadata['psnr_db']} dB frente a fp32, "
+              f"{metadata['fp32_ms']:.0f} -> {metadata['int8_ms']:.0f} ms por tesela")
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        return torch.jit.load(path, map_location="cpu").eval(), read_metadata(path)
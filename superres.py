@@ -0,0 +1,594 @@
+"""Superresolución con MSRN para CompressIt (sin dependencias de la GUI).
+
+torch y super_image son importaciones pesadas (varios segundos en frío), por
+eso se importan dentro de las funciones: importar este módulo no las carga, y
+el modelo solo se carga con get_model() (al empezar un trabajo con
+superresolución o desde warm_up_async()), siempre desde el almacén local
+de model_store.py, sin red.
+
+Cada trabajo elige su ampliador ("arquitectura-xEscala", ver
+parse_upscaler): cualquier modelo de super_image del almacén o "lanczos",
+que amplía con Pillow sin modelo. Los modelos cargados se conservan en
+memoria, como mucho MAX_LOADED_MODELS a la vez; al pasar del límite se
+descarta el que lleva más tiempo sin usarse.
+"""
+import collections
+import io
+import os
+import threading
+import numpy as np
+from PIL import Image
+
+import model_store
+import profiling
+import sr_cache
+
+# --- Configuración del Modelo ---
+MODEL_ID = "eugenesiow/msrn"
+MODEL_ARCHITECTURE = "msrn" # Clave en el almacén de modelos
+MODEL_SCALE = 2
+
+# Ampliadores: "arquitectura-xEscala" (ver parse_upscaler)
+UPSCALER_LANCZOS = "lanczos" # Pillow, sin modelo: el más rápido y el de menos calidad
+SCALES = (2, 3, 4)
+DEFAULT_UPSCALER = f"{MODEL_ARCHITECTURE}-x{MODEL_SCALE}"
+# Modelos que se conservan cargados a la vez (los menos usados recientemente se descargan)
+MAX_LOADED_MODELS = int(os.environ.get("MANGA_SR_MAX_MODELS") or 2)
+
+# Teselas por defecto: 512 px con 32 px de solapamiento acotan la memoria de MSRN x2 en CPU
+DEFAULT_TILE_SIZE = 512
+DEFAULT_TILE_OVERLAP = 32
+# Páginas (o teselas) del mismo tamaño que se pasan juntas al modelo
+DEFAULT_BATCH_SIZE = 2
+
+# Aceleraciones de la inferencia (ver torch_runner)
+ACCEL_INFERENCE_MODE = "inference_mode" # torch.inference_mode en lugar de no_grad
+ACCEL_CHANNELS_LAST = "channels_last" # Modelo y entradas en formato NHWC
+ACCEL_BF16 = "bf16" # autocast a bfloat16 (cambia ligeramente el resultado)
+ACCEL_COMPILE = "compile" # torch.compile, con una pasada de calentamiento
+ACCELERATIONS = (ACCEL_INFERENCE_MODE, ACCEL_CHANNELS_LAST, ACCEL_BF16, ACCEL_COMPILE)
+# Las que no cambian el resultado van por defecto
+DEFAULT_ACCELERATIONS = (ACCEL_INFERENCE_MODE,)
+
+# Backends de la inferencia: modelo eager de super_image o exportado (ver sr_quant.py y sr_export.py)
+BACKEND_FP32 = "fp32"
+BACKEND_INT8 = "int8" # Cuantizado, solo CPU
+BACKEND_TORCHSCRIPT = "torchscript"
+BACKEND_ONNX = "onnx" # ONNX Runtime, solo CPU
+BACKENDS = (BACKEND_FP32, BACKEND_INT8, BACKEND_TORCHSCRIPT, BACKEND_ONNX)
+CPU_BACKENDS = (BACKEND_INT8, BACKEND_ONNX)
+DEFAULT_BACKEND = BACKEND_FP32
+
+_models = collections.OrderedDict() # (arquitectura, escala) -> modelo, del menos al más usado recientemente
+_model_errors = {} # (arquitectura, escala) -> (error, registro del almacén al fallar; si cambia, se reintenta)
+_model_lock = threading.Lock()
+_prepared = {} # (id(modelo), dispositivo, aceleraciones) -> modelo preparado (copia)
+
+
+# --- Función para verificar correctamente la disponibilidad de CUDA ---
+def check_cuda_availability():
+    """Verifica si CUDA está disponible y devuelve información de diagnóstico."""
+    import torch
+    cuda_available = torch.cuda.is_available()
+    cuda_info = ""
+    if cuda_available:
+        try:
+            cuda_info = f"CUDA disponible - Dispositivo: {torch.cuda.get_device_name(0)}"
+        except Exception as e:
+            cuda_info = f"CUDA disponible pero error al obtener información: {e}"
+    else:
+        cuda_info = "CUDA no disponible - Usando CPU"
+
+    print(cuda_info)
+    return cuda_available, cuda_info
+
+
+def parse_upscaler(text):
+    """"msrn-x4" -> ("msrn", 4). Lanza ValueError si la arquitectura o la escala no existen."""
+    architecture, _, scale = (text or "").strip().lower().rpartition("-x")
+    if architecture != UPSCALER_LANCZOS and architecture not in model_store.ARCHITECTURES:
+        options = ", ".join((UPSCALER_LANCZOS,) + tuple(model_store.ARCHITECTURES))
+        raise ValueError(f"Ampliador desconocido: {text} (arquitecturas: {options}; p. ej. {DEFAULT_UPSCALER})")
+    if not scale.isdigit() or int(scale) not in SCALES:
+        raise ValueError(f"Escala no válida en {text} (opciones: {', '.join(f'x{s}' for s in SCALES)})")
+    return architecture, int(scale)
+
+
+def upscalers():
+    """Ampliadores disponibles sin red: los modelos del almacén y Lanczos en todas las escalas."""
+    stored = [entry["key"] for entry in model_store.available() if entry["scale"] in SCALES]
+    return stored + [f"{UPSCALER_LANCZOS}-x{scale}" for scale in SCALES]
+
+
+def _load_from_store(architecture, scale):
+    """Carga el modelo del almacén; si aún no está, lo importa antes de la caché de Hugging Face (sin red)."""
+    if model_store.find(architecture, scale) is None:
+        folder = model_store.hub_cache_folder(architecture, scale)
+        if folder is not None:
+            print(f"Importando al almacén de modelos los pesos ya descargados en {folder}...")
+            model_store.import_weights(folder, architecture, scale, source=model_store.HUB_REPOS[architecture])
+    model, _ = model_store.load(architecture, scale)
+    return model
+
+
+def _remember(key, model):
+    """Guarda ``model`` como el más reciente y descarta los que pasan de MAX_LOADED_MODELS."""
+    _models[key] = model
+    _models.move_to_end(key)
+    while len(_models) > max(1, MAX_LOADED_MODELS):
+        old_key, old_model = _models.popitem(last=False)
+        for prepared_key in [k for k in _prepared if k[0] == id(old_model)]:
+            del _prepared[prepared_key]
+        print(f"Modelo {old_key[0]}-x{old_key[1]} descargado de memoria (máximo {MAX_LOADED_MODELS} cargados)")
+
+
+def get_model(architecture=MODEL_ARCHITECTURE, scale=MODEL_SCALE):
+    """Devuelve (modelo, error). El modelo se carga la primera vez que se pide y se reutiliza.
+
+    Tras un error se vuelve a intentar solo si el almacén de modelos ha
+    cambiado (p. ej. después de 'python cli.py models import').
+    """
+    key = (architecture, scale)
+    with _model_lock:
+        failed = _model_errors.get(key)
+        if failed is not None and model_store.registry_stamp() != failed[1]:
+            del _model_errors[key]
+            failed = None
+        if failed is not None:
+            return None, failed[0]
+        model = _models.get(key)
+        if model is None:
+            try:
+                model = _load_from_store(architecture, scale)
+            except Exception as e:
+                print(f"Error al cargar el modelo de superresolución {architecture}-x{scale}: {e}")
+                _model_errors[key] = (e, model_store.registry_stamp())
+                return None, e
+        _remember(key, model)
+        return model, None
+
+
+def set_model(model, architecture=MODEL_ARCHITECTURE, scale=MODEL_SCALE):
+    """Usa ``model`` en lugar del preentrenado (p. ej. el MSRN aleatorio de benchmark.py).
+
+    Las páginas ampliadas con él no deben ir a la caché compartida: su clave
+    usa MODEL_ID como si fueran del modelo preentrenado.
+    """
+    with _model_lock:
+        _model_errors.pop((architecture, scale), None)
+        _remember((architecture, scale), model)
+
+
+def is_model_loaded(architecture=MODEL_ARCHITECTURE, scale=MODEL_SCALE):
+    """Indica si el modelo ya está en memoria (sin provocar su carga)."""
+    return (architecture, scale) in _models
+
+
+def loaded_models():
+    """Ampliadores cargados, del menos al más usado recientemente."""
+    with _model_lock:
+        return [f"{architecture}-x{scale}" for architecture, scale in _models]
+
+
+def warm_up_async(callback=None):
+    """Carga torch, super_image y el modelo en un hilo en segundo plano.
+
+    ``callback(modelo, error)`` se llama desde ese hilo al terminar. Si un
+    trabajo pide el modelo mientras tanto, get_model() espera a esta carga.
+    """
+    def _run():
+        model, error = get_model()
+        if callback is not None:
+            callback(model, error)
+
+    thread = threading.Thread(target=_run, daemon=True)
+    thread.start()
+    return thread
+
+
+def select_device(usar_gpu):
+    """Elige el dispositivo de inferencia. Devuelve (device, descripción)."""
+    import torch
+    cuda_available, cuda_info = check_cuda_availability()
+    if usar_gpu and cuda_available:
+        return torch.device('cuda'), f"GPU: {cuda_info}"
+    return torch.device('cpu'), f"CPU: {cuda_info}"
+
+
+def release_device(device):
+    """Libera la caché de memoria de la GPU si el dispositivo es CUDA."""
+    if device and 'cuda' in str(device):
+        import torch
+        torch.cuda.empty_cache()
+
+
+# --- Inferencia (por teselas) ---
+# Las imágenes viajan como arrays de numpy (C, H, W) float32 en [0, 1]; el
+# modelo se envuelve en un "runner" que recibe y devuelve lotes (N, C, H, W).
+# Así el troceado y la mezcla no dependen de torch.
+
+def imagen_a_array(image):
+    """Convierte una imagen PIL a un array (3, H, W) float32 en [0, 1]."""
+    array = np.asarray(image.convert('RGB'), dtype=np.float32)
+    return np.ascontiguousarray(array.transpose(2, 0, 1)) / 255.0
+
+
+def _a_uint8(array):
+    """Convierte (3, H, W) float en [0, 1] a (H, W, 3) uint8."""
+    return np.rint(np.clip(array, 0.0, 1.0) * 255.0).astype(np.uint8).transpose(1, 2, 0)
+
+
+def array_a_imagen(array):
+    """Convierte un array (3, H, W) float en [0, 1] a una imagen PIL RGB."""
+    return Image.fromarray(np.ascontiguousarray(_a_uint8(array)), 'RGB')
+
+
+def psnr(reference, result):
+    """PSNR (dB) entre dos imágenes uint8; None si son idénticas."""
+    mse = np.mean((reference.astype(np.float64) - result.astype(np.float64)) ** 2)
+    return None if mse == 0 else round(10 * np.log10(255.0 ** 2 / mse), 2)
+
+
+def parse_accelerations(text):
+    """"inference_mode,bf16" -> tupla de aceleraciones; "" o "none" -> (). Lanza ValueError si alguna no existe."""
+    names = tuple(name.strip() for name in (text or "").split(",") if name.strip() and name.strip() != "none")
+    unknown = [name for name in names if name not in ACCELERATIONS]
+    if unknown:
+        raise ValueError(f"Aceleración desconocida: {', '.join(unknown)} (opciones: {', '.join(ACCELERATIONS)})")
+    return names
+
+
+def bf16_supported(device):
+    """Indica si ``device`` ejecuta bfloat16 de forma nativa (en CPU, AVX512-BF16 o AMX)."""
+    import torch
+    if 'cuda' in str(device):
+        return torch.cuda.is_bf16_supported()
+    checker = getattr(torch.ops.mkldnn, "_is_mkldnn_bf16_supported", None)
+    return bool(checker is not None and checker())
+
+
+def model_id(accelerations=DEFAULT_ACCELERATIONS, backend=BACKEND_FP32, architecture=MODEL_ARCHITECTURE):
+    """Identificador del modelo para la caché y el manifiesto: bf16, int8 y ONNX Runtime dan otro
+    resultado, así que cuentan como otro modelo (TorchScript usa los mismos kernels que fp32).
+
+    La escala no forma parte del identificador: la caché y el manifiesto la guardan aparte.
+    """
+    base = MODEL_ID if architecture == MODEL_ARCHITECTURE else model_store.HUB_REPOS.get(architecture, architecture)
+    if backend in (BACKEND_INT8, BACKEND_ONNX):
+        return f"{base}+{backend}"
+    return f"{base}+bf16" if ACCEL_BF16 in accelerations else base
+
+
+def model_name(model_sr):
+    """"msrn-x2": arquitectura y escala de un modelo de super_image (para nombrar sus archivos exportados)."""
+    config = model_sr.config
+    return f"{(config.model_type or MODEL_ARCHITECTURE).lower()}-x{config.scale or MODEL_SCALE}"
+
+
+def _prepare_model(model_sr, device, accelerations, warmup_shape):
+    """Copia del modelo con el formato de memoria y la compilación pedidos (se reutiliza entre trabajos)."""
+    import copy
+    import torch
+
+    key = (id(model_sr), str(device), tuple(sorted(accelerations)))
+    prepared = _prepared.get(key)
+    if prepared is not None:
+        return prepared
+    if ACCEL_CHANNELS_LAST not in accelerations and ACCEL_COMPILE not in accelerations:
+        return model_sr
+    prepared = copy.deepcopy(model_sr).to(device).eval()
+    if ACCEL_CHANNELS_LAST in accelerations:
+        prepared = prepared.to(memory_format=torch.channels_last)
+    if ACCEL_COMPILE in accelerations:
+        try:
+            prepared = torch.compile(prepared, dynamic=True)
+            _warm_up(prepared, device, accelerations, warmup_shape)
+        except Exception as e:
+            # Sin compilador de C o versión de torch sin soporte: se sigue sin compilar
+            print(f"Advertencia: torch.compile no está disponible, se usa el modelo sin compilar: {e}")
+            prepared = copy.deepcopy(model_sr).to(device).eval()
+            if ACCEL_CHANNELS_LAST in accelerations:
+                prepared = prepared.to(memory_format=torch.channels_last)
+    _prepared[key] = prepared
+    return prepared
+
+
+def _inference_context(device, accelerations):
+    """Contexto de inferencia: inference_mode o no_grad, con autocast a bfloat16 si se pidió."""
+    import contextlib
+    import torch
+
+    stack = contextlib.ExitStack()
+    stack.enter_context(torch.inference_mode() if ACCEL_INFERENCE_MODE in accelerations else torch.no_grad())
+    if ACCEL_BF16 in accelerations:
+        stack.enter_context(torch.autocast(device_type='cuda' if 'cuda' in str(device) else 'cpu',
+                                           dtype=torch.bfloat16))
+    return stack
+
+
+def _warm_up(model_sr, device, accelerations, shape):
+    """Pasada de calentamiento (la primera llamada a un modelo compilado lo compila)."""
+    import torch
+
+    with _inference_context(device, accelerations):
+        inputs = torch.zeros(shape, device=device)
+        if ACCEL_CHANNELS_LAST in accelerations:
+            inputs = inputs.contiguous(memory_format=torch.channels_last)
+        model_sr(inputs)
+
+
+def torch_runner(model_sr, device, accelerations=DEFAULT_ACCELERATIONS, warmup_shape=(1, 3, 64, 64)):
+    """Devuelve una función lote_numpy -> lote_numpy que ejecuta el modelo en ``device``.
+
+    ``accelerations`` (ver ACCELERATIONS) elige cómo se ejecuta: sin ninguna
+    es fp32 NCHW con no_grad. ACCEL_BF16 se ignora (con aviso) si el
+    dispositivo no tiene bfloat16 nativo, porque emulado es más lento.
+    ``warmup_shape`` es la forma del lote de calentamiento al compilar.
+    """
+    import torch
+
+    accelerations = tuple(accelerations)
+    if ACCEL_BF16 in accelerations and not bf16_supported(device):
+        print(f"Advertencia: {device} no tiene bfloat16 nativo; se usa fp32.")
+        accelerations = tuple(name for name in accelerations if name != ACCEL_BF16)
+    model_sr = _prepare_model(model_sr, device, accelerations, warmup_shape)
+    channels_last = ACCEL_CHANNELS_LAST in accelerations
+
+    def run(batch):
+        with _inference_context(device, accelerations): # Sin cálculo de gradientes
+            inputs = torch.from_numpy(batch).to(device) # Mueve los datos de entrada al dispositivo correcto
+            if channels_last:
+                inputs = inputs.contiguous(memory_format=torch.channels_last)
+            return model_sr(inputs).float().cpu().numpy()
+
+    run.accelerations = accelerations # Las que se aplican de verdad (bf16 puede haberse descartado)
+    return run
+
+
+def lanczos_runner(scale):
+    """Función lote_numpy -> lote_numpy que amplía ``scale`` veces con el filtro Lanczos de Pillow.
+
+    No usa modelo ni torch: cada canal se amplía en coma flotante (modo "F"),
+    así que no se redondea hasta la conversión final a uint8.
+    """
+    def run(batch):
+        count, channels, height, width = batch.shape
+        output = np.empty((count, channels, height * scale, width * scale), dtype=np.float32)
+        for index in range(count):
+            for channel in range(channels):
+                plane = Image.fromarray(np.ascontiguousarray(batch[index, channel], dtype=np.float32), 'F')
+                output[index, channel] = np.asarray(plane.resize((width * scale, height * scale), Image.LANCZOS))
+        return output
+
+    run.accelerations = ()
+    return run
+
+
+def _axis_tiles(length, tile, overlap):
+    """Inicios de teselas de tamaño fijo ``tile`` que cubren ``length`` con al menos ``overlap`` de solapamiento."""
+    if length <= tile:
+        return [0]
+    step = max(1, tile - overlap)
+    starts = list(range(0, length - tile, step))
+    starts.append(length - tile) # Todas las teselas miden lo mismo: la última se desplaza hacia dentro
+    return starts
+
+
+def _blend_ramp(size, ramp, head, tail):
+    """Pesos de un eje de la tesela: rampa lineal en los lados que solapan con otra tesela."""
+    weights = np.ones(size, dtype=np.float32)
+    ramp = min(ramp, size // 2)
+    if ramp > 0:
+        values = (np.arange(ramp, dtype=np.float32) + 0.5) / ramp
+        if head:
+            weights[:ramp] = np.minimum(weights[:ramp], values)
+        if tail:
+            weights[-ramp:] = np.minimum(weights[-ramp:], values[::-1])
+    return weights
+
+
+def upscale_array(run, array, tile_size=None, tile_overlap=DEFAULT_TILE_OVERLAP, batch_size=1):
+    """Aplica el modelo a un array (3, H, W) y devuelve la imagen ampliada como (H*s, W*s, 3) uint8.
+
+    Con ``tile_size`` la imagen se procesa en teselas de ``tile_size`` px que
+    solapan ``tile_overlap`` px; en las zonas de solapamiento se mezclan con
+    pesos lineales para que no se vean costuras. Las filas de teselas se
+    acumulan por bandas y se pasan a uint8 en cuanto están completas, así que
+    la memoria de trabajo depende del tamaño de tesela y no de la página.
+    Todas las teselas miden lo mismo, y se pasan al modelo de ``batch_size`` en ``batch_size``.
+    """
+    _, height, width = array.shape
+    if not tile_size or (height <= tile_size and width <= tile_size):
+        return _a_uint8(run(array[None])[0])
+
+    tile_h, tile_w = min(tile_size, height), min(tile_size, width)
+    overlap = max(0, min(tile_overlap, tile_size // 2))
+    ys = _axis_tiles(height, tile_h, overlap)
+    xs = _axis_tiles(width, tile_w, overlap)
+    tiles = [(row, y0, x0) for row, y0 in enumerate(ys) for x0 in xs]
+    batch_size = max(1, batch_size)
+
+    output = None
+    acc = weight = None
+    acc_top = 0 # Fila (en la salida) donde empieza el acumulador de la banda actual
+    for start in range(0, len(tiles), batch_size):
+        chunk = tiles[start:start + batch_size]
+        preds = run(np.stack([array[:, y0:y0 + tile_h, x0:x0 + tile_w] for _, y0, x0 in chunk]))
+        for (row, y0, x0), pred in zip(chunk, preds):
+            if output is None:
+                scale = pred.shape[1] // tile_h
+                output = np.empty((height * scale, width * scale, 3), dtype=np.uint8)
+                ramp = overlap * scale
+            if acc is None or acc.shape[1] < (y0 + tile_h) * scale - acc_top:
+                # Amplía el acumulador hasta el borde inferior de esta fila de teselas
+                rows = (y0 + tile_h) * scale - acc_top
+                new_acc = np.zeros((3, rows, width * scale), dtype=np.float32)
+                new_weight = np.zeros((rows, width * scale), dtype=np.float32)
+                if acc is not None:
+                    new_acc[:, :acc.shape[1]] = acc
+                    new_weight[:weight.shape[0]] = weight
+                acc, weight = new_acc, new_weight
+
+            wy = _blend_ramp(tile_h * scale, ramp, y0 > 0, y0 + tile_h < height)
+            wx = _blend_ramp(tile_w * scale, ramp, x0 > 0, x0 + tile_w < width)
+            tile_weight = wy[:, None] * wx[None, :]
+            top = y0 * scale - acc_top
+            left = x0 * scale
+            acc[:, top:top + tile_h * scale, left:left + tile_w * scale] += pred * tile_weight
+            weight[top:top + tile_h * scale, left:left + tile_w * scale] += tile_weight
+
+            if x0 != xs[-1]:
+                continue
+            # Fila de teselas completa: las filas por encima de la siguiente ya no recibirán más aportes
+            done = ys[row + 1] * scale if row + 1 < len(ys) else height * scale
+            finished = done - acc_top
+            output[acc_top:done] = _a_uint8(acc[:, :finished] / weight[:finished])
+            acc, weight = acc[:, finished:].copy(), weight[finished:].copy()
+            acc_top = done
+
+    return output
+
+
+def upscale_arrays(run, arrays, tile_size=None, tile_overlap=DEFAULT_TILE_OVERLAP, batch_size=1):
+    """Amplía varias páginas y devuelve los resultados en el mismo orden.
+
+    Las páginas que caben en una tesela se agrupan por tamaño y se pasan al
+    modelo en lotes de ``batch_size``; las más grandes se trocean y sus
+    teselas se agrupan en lotes del mismo tamaño.
+    """
+    results = [None] * len(arrays)
+    groups = {}
+    for index, array in enumerate(arrays):
+        _, height, width = array.shape
+        if tile_size and (height > tile_size or width > tile_size):
+            results[index] = upscale_array(run, array, tile_size, tile_overlap, batch_size)
+        else:
+            groups.setdefault(array.shape, []).append(index)
+
+    batch_size = max(1, batch_size)
+    for indices in groups.values():
+        for start in range(0, len(indices), batch_size):
+            chunk = indices[start:start + batch_size]
+            preds = run(np.stack([arrays[i] for i in chunk]))
+            for i, pred in zip(chunk, preds):
+                results[i] = _a_uint8(pred)
+    return results
+
+
+def encode_jpeg(pixels, quality=95):
+    """Codifica un array (H, W, 3) uint8 como JPEG en memoria y devuelve los bytes."""
+    buffer = io.BytesIO()
+    Image.fromarray(pixels, 'RGB').save(buffer, format="JPEG", quality=quality)
+    return buffer.getvalue()
+
+
+# Ajustes del codificador de aplicar_superresolucion, para la clave de la caché
+_JPEG_CACHE_KEY = "jpeg:q95"
+
+
+def _cache_model(model_sr, run):
+    """(identificador, escala) de un modelo de super_image ejecutado con ``run``, para la clave de la caché."""
+    config = model_sr.config
+    architecture = (config.model_type or MODEL_ARCHITECTURE).lower()
+    return model_id(run.accelerations, BACKEND_FP32, architecture), config.scale or MODEL_SCALE
+
+
+def _cache_lookup(cache, imagen_path, tile_size, tile_overlap, cache_model):
+    """Devuelve (clave, bytes en caché o None); (None, None) sin caché."""
+    if cache is None:
+        return None, None
+    with open(imagen_path, "rb") as f:
+        key = sr_cache.make_key(f.read(), _JPEG_CACHE_KEY, tile_size, tile_overlap, *cache_model)
+    cached = cache.get(key)
+    return key, cached[0] if cached is not None else None
+
+
+def aplicar_superresolucion(imagen_path, model_sr, device, tile_size=None, tile_overlap=DEFAULT_TILE_OVERLAP,
+                            batch_size=1, cache=None, timer=None, run=None, cache_model=None):
+    """Aplica superresolución a una imagen usando el modelo y dispositivo dados.
+
+    Devuelve la página ampliada codificada en memoria (bytes), o None si no se
+    pudo aplicar y hay que usar la original. No crea archivos temporales.
+    ``tile_size`` activa la inferencia por teselas (None o 0 procesa la página entera).
+    Con ``cache`` (sr_cache.SrCache) se consulta antes de ejecutar el modelo.
+    ``timer`` (profiling.StageTimer) mide lectura, modelo y codificación.
+
+    ``run`` sustituye a ``torch_runner(model_sr, device)`` (p. ej. lanczos_runner,
+    con ``model_sr`` None); ``cache_model`` es entonces el (identificador, escala)
+    que lo distingue en la caché (ver model_id).
+    """
+    if model_sr is None and run is None: # Si el modelo no se cargó, se usa la original
+        return None
+    timer = timer or profiling.StageTimer()
+    name = os.path.basename(imagen_path)
+    try:
+        run = run or torch_runner(model_sr, device)
+        cache_model = cache_model or _cache_model(model_sr, run)
+        with timer.stage("read", page=name):
+            key, data = _cache_lookup(cache, imagen_path, tile_size, tile_overlap, cache_model)
+        if data is not None:
+            return data
+        with timer.stage("decode", page=name):
+            with Image.open(imagen_path) as image:
+                array = imagen_a_array(image)
+        with timer.stage("upscale", page=name):
+            result = upscale_array(run, array, tile_size, tile_overlap, batch_size)
+        with timer.stage("encode", page=name):
+            data = encode_jpeg(result)
+        if cache is not None:
+            cache.put(key, data, ".jpg")
+        return data
+
+    except Exception as e:
+        print(f"Error al aplicar superresolución a {os.path.basename(imagen_path)}: {e}")
+        # Si falla la superresolución, usar la imagen original
+        return None
+    finally:
+        # Limpiar memoria de GPU si es posible
+        release_device(device)
+
+
+def aplicar_superresolucion_lote(imagen_paths, model_sr, device, tile_size=None,
+                                 tile_overlap=DEFAULT_TILE_OVERLAP, batch_size=DEFAULT_BATCH_SIZE, cache=None,
+                                 timer=None, run=None, cache_model=None):
+    """Versión por lotes de aplicar_superresolucion: devuelve bytes o None por imagen, en el mismo orden.
+
+    Si el lote falla se reintenta página a página, de modo que una imagen
+    problemática solo hace que esa página conserve el original. Las páginas
+    que ya están en ``cache`` no pasan por el modelo.
+    """
+    if model_sr is None and run is None:
+        return [None] * len(imagen_paths)
+    timer = timer or profiling.StageTimer()
+    try:
+        run = run or torch_runner(model_sr, device)
+        cache_model = cache_model or _cache_model(model_sr, run)
+        results = [None] * len(imagen_paths)
+        keys = [None] * len(imagen_paths)
+        pending = []
+        for index, imagen_path in enumerate(imagen_paths):
+            with timer.stage("read", page=os.path.basename(imagen_path)):
+                keys[index], results[index] = _cache_lookup(cache, imagen_path, tile_size, tile_overlap,
+                                                            cache_model)
+            if results[index] is None:
+                pending.append(index)
+        arrays = []
+        for index in pending:
+            with timer.stage("decode", page=os.path.basename(imagen_paths[index])):
+                with Image.open(imagen_paths[index]) as image:
+                    arrays.append(imagen_a_array(image))
+        with timer.stage("upscale", count=len(arrays)):
+            upscaled = upscale_arrays(run, arrays, tile_size, tile_overlap, batch_size)
+        for index, result in zip(pending, upscaled):
+            with timer.stage("encode", page=os.path.basename(imagen_paths[index])):
+                results[index] = encode_jpeg(result)
+            if cache is not None:
+                cache.put(keys[index], results[index], ".jpg")
+        return results
+    except Exception as e:
+        print(f"Error en el lote de superresolución ({len(imagen_paths)} páginas), reintentando una a una: {e}")
+        return [aplicar_superresolucion(imagen_path, model_sr, device, tile_size, tile_overlap, batch_size, cache,
+                                        timer, run, cache_model)
+                for imagen_path in imagen_paths]
+    finally:
+        release_device(device)
@@ -0,0 +1,82 @@
+"""Páginas de manga sintéticas y deterministas.
+
+Imitan una página de manga: viñetas, tramas, degradados, líneas cinéticas y
+bocadillos con "texto", en escala de grises o en color. La misma semilla da
+siempre la misma imagen. Las usan los benchmarks (benchmark.py) y, cuando no
+se dan páginas propias, la calibración y las comprobaciones de los modelos
+exportados (sr_quant.py, sr_export.py).
+"""
+import numpy as np
+from PIL import Image, ImageDraw
+
+
+def _panels(rng, width, height):
+    """Rectángulos (x0, y0, x1, y1) de las viñetas de una página."""
+    margin = max(4, width // 20)
+    gutter = max(2, width // 60)
+    rows = int(rng.integers(3, 5))
+    row_heights = rng.dirichlet(np.ones(rows) * 4) * (height - 2 * margin - gutter * (rows - 1))
+    panels = []
+    y = margin
+    for row_height in row_heights:
+        cols = int(rng.integers(1, 4))
+        col_widths = rng.dirichlet(np.ones(cols) * 4) * (width - 2 * margin - gutter * (cols - 1))
+        x = margin
+        for col_width in col_widths:
+            panels.append((int(x), int(y), int(x + col_width), int(y + row_height)))
+            x += col_width + gutter
+        y += row_height + gutter
+    return panels
+
+
+def _fill(rng, width, height, color):
+    """Relleno de una viñeta (H, W, 3) uint8: trama, degradado, ruido o blanco."""
+    kind = rng.choice(["blank", "tone", "gradient", "noise"])
+    tint = rng.integers(90, 256, 3) if color else np.full(3, 255)
+    if kind == "tone": # Trama de puntos, como la de imprenta
+        period = int(rng.integers(3, 8))
+        yy, xx = np.mgrid[0:height, 0:width]
+        dots = ((xx % period) < period // 2) & ((yy % period) < period // 2)
+        base = np.where(dots, 70, 255)[..., None]
+    elif kind == "gradient":
+        base = np.linspace(40, 255, height)[:, None, None] * np.ones((1, width, 1))
+    elif kind == "noise": # Textura tipo fotografía: lo que peor comprime
+        base = rng.normal(150, 45, (height, width, 1)).clip(0, 255)
+    else:
+        base = np.full((height, width, 1), 255)
+    return (base * tint / 255).astype(np.uint8)
+
+
+def synthetic_page(width, height, color=False, seed=0):
+    """Genera una página de manga sintética determinista (imagen PIL "L" o "RGB")."""
+    rng = np.random.default_rng(seed)
+    page = np.full((height, width, 3), 255, np.uint8)
+    panels = _panels(rng, width, height)
+    for x0, y0, x1, y1 in panels:
+        if x1 - x0 > 2 and y1 - y0 > 2:
+            page[y0:y1, x0:x1] = _fill(rng, x1 - x0, y1 - y0, color)
+
+    image = Image.fromarray(page, "RGB")
+    draw = ImageDraw.Draw(image)
+    line_width = max(1, width // 250)
+    for x0, y0, x1, y1 in panels:
+        if x1 - x0 < 20 or y1 - y0 < 20:
+            continue
+        # Líneas cinéticas hacia un punto de la viñeta
+        cx, cy = int(rng.integers(x0, x1)), int(rng.integers(y0, y1))
+        for _ in range(int(rng.integers(0, 25))):
+            draw.line([(cx, cy), (int(rng.integers(x0, x1)), int(rng.integers(y0, y1)))], fill=(0, 0, 0),
+                      width=line_width)
+        # Bocadillo con líneas de "texto"
+        if rng.random() < 0.7:
+            bw, bh = (x1 - x0) // 2, (y1 - y0) // 3
+            bx, by = int(rng.integers(x0, x1 - bw)), int(rng.integers(y0, y1 - bh))
+            draw.ellipse([bx, by, bx + bw, by + bh], fill=(255, 255, 255), outline=(0, 0, 0), width=line_width)
+            lines = max(1, bh // 14)
+            for i in range(lines):
+                ty = by + bh * (i + 1) // (lines + 1)
+                tx = bx + bw // 4 + int(rng.integers(0, max(1, bw // 8)))
+                draw.rectangle([tx, ty, tx + int(rng.integers(bw // 4, bw // 2)), ty + max(1, bh // 30)],
+                               fill=(20, 20, 20))
+        draw.rectangle([x0, y0, x1, y1], outline=(0, 0, 0), width=line_width * 2)
+    return image if color else image.convert("L")
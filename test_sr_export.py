@@ -0,0 +1,48 @@
+"""Paridad de los modelos exportados (sr_export.py) con PyTorch.
+
+Usa un MSRN x2 pequeño con pesos aleatorios, así que no hace falta
+descargar ni importar los pesos reales. Se ejecuta con ``python -m pytest``.
+"""
+import numpy as np
+import pytest
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("super_image")
+
+import sr_export
+import superres
+import synthetic
+
+
+@pytest.fixture(scope="module")
+def tiny_msrn():
+    from super_image import MsrnConfig, MsrnModel
+
+    torch.manual_seed(0)
+    return MsrnModel(MsrnConfig(scale=2, n_blocks=1, n_feats=8)).eval()
+
+
+@pytest.fixture(scope="module")
+def tiles():
+    """Dos teselas de páginas sintéticas, una en grises y otra en color, de tamaño distinto al de exportación."""
+    return np.stack([superres.imagen_a_array(synthetic.synthetic_page(48, 40, color, seed=index))
+                     for index, color in enumerate((False, True))])
+
+
+def _max_abs_diff(run, model, tiles):
+    reference = superres.torch_runner(model, torch.device("cpu"))(tiles)
+    return float(np.abs(run(tiles) - reference).max())
+
+
+def test_torchscript_matches_pytorch(tiny_msrn, tiles, tmp_path):
+    model, metadata = sr_export.load_torchscript(tiny_msrn, str(tmp_path))
+    run = superres.torch_runner(model, torch.device("cpu"), ())
+    assert metadata["max_abs_diff"] <= sr_export.MAX_ABS_DIFF
+    assert _max_abs_diff(run, tiny_msrn, tiles) <= sr_export.MAX_ABS_DIFF
+
+
+def test_onnx_matches_pytorch(tiny_msrn, tiles, tmp_path):
+    pytest.importorskip("onnxruntime")
+    run, metadata = sr_export.onnx_runner(tiny_msrn, str(tmp_path))
+    assert metadata["max_abs_diff"] <= sr_export.MAX_ABS_DIFF
+    assert _max_abs_diff(run, tiny_msrn, tiles) <= sr_export.MAX_ABS_DIFF
@@ -0,0 +1,111 @@
+"""Validación rápida de páginas leyendo solo la cabecera.
+
+``Image.open`` + ``verify()`` en cada archivo obliga a abrir y analizar cada
+página antes de empezar, lo que en carpetas grandes (y más en red) domina la
+preparación. Aquí se leen unos pocos bytes: la firma del formato y las
+dimensiones (en JPEG se saltan segmentos con ``seek`` hasta el SOF). Las
+comprobaciones se reparten en un grupo de hilos y, si se pide, se hace
+además la verificación completa de Pillow en esos mismos hilos.
+
+El resultado de cada página (formato y tamaño) lo reutilizan las etapas
+siguientes: el pipeline abre cada página directamente con su decodificador.
+"""
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image
+
+DEFAULT_WORKERS = 8
+
+# Formatos que se reconocen por la cabecera (nombres de Pillow)
+FORMATS = ("JPEG", "PNG", "WEBP")
+
+# format es uno de FORMATS
+PageHeader = namedtuple("PageHeader", "format width height")
+
+_PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+# Marcadores SOF de JPEG (todos los C0-CF salvo DHT, JPG y DAC)
+_JPEG_SOF = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+
+def _jpeg_size(f):
+    """Recorre los segmentos JPEG hasta el SOF y devuelve (ancho, alto) o None."""
+    f.seek(2)
+    while True:
+        marker = f.read(2)
+        if len(marker) < 2 or marker[0] != 0xFF:
+            return None
+        code = marker[1]
+        while code == 0xFF: # Bytes de relleno
+            byte = f.read(1)
+            if not byte:
+                return None
+            code = byte[0]
+        if code == 0x01 or 0xD0 <= code <= 0xD8: # Marcadores sin longitud
+            continue
+        if code == 0xD9: # EOI antes de ningún SOF
+            return None
+        length = f.read(2)
+        if len(length) < 2:
+            return None
+        if code in _JPEG_SOF:
+            data = f.read(5)
+            if len(data) < 5:
+                return None
+            return int.from_bytes(data[3:5], "big"), int.from_bytes(data[1:3], "big")
+        f.seek(int.from_bytes(length, "big") - 2, 1)
+
+
+def _webp_size(header):
+    """(ancho, alto) de una cabecera RIFF/WEBP, o None."""
+    chunk = header[12:16]
+    if chunk == b"VP8 " and header[23:26] == b"\x9d\x01\x2a":
+        return (int.from_bytes(header[26:28], "little") & 0x3FFF,
+                int.from_bytes(header[28:30], "little") & 0x3FFF)
+    if chunk == b"VP8L" and header[20] == 0x2F:
+        bits = int.from_bytes(header[21:25], "little")
+        return 1 + (bits & 0x3FFF), 1 + ((bits >> 14) & 0x3FFF)
+    if chunk == b"VP8X":
+        return 1 + int.from_bytes(header[24:27], "little"), 1 + int.from_bytes(header[27:30], "little")
+    return None
+
+
+def sniff(file_path):
+    """Lee la cabecera de una imagen y devuelve su PageHeader, o None si no es válida."""
+    try:
+        with open(file_path, "rb") as f:
+            header = f.read(32)
+            if header[:3] == b"\xff\xd8\xff":
+                image_format, size = "JPEG", _jpeg_size(f)
+            elif header[:8] == _PNG_SIGNATURE and header[12:16] == b"IHDR":
+                image_format = "PNG"
+                size = int.from_bytes(header[16:20], "big"), int.from_bytes(header[20:24], "big")
+            elif header[:4] == b"RIFF" and header[8:12] == b"WEBP" and len(header) >= 30:
+                image_format, size = "WEBP", _webp_size(header)
+            else:
+                return None
+    except OSError:
+        return None
+    if size is None or not size[0] or not size[1]:
+        return None
+    return PageHeader(image_format, size[0], size[1])
+
+
+def _check(file_path, deep):
+    page = sniff(file_path)
+    if page is None or not deep:
+        return page
+    try:
+        with Image.open(file_path, formats=[page.format]) as img:
+            img.verify() # Verificación completa de Pillow
+    except Exception:
+        return None
+    return page
+
+
+def validate(file_paths, workers=DEFAULT_WORKERS, deep=False):
+    """Valida varias páginas en paralelo. Devuelve un PageHeader o None por ruta, en el mismo orden."""
+    file_paths = list(file_paths)
+    if len(file_paths) <= 1 or workers <= 1:
+        return [_check(file_path, deep) for file_path in file_paths]
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="page-validate") as pool:
+        return list(pool.map(_check, file_paths, [deep] * len(file_paths)))